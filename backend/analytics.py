@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from engine import SIDE_BUY
+
+# Position sizes below this are treated as flat when splitting fills into round trips
+FLAT_EPSILON = 1e-9
+
+
+def _scalar(value) -> Optional[float]:
+    # NaN/inf (no trades, no losing trades, flat curve) become None so results stay JSON-safe
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def infer_bars_per_year(time: np.ndarray, tz: Optional[str] = None) -> float:
+    """Annualization factor from the bar timestamps (unix seconds).
+
+    Bars per calendar day actually traded times 252 sessions, or 365 when the series trades
+    on weekends (crypto). Days are exchange-local dates when tz is given: NSE daily bars are
+    stamped at midnight IST, which is the previous day in UTC. Without tz, a series counts
+    as trading weekends only when it covers more than five distinct UTC weekdays, which a
+    constant offset between local and UTC dates cannot produce.
+    """
+    time = np.asarray(time, dtype='int64')
+    if len(time) < 2:
+        return 252.0
+    if tz is not None:
+        time = pd.to_datetime(time, unit='s', utc=True).tz_convert(tz).tz_localize(None).as_unit('s').asi8
+    days = np.unique(time // 86400)
+    weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday == 0
+    trades_weekends = np.any(weekdays >= 5) if tz is not None else len(np.unique(weekdays)) > 5
+    sessions_per_year = 365.0 if trades_weekends else 252.0
+    return len(time) / len(days) * sessions_per_year
+
+
+def equity_metrics_batch(equity: np.ndarray, bars_per_year: float = 252.0, position: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Curve statistics for many equity curves at once.
+
+    equity (and position, if given) is (results x bars); every statistic is an array with one
+    value per result.
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype='float64'))
+    start = equity[:, 0]
+    end = equity[:, -1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = equity[:, 1:] / equity[:, :-1] - 1.0
+        mean = returns.mean(axis=1) if returns.shape[1] else np.full(len(equity), np.nan)
+        std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.full(len(equity), np.nan)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2, axis=1)) if returns.shape[1] else np.full(len(equity), np.nan)
+        scale = np.sqrt(bars_per_year)
+        sharpe = np.where(std > 0, mean / std * scale, np.nan)
+        sortino = np.where(downside > 0, mean / downside * scale, np.nan)
+
+        peak = np.maximum.accumulate(equity, axis=1)
+        drawdown = equity / peak - 1.0
+        max_drawdown = drawdown.min(axis=1)
+        max_drawdown_abs = (equity - peak).min(axis=1)
+        total_return = end / start - 1.0
+
+    metrics = {
+        'total_return': total_return,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_abs': max_drawdown_abs,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'volatility': std * scale,
+    }
+    if position is not None:
+        position = np.atleast_2d(np.asarray(position, dtype='float64'))
+        metrics['exposure'] = np.mean(np.abs(position) > FLAT_EPSILON, axis=1)
+    return metrics
+
+
+def closed_round_trips(result_ids: np.ndarray, side: np.ndarray, price: np.ndarray, qty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """PnL and result id of every closed round trip in the fills of many results, in fill order.
+
+    Fills must be grouped by result_ids and in time order within a result. A round trip runs
+    from flat to flat, and its PnL is the sum of its cash flows; a position still open at
+    the end is not counted.
+    """
+    result_ids = np.asarray(result_ids, dtype='int64')
+    signed_qty = np.where(np.asarray(side) == SIDE_BUY, qty, -np.asarray(qty, dtype='float64'))
+    cash_flow = -signed_qty * np.asarray(price, dtype='float64')
+
+    # Position after each fill, restarted for every result
+    position = np.cumsum(signed_qty)
+    first = np.ones(len(result_ids), dtype=bool)
+    first[1:] = result_ids[1:] != result_ids[:-1]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(len(result_ids)), 0))
+    offset = np.where(group_start > 0, position[np.maximum(group_start - 1, 0)], 0.0)
+    position = position - offset
+    flat = np.abs(position) < FLAT_EPSILON
+
+    # A new round trip starts at each result's first fill and after every fill that went flat
+    starts = first.copy()
+    starts[1:] |= flat[:-1]
+    trip_id = np.cumsum(starts) - 1
+    n_trips = int(trip_id[-1]) + 1 if len(trip_id) else 0
+    trip_pnl = np.bincount(trip_id, weights=cash_flow, minlength=n_trips)
+    trip_closed = np.zeros(n_trips, dtype=bool)
+    trip_closed[trip_id[flat]] = True
+    trip_result = np.zeros(n_trips, dtype='int64')
+    trip_result[trip_id] = result_ids
+    return trip_pnl[trip_closed], trip_result[trip_closed]
+
+
+def round_trip_pnl(trade_log: Dict[str, Any]) -> np.ndarray:
+    """PnL of each closed round trip of one result's trade_log (arrays or JSON lists)."""
+    qty = np.asarray(trade_log['qty'], dtype='float64')
+    return closed_round_trips(np.zeros(len(qty), dtype='int64'), np.asarray(trade_log['side']),
+                              np.asarray(trade_log['price'], dtype='float64'), qty)[0]
+
+
+def trade_metrics_batch(result_ids: np.ndarray, side: np.ndarray, price: np.ndarray, qty: np.ndarray, n_results: int) -> Dict[str, np.ndarray]:
+    """Round-trip statistics for the fills of many results at once (see closed_round_trips)."""
+    result_ids = np.asarray(result_ids, dtype='int64')
+    closed_pnl, closed_result = closed_round_trips(result_ids, side, price, qty)
+    wins = closed_pnl > 0
+    count = np.bincount(closed_result, minlength=n_results).astype('float64')
+    win_count = np.bincount(closed_result, weights=wins, minlength=n_results)
+    gross_profit = np.bincount(closed_result, weights=np.where(wins, closed_pnl, 0.0), minlength=n_results)
+    gross_loss = -np.bincount(closed_result, weights=np.where(closed_pnl < 0, closed_pnl, 0.0), minlength=n_results)
+    net = np.bincount(closed_result, weights=closed_pnl, minlength=n_results)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'num_fills': np.bincount(result_ids, minlength=n_results),
+            'num_round_trips': count.astype('int64'),
+            'win_rate': np.where(count > 0, win_count / count, np.nan),
+            'profit_factor': np.where(gross_loss > 0, gross_profit / gross_loss, np.where(gross_profit > 0, np.inf, np.nan)),
+            'avg_trade': np.where(count > 0, net / count, np.nan),
+        }
+
+
+def compute_metrics_batch(results: List[Dict[str, Any]], bars_per_year: Optional[float] = None, tz: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Metrics for many run_strategy(as_arrays=True) results.
+
+    Results with equal curve lengths (e.g. one sweep dataset) are stacked and evaluated
+    together; fills of all results are concatenated into one pass. tz is the exchange
+    timezone used to infer bars_per_year when it is not given.
+    """
+    out: List[Dict[str, Any]] = [dict() for _ in results]
+    by_length: Dict[int, List[int]] = {}
+    for i, result in enumerate(results):
+        by_length.setdefault(len(result['equity_curve']['equity']), []).append(i)
+
+    for length, indices in by_length.items():
+        if length == 0:
+            continue
+        curves = [results[i]['equity_curve'] for i in indices]
+        bpy = bars_per_year or infer_bars_per_year(curves[0]['time'], tz)
+        metrics = equity_metrics_batch(
+            np.stack([c['equity'] for c in curves]), bpy, position=np.stack([c['position'] for c in curves]))
+        for row, i in enumerate(indices):
+            out[i].update({name: _scalar(values[row]) for name, values in metrics.items()})
+
+    logs = [r['trade_log'] for r in results]
+    lengths = [len(log['time']) for log in logs]
+    if sum(lengths):
+        trades = trade_metrics_batch(
+            np.repeat(np.arange(len(results)), lengths),
+            np.concatenate([log['side'] for log in logs]),
+            np.concatenate([log['price'] for log in logs]),
+            np.concatenate([log['qty'] for log in logs]),
+            len(results),
+        )
+    else:
+        trades = trade_metrics_batch(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), len(results))
+    for i in range(len(results)):
+        for name, values in trades.items():
+            value = values[i]
+            out[i][name] = int(value) if name.startswith('num_') else _scalar(value)
+    return out
+
+
+def compute_metrics(result: Dict[str, Any], bars_per_year: Optional[float] = None, rolling_window: Optional[int] = None,
+                    tz: Optional[str] = None) -> Dict[str, Any]:
+    """Metrics for a single run_strategy(as_arrays=True) result.
+
+    With rolling_window, also returns the rolling return over that many bars as a list
+    aligned with the end of each window.
+    """
+    metrics = compute_metrics_batch([result], bars_per_year, tz)[0]
+    if rolling_window:
+        equity = np.asarray(result['equity_curve']['equity'], dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rolling = equity[rolling_window:] / equity[:-rolling_window] - 1.0 if len(equity) > rolling_window else np.zeros(0)
+        metrics['rolling_returns'] = {
+            'window': rolling_window,
+            'time': np.asarray(result['equity_curve']['time'])[rolling_window:].tolist(),
+            'return': np.where(np.isfinite(rolling), rolling, None).tolist(),
+        }
+    return metrics
@@ -0,0 +1,296 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics, timer
+
+# One structured record per bar. Keeping everything in a single .npy file means a
+# write is a single atomic os.replace and reads can be memory-mapped.
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'),  # UTC nanoseconds
+    ('Open', '<f8'),
+    ('High', '<f8'),
+    ('Low', '<f8'),
+    ('Close', '<f8'),
+    ('Volume', '<f8'),
+])
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bar_cache')
+
+
+def normalize_symbol(symbol: str) -> str:
+    return symbol.strip().upper()
+
+
+def _to_utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def frame_to_bars(df: pd.DataFrame) -> Tuple[np.ndarray, Optional[str]]:
+    """Converts a yfinance-shaped frame (DatetimeIndex + OHLCV columns) to BAR_DTYPE records."""
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    if df.empty:
+        return bars, None
+
+    index = pd.DatetimeIndex(df.index)
+    tz = str(index.tz) if index.tz is not None else None
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    bars['time'] = index.tz_convert('UTC').as_unit('ns').asi8
+    for col in OHLCV_COLUMNS:
+        bars[col] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+    return bars, tz
+
+
+def bars_to_frame(bars: np.ndarray, tz: Optional[str], interval: str) -> pd.DataFrame:
+    """Inverse of frame_to_bars. Mirrors yfinance: 'Date' index for daily bars, 'Datetime' otherwise."""
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(bars['time']), unit='ns', utc=True))
+    if tz:
+        index = index.tz_convert(tz)
+    index.name = 'Date' if interval in ('1d', '1wk', '1mo') else 'Datetime'
+    return pd.DataFrame({col: np.asarray(bars[col]) for col in OHLCV_COLUMNS}, index=index)
+
+
+def merge_bars(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Union of two bar arrays sorted by time. On duplicate timestamps the newer fetch wins."""
+    if len(old) == 0:
+        combined = new
+    elif len(new) == 0:
+        combined = old
+    else:
+        combined = np.concatenate([old, new])
+    order = np.argsort(combined['time'], kind='stable')
+    combined = combined[order]
+    times = combined['time']
+    keep = np.ones(len(combined), dtype=bool)
+    keep[:-1] = times[1:] != times[:-1]
+    return combined[keep]
+
+
+class FrameProvider:
+    """Offline provider that serves bars from in-memory DataFrames.
+
+    Frames are registered per (symbol, interval) and sliced to the requested
+    [start, end) window, which makes the bar store usable without network access.
+    """
+
+    def __init__(self, frames: Optional[Dict[Tuple[str, str], pd.DataFrame]] = None, delay: float = 0.0):
+        self.frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self.calls = []
+        self.batch_calls = []
+        # Simulated upstream latency per request, to exercise coalescing and pooling
+        self.delay = delay
+        for (symbol, interval), df in (frames or {}).items():
+            self.add(symbol, interval, df)
+
+    def add(self, symbol: str, interval: str, df: pd.DataFrame):
+        self.frames[(normalize_symbol(symbol), interval)] = df.sort_index()
+
+    def fetch(self, symbol: str, interval: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        self.calls.append((symbol, interval, start, end))
+        if self.delay:
+            time.sleep(self.delay)
+        return self._slice(symbol, interval, start, end)
+
+    def fetch_many(self, symbols: List[str], interval: str, start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        self.batch_calls.append((tuple(symbols), interval, start, end))
+        if self.delay:
+            time.sleep(self.delay)
+        return {symbol: self._slice(symbol, interval, start, end) for symbol in symbols}
+
+    def _slice(self, symbol: str, interval: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        df = self.frames.get((normalize_symbol(symbol), interval))
+        if df is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        mask = (index >= _to_utc(start)) & (index < _to_utc(end))
+        return df[mask]
+
+
+class BarStore:
+    """Persistent on-disk OHLCV store keyed by (normalized symbol, interval).
+
+    Each key keeps the bars it has seen plus the [covered_start, covered_end)
+    window that was requested from upstream, so that later requests only fetch
+    the missing head or tail and overlapping windows are served from disk.
+    """
+
+    def __init__(self, provider, root: str = DEFAULT_STORE_DIR, refresh_after: float = 60.0):
+        self.provider = provider
+        self.root = root
+        # Open-ended ("up to now") requests refetch the tail at most this often
+        self.refresh_after = refresh_after
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _paths(self, key: Tuple[str, str]) -> Tuple[str, str]:
+        symbol, interval = key
+        safe = re.sub(r'[^A-Za-z0-9._^=-]', '_', symbol)
+        base = os.path.join(self.root, safe)
+        return os.path.join(base, f"{interval}.npy"), os.path.join(base, f"{interval}.json")
+
+    def _load(self, key: Tuple[str, str]) -> Tuple[Optional[np.ndarray], dict]:
+        bars_path, meta_path = self._paths(key)
+        if not (os.path.exists(bars_path) and os.path.exists(meta_path)):
+            return None, {}
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            return np.load(bars_path, mmap_mode='r'), meta
+        except (OSError, ValueError) as e:
+            print(f"Discarding unreadable bar cache for {key}: {e}")
+            return None, {}
+
+    def _save(self, key: Tuple[str, str], bars: np.ndarray, meta: dict):
+        bars_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(bars_path), exist_ok=True)
+        # Write to temp files and rename so concurrent readers never see partial data
+        tmp_bars = f"{bars_path}.{os.getpid()}.tmp"
+        with open(tmp_bars, 'wb') as f:
+            np.save(f, np.ascontiguousarray(bars))
+        os.replace(tmp_bars, bars_path)
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+    def _fetch(self, symbol: str, interval: str, start: float, end: float) -> Tuple[np.ndarray, Optional[str]]:
+        metrics.inc('upstream_requests', interval=interval)
+        with timer('upstream_fetch', interval=interval):
+            df = self.provider.fetch(symbol, interval, pd.Timestamp(start, unit='s', tz='UTC'), pd.Timestamp(end, unit='s', tz='UTC'))
+        if df is None or df.empty:
+            return np.empty(0, dtype=BAR_DTYPE), None
+        return frame_to_bars(df)
+
+    def _fetch_many(self, symbols: List[str], interval: str, start: float, end: float) -> Dict[str, Tuple[np.ndarray, Optional[str]]]:
+        """One bulk upstream request for several symbols over the same range."""
+        metrics.inc('upstream_requests', interval=interval)
+        metrics.inc('upstream_batch_symbols', len(symbols), interval=interval)
+        with timer('upstream_fetch', interval=interval):
+            frames = self.provider.fetch_many(symbols, interval, pd.Timestamp(start, unit='s', tz='UTC'), pd.Timestamp(end, unit='s', tz='UTC'))
+        out = {}
+        for symbol in symbols:
+            df = frames.get(symbol)
+            out[symbol] = (np.empty(0, dtype=BAR_DTYPE), None) if df is None or df.empty else frame_to_bars(df)
+        return out
+
+    def _plan(self, key: Tuple[str, str], want_start: float, want_end: float, now: float) -> Tuple[np.ndarray, dict, List[Tuple[float, float]]]:
+        """Stored bars, their meta and the (start, end) ranges that still have to come from upstream."""
+        stored, meta = self._load(key)
+        bars = np.empty(0, dtype=BAR_DTYPE) if stored is None else stored
+        missing = []
+
+        if stored is None:
+            missing.append((want_start, want_end))
+        else:
+            covered_start, covered_end = meta['covered_start'], meta['covered_end']
+            if want_start < covered_start:
+                missing.append((want_start, covered_start))
+            # Windows reaching up to the last fetch are "live" and only refreshed every refresh_after seconds
+            fetched_at = meta.get('fetched_at', 0)
+            stale = want_end < fetched_at or now - fetched_at > self.refresh_after
+            if want_end > covered_end and stale:
+                # The last stored bar may still have been forming when it was fetched
+                tail_from = covered_end
+                if len(bars):
+                    tail_from = min(tail_from, bars['time'][-1] / 1e9)
+                missing.append((tail_from, want_end))
+        return bars, meta, missing
+
+    def _apply(self, key: Tuple[str, str], bars: np.ndarray, meta: dict, fetched: List[Tuple[float, float, np.ndarray, Optional[str]]], now: float) -> Tuple[np.ndarray, Optional[str]]:
+        """Merges fetched parts into the stored bars and persists them; returns the bars and their tz."""
+        tz = meta.get('tz')
+        if not fetched:
+            return bars, tz
+        for _, _, part, part_tz in fetched:
+            bars = merge_bars(np.asarray(bars), part)
+            tz = tz or part_tz
+        covered_start = min([lo for lo, _, _, _ in fetched] + ([meta['covered_start']] if meta else []))
+        covered_end = max([hi for _, hi, _, _ in fetched] + ([meta['covered_end']] if meta else []))
+        meta = {
+            'tz': tz,
+            'covered_start': covered_start,
+            'covered_end': covered_end,
+            'fetched_at': now,
+        }
+        self._save(key, bars, meta)
+        return bars, tz
+
+    def get_bars(self, symbol: str, interval: str, start, end=None) -> pd.DataFrame:
+        """Returns bars in [start, end) as a yfinance-shaped frame. end=None means up to now."""
+        return self.get_bars_many([symbol], interval, start, end)[symbol]
+
+    def get_bars_many(self, symbols: List[str], interval: str, start, end=None) -> Dict[str, pd.DataFrame]:
+        """get_bars for several symbols at once, keyed by the symbols as passed.
+
+        Missing ranges that end at the same time are requested together: with a provider
+        that implements fetch_many they become one bulk download starting at the earliest
+        of their starts (overlap with stored bars is merged away).
+        """
+        now = time.time()
+        want_start = _to_utc(start).timestamp()
+        want_end = now if end is None else min(_to_utc(end).timestamp(), now)
+        keys = sorted({(normalize_symbol(s), interval) for s in symbols})
+
+        # Locks are taken in sorted key order, so concurrent batches cannot deadlock
+        locks = [self._lock(key) for key in keys]
+        for lock in locks:
+            lock.acquire()
+        try:
+            plans = {key: self._plan(key, want_start, want_end, now) for key in keys}
+            fetched: Dict[Tuple[str, str], list] = {key: [] for key in keys}
+
+            by_end: Dict[float, List[Tuple[Tuple[str, str], float]]] = {}
+            for key, (_, _, missing) in plans.items():
+                for lo, hi in missing:
+                    by_end.setdefault(hi, []).append((key, lo))
+
+            for hi, group in by_end.items():
+                if len(group) > 1 and hasattr(self.provider, 'fetch_many'):
+                    lo = min(lo for _, lo in group)
+                    try:
+                        parts = self._fetch_many([key[0] for key, _ in group], interval, lo, hi)
+                    except Exception as e:
+                        print(f"Error fetching {len(group)} symbols of {interval} bars: {e}")
+                        continue
+                    for key, _ in group:
+                        part, part_tz = parts[key[0]]
+                        fetched[key].append((lo, hi, part, part_tz))
+                    continue
+                for key, lo in group:
+                    try:
+                        part, part_tz = self._fetch(key[0], interval, lo, hi)
+                    except Exception as e:
+                        print(f"Error fetching {key[0]} {interval} bars: {e}")
+                        continue
+                    fetched[key].append((lo, hi, part, part_tz))
+
+            frames = {}
+            for key in keys:
+                bars, meta, _ = plans[key]
+                bars, tz = self._apply(key, bars, meta, fetched[key], now)
+                times = bars['time']
+                lo = int(np.searchsorted(times, int(want_start * 1e9), side='left'))
+                hi = len(bars) if end is None else int(np.searchsorted(times, int(want_end * 1e9), side='left'))
+                frames[key[0]] = bars_to_frame(np.array(bars[lo:hi]), tz, interval)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+        return {symbol: frames[normalize_symbol(symbol)] for symbol in symbols}
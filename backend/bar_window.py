@@ -0,0 +1,139 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from serialization import float_list
+
+OHLCV_KEYS = ('time', 'open', 'high', 'low', 'close', 'volume')
+# Smallest pixel width a level-of-detail request may ask for
+MIN_LOD_WIDTH = 16
+
+
+def window_bounds(times: np.ndarray, from_time: Optional[float] = None, to_time: Optional[float] = None,
+                  cursor: Optional[int] = None, limit: Optional[int] = None) -> Tuple[int, int]:
+    """[lo, hi) bar indices for a time range and/or cursor page.
+
+    from_time/to_time are inclusive unix seconds. cursor is the index of the first bar of a
+    page (the next_cursor of the previous one). With only to_time and a limit, the page is
+    the limit bars ending at to_time, for scrolling back in time.
+    """
+    n = len(times)
+    lo = int(np.searchsorted(times, from_time, side='left')) if from_time is not None else 0
+    hi = int(np.searchsorted(times, to_time, side='right')) if to_time is not None else n
+    if cursor is not None:
+        lo = max(lo, int(cursor))
+    if limit is not None and limit > 0:
+        if to_time is not None and from_time is None and cursor is None:
+            lo = max(lo, hi - limit)
+        else:
+            hi = min(hi, lo + limit)
+    lo = max(0, min(lo, n))
+    return lo, max(lo, min(hi, n))
+
+
+def bucket_ohlcv(arrays: Dict[str, np.ndarray], lo: int, hi: int, buckets: int) -> Dict[str, np.ndarray]:
+    """Aggregates bars [lo, hi) into about `buckets` equal-count candles.
+
+    Each bucket keeps its first open and time, last close, the highest high and lowest low
+    (so spikes survive downsampling) and the summed volume.
+    """
+    count = hi - lo
+    starts = np.unique(lo + (np.arange(buckets) * count) // buckets)
+    ends = np.r_[starts[1:], hi] - 1
+    out = {'time': arrays['time'][starts]}
+    if 'open' in arrays:
+        out['open'] = arrays['open'][starts]
+    if 'high' in arrays:
+        out['high'] = np.fmax.reduceat(arrays['high'][lo:hi], starts - lo)
+    if 'low' in arrays:
+        out['low'] = np.fmin.reduceat(arrays['low'][lo:hi], starts - lo)
+    if 'close' in arrays:
+        out['close'] = arrays['close'][ends]
+    if 'volume' in arrays:
+        out['volume'] = np.add.reduceat(np.nan_to_num(arrays['volume'][lo:hi]), starts - lo)
+    return out
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw y(x) with threshold points.
+
+    The first and last points are always kept. In between, every bucket contributes the point
+    that spans the largest triangle with the previously kept point and the average of the
+    next bucket. Scores are precomputed for all buckets at once; only picking the point
+    runs per bucket, since it depends on the previous pick.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype('float64')
+    y = y.astype('float64')
+
+    # Bucket i covers points [edges[i], edges[i + 1]) of the n - 2 interior points
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype('int64')
+    sizes = np.diff(edges)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    # Average of the bucket after each one; the last bucket looks at the final point
+    avg_x = np.r_[sums_x[1:] / sizes[1:], x[-1]]
+    avg_y = np.r_[sums_y[1:] / sizes[1:], y[-1]]
+
+    # Area of (a, c, avg) for candidate c is |xa * (yc - avg_y) + ya * (avg_x - xc) + (xc * avg_y - avg_x * yc)|
+    width = int(sizes.max())
+    cols = np.minimum(edges[:-1, None] + np.arange(width)[None, :], edges[1:, None] - 1)
+    xc, yc = x[cols], y[cols]
+    coef_a = yc - avg_y[:, None]
+    coef_b = avg_x[:, None] - xc
+    const = xc * avg_y[:, None] - avg_x[:, None] * yc
+
+    picked = np.empty(threshold, dtype='int64')
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        a = int(cols[i, np.abs(x[a] * coef_a[i] + y[a] * coef_b[i] + const[i]).argmax()])
+        picked[i + 1] = a
+    return picked
+
+
+def _index_list(values: np.ndarray) -> list:
+    return values.astype('int64').tolist()
+
+
+def window(dataset, from_time: Optional[float] = None, to_time: Optional[float] = None, cursor: Optional[int] = None,
+           limit: Optional[int] = None, width: Optional[int] = None) -> Dict[str, Any]:
+    """A page of a registry dataset, or a level-of-detail view of it.
+
+    Without width (or when the window already fits in it) the bars are returned as is, in
+    the columnar layout. With width, candles are min/max-preserving buckets and numeric
+    indicator columns are LTTB-downsampled series of their own, about width points each.
+    """
+    arrays = dataset.arrays
+    times = arrays.get('time', np.empty(0, dtype='int64'))
+    lo, hi = window_bounds(times, from_time, to_time, cursor, limit)
+    page = {
+        "start": lo,
+        "end": hi,
+        "count": dataset.length,
+        "next_cursor": hi if hi < dataset.length else None,
+        "handle": dataset.handle,
+    }
+    if not width or hi - lo <= width:
+        page["columns"] = {key: values[lo:hi] for key, values in dataset.columns.items()}
+        return page
+
+    width = max(MIN_LOD_WIDTH, int(width))
+    candles = bucket_ohlcv(arrays, lo, hi, width)
+    series = {}
+    x = times[lo:hi]
+    for key, values in arrays.items():
+        if key in OHLCV_KEYS:
+            continue
+        y = values[lo:hi]
+        valid = np.flatnonzero(~np.isnan(y))
+        keep = valid[lttb(x[valid], y[valid], width)]
+        series[key] = {"time": _index_list(x[keep]), "value": float_list(y[keep])}
+
+    page["lod"] = True
+    page["bars_per_bucket"] = (hi - lo) / len(candles['time'])
+    page["columns"] = {key: _index_list(v) if key == 'time' else float_list(v) for key, v in candles.items()}
+    page["series"] = series
+    return page
@@ -0,0 +1,336 @@
+"""Benchmark suite over deterministic synthetic market data, runnable without network access.
+
+Covers the data path (get_historical_data with each indicator type), serialization,
+BacktestEngine.run_strategy with representative strategies and replay throughput, and
+writes one JSON document that a later run can be compared against:
+
+    python bench.py --output baseline.json
+    python bench.py --baseline baseline.json --tolerance 0.25   # exits 1 on regressions
+    python bench.py --suite stress --groups data engine
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, FrameProvider
+from data_provider import DataProvider
+from engine import BacktestEngine
+from indicator_cache import IndicatorCache
+from indicators import INDICATORS, compute_indicators
+from instrumentation import metrics
+from serialization import columns_to_records, frame_to_columns
+
+SEED = 7
+SYMBOL = 'BENCH.NS'
+# Last synthetic trading day, fixed so every run generates identical bars
+END_DAY = pd.Timestamp('2024-12-31')
+# NSE session: 09:15-15:30 local, 375 minutes
+SESSION_OPEN_MINUTES = 9 * 60 + 15
+SESSION_MINUTES = 375
+
+# name -> (upstream interval, trading days)
+REALISTIC_SIZES = {
+    '1m_5d': ('1m', 5),
+    '5m_1mo': ('5m', 21),
+    '1h_1y': ('1h', 252),
+    '1d_5y': ('1d', 1260),
+}
+STRESS_SIZES = {
+    '1m_1y': ('1m', 252),
+    '5m_5y': ('5m', 1260),
+    '1d_50y': ('1d', 12600),
+}
+INTERVAL_TIMEFRAME = {'1m': '1m', '5m': '5m', '1h': '1h', '1d': '1D'}
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '1h': 60}
+
+STRATEGIES = {
+    'sma_cross_candle': """
+closes = []
+def on_candle(candle, portfolio):
+    closes.append(candle['close'])
+    if len(closes) < 50:
+        return
+    fast = sum(closes[-10:]) / 10
+    slow = sum(closes[-50:]) / 50
+    if fast > slow and portfolio.positions == 0:
+        portfolio.buy(10)
+    elif fast < slow and portfolio.positions > 0:
+        portfolio.sell(portfolio.positions)
+""",
+    'breakout_candle': """
+state = {'high': None, 'stop': None}
+def on_candle(candle, portfolio):
+    if state['high'] is not None and candle['close'] > state['high'] and portfolio.positions == 0:
+        portfolio.buy(5)
+        state['stop'] = candle['low']
+    elif portfolio.positions > 0 and candle['close'] < state['stop']:
+        portfolio.sell(portfolio.positions)
+    state['high'] = candle['high'] if state['high'] is None else max(state['high'] * 0.999, candle['high'])
+""",
+    'sma_cross_signals': """
+def signals(data):
+    close = data['close']
+    fast = np.convolve(close, np.ones(10) / 10, mode='full')[:len(close)]
+    slow = np.convolve(close, np.ones(50) / 50, mode='full')[:len(close)]
+    above = (fast > slow).astype(float)
+    return np.diff(above, prepend=0.0) * 10
+""",
+    'momentum_target': """
+def target_position(data):
+    close = data['close']
+    momentum = close - np.roll(close, 20)
+    momentum[:20] = 0
+    return np.where(momentum > 0, 10.0, 0.0)
+""",
+}
+
+
+def session_index(interval: str, days: int) -> pd.DatetimeIndex:
+    """Bar open times of `days` NSE trading days ending at END_DAY, yfinance-style (tz-aware)."""
+    dates = pd.bdate_range(end=END_DAY, periods=days)
+    if interval == '1d':
+        return pd.DatetimeIndex(dates).tz_localize('Asia/Kolkata')
+    step = INTERVAL_MINUTES[interval]
+    offsets = pd.to_timedelta(np.arange(SESSION_OPEN_MINUTES, SESSION_OPEN_MINUTES + SESSION_MINUTES, step), unit='m')
+    stamps = (dates.values[:, None] + offsets.values[None, :]).ravel()
+    return pd.DatetimeIndex(stamps).tz_localize('Asia/Kolkata')
+
+
+def synthetic_frame(interval: str, days: int, seed: int = SEED) -> pd.DataFrame:
+    """Deterministic geometric random walk OHLCV with yfinance's frame shape."""
+    index = session_index(interval, days)
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    scale = 0.02 if interval == '1d' else 0.002
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, scale, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0.0, scale / 4, n))
+    wick = np.abs(rng.normal(0.0, scale / 2, (2, n)))
+    frame = pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + wick[0]),
+        'Low': np.minimum(open_, close) * (1 - wick[1]),
+        'Close': close,
+        'Volume': np.round(rng.lognormal(10.0, 1.0, n)),
+    }, index=index)
+    frame.index.name = 'Date' if interval == '1d' else 'Datetime'
+    return frame
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()  # warm-up (imports, first-touch allocations, bar store reads)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {'value': statistics.median(samples), 'min_s': min(samples), 'mean_s': statistics.fmean(samples)}
+
+
+def timing(name: str, bars: int, stats: Dict[str, float], **extra) -> Dict[str, Any]:
+    return {'name': name, 'unit': 's', 'better': 'lower', 'bars': bars,
+            'bars_per_s': round(bars / stats['value']) if stats['value'] else None, **stats, **extra}
+
+
+class Suite:
+    def __init__(self, sizes: Dict[str, Tuple[str, int]], repeat: int):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.frames = {name: synthetic_frame(interval, days) for name, (interval, days) in sizes.items()}
+        provider = FrameProvider({(SYMBOL, interval): self.frames[name] for name, (interval, _) in sizes.items()})
+        DataProvider.set_bar_store(BarStore(provider, root=tempfile.mkdtemp(prefix='bench-bars-')))
+        # Nothing fits in a zero-byte cache, so every run computes its indicators
+        DataProvider._indicator_cache = IndicatorCache(max_bytes=0)
+
+    def _range(self, name: str) -> Tuple[str, str]:
+        index = self.frames[name].index
+        return index[0].tz_convert('UTC').isoformat(), (index[-1] + pd.Timedelta(days=1)).tz_convert('UTC').isoformat()
+
+    def _historical(self, name: str, specs: Optional[List[dict]], layout: str = 'columns'):
+        interval = self.sizes[name][0]
+        start, end = self._range(name)
+        indicators = json.dumps(specs) if specs else None
+        return DataProvider.get_historical_data(SYMBOL, INTERVAL_TIMEFRAME[interval], start, end, indicators, layout=layout)
+
+    def data(self) -> List[Dict[str, Any]]:
+        results = []
+        for name, frame in self.frames.items():
+            bars = len(frame)
+            results.append(timing(f"historical/{name}/bars", bars, measure(lambda: self._historical(name, None), self.repeat)))
+            for kind in INDICATORS:
+                specs = [{'id': 'x', 'type': kind}]
+                metrics.drain()
+                stats = measure(lambda: self._historical(name, specs), self.repeat)
+                computed = [s for (metric, labels), s in metrics.drain()['summaries'].items()
+                            if metric == 'indicator_seconds' and dict(labels).get('type') == kind]
+                compute_s = computed[0][1] / computed[0][0] if computed else None
+                results.append(timing(f"historical/{name}/{kind}", bars, stats, compute_s=compute_s))
+            every = [{'id': kind.lower(), 'type': kind} for kind in INDICATORS]
+            results.append(timing(f"historical/{name}/all", bars, measure(lambda: self._historical(name, every), self.repeat)))
+        return results
+
+    def serialize(self) -> List[Dict[str, Any]]:
+        results = []
+        every = [{'id': kind.lower(), 'type': kind} for kind in INDICATORS]
+        for name, frame in self.frames.items():
+            interval = self.sizes[name][0]
+            df = frame.reset_index()
+            date_col = df.columns[0]
+            df, keys = compute_indicators(df, date_col, interval, every)
+            bars = len(df)
+            columns = frame_to_columns(df, date_col, keys)
+            records = columns_to_records(columns)
+            results.append(timing(f"serialize/{name}/frame_to_columns", bars, measure(lambda: frame_to_columns(df, date_col, keys), self.repeat)))
+            results.append(timing(f"serialize/{name}/columns_to_records", bars, measure(lambda: columns_to_records(columns), self.repeat)))
+            results.append(timing(f"serialize/{name}/json_columns", bars, measure(lambda: json.dumps(columns), self.repeat),
+                                  payload_bytes=len(json.dumps(columns))))
+            results.append(timing(f"serialize/{name}/json_records", bars, measure(lambda: json.dumps(records), self.repeat),
+                                  payload_bytes=len(json.dumps(records))))
+        return results
+
+    def engine(self) -> List[Dict[str, Any]]:
+        results = []
+        for name in self.frames:
+            records = self._historical(name, None, layout='records')
+            for strategy, code in STRATEGIES.items():
+                def run():
+                    result = BacktestEngine(10000.0).run_strategy(code, records, SYMBOL, as_arrays=True)
+                    if 'error' in result:
+                        raise RuntimeError(f"{strategy}: {result['error']}")
+                results.append(timing(f"engine/{name}/{strategy}", len(records), measure(run, self.repeat)))
+        return results
+
+
+def replay(speeds: List[float], duration: float) -> List[Dict[str, Any]]:
+    """Replay throughput through /ws/replay with FastAPI's test client, acking every frame
+    like the frontend; falls back to driving the scheduler in-process (bench_replay) when
+    the API app cannot be imported."""
+    results = []
+    bars = int(max(speeds) * duration * 1.5) + 1000
+    try:
+        from fastapi.testclient import TestClient
+        import main
+    except ImportError as e:
+        import asyncio
+        from bench_replay import run
+        for speed in speeds:
+            out = asyncio.run(run(speed, duration, 0.0, bars))
+            results.append({'name': f"replay/scheduler/{speed:g}", 'unit': 'bars/s', 'better': 'higher',
+                            'value': out['achieved_bars_per_s'], 'ratio': out['ratio'], 'note': f"in-process: {e}"})
+        return results
+
+    frame = synthetic_frame('1m', bars // SESSION_MINUTES + 1)
+    columns = frame_to_columns(frame.reset_index(), 'Datetime', [])
+    dataset = main.dataset_registry.put(('BENCH', 'replay', bars), columns)
+    client = TestClient(main.app)  # not entered: no startup hooks (worker pool, symbol index)
+    for speed in speeds:
+        with client.websocket_connect(f"/ws/replay?protocol=delta&handle={dataset.handle}") as ws:
+            received = frames = sent_bytes = 0
+            ws.send_json({'action': 'play', 'speed': speed})
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                text = ws.receive_text()
+                msg = json.loads(text)
+                if msg.get('type') == 'candles':
+                    received += len(msg['columns']['time'])
+                    frames += 1
+                    sent_bytes += len(text)
+                    ws.send_json({'action': 'ack'})
+            elapsed = time.perf_counter() - start
+            ws.send_json({'action': 'pause'})
+        achieved = received / elapsed
+        results.append({'name': f"replay/ws/{speed:g}", 'unit': 'bars/s', 'better': 'higher', 'value': round(achieved, 1),
+                        'ratio': round(achieved / speed, 4), 'frames_per_s': round(frames / elapsed, 1),
+                        'bytes_per_frame': round(sent_bytes / frames) if frames else None})
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+        'seed': SEED,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Results more than `tolerance` (fractional) worse than the baseline entry of the same name."""
+    previous = {r['name']: r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if not before or not before.get('value') or not result.get('value'):
+            continue
+        if result['better'] == 'lower':
+            change = result['value'] / before['value'] - 1
+        else:
+            change = before['value'] / result['value'] - 1
+        result['baseline'] = before['value']
+        result['change'] = round(change, 4)
+        if change > tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=['realistic', 'stress', 'all'], default='realistic')
+    parser.add_argument('--groups', nargs='+', choices=['data', 'serialize', 'engine', 'replay'],
+                        default=['data', 'serialize', 'engine', 'replay'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--speeds', type=float, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per replay speed')
+    parser.add_argument('--output', help='write the results JSON here instead of stdout')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a result counts as a regression')
+    args = parser.parse_args()
+
+    sizes = {'realistic': REALISTIC_SIZES, 'stress': STRESS_SIZES, 'all': {**REALISTIC_SIZES, **STRESS_SIZES}}[args.suite]
+    results: List[Dict[str, Any]] = []
+    suite = Suite(sizes, args.repeat)
+    for group in ('data', 'serialize', 'engine'):
+        if group in args.groups:
+            print(f"Running {group} benchmarks...", file=sys.stderr)
+            results.extend(getattr(suite, group)())
+    if 'replay' in args.groups:
+        print("Running replay benchmarks...", file=sys.stderr)
+        results.extend(replay(args.speeds, args.duration))
+
+    report = {'suite': args.suite, 'repeat': args.repeat, 'environment': environment(), 'results': results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['regressions'] = [r['name'] for r in regressions]
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    for r in regressions:
+        print(f"REGRESSION {r['name']}: {r['baseline']:.6g} -> {r['value']:.6g} {r['unit']} ({r['change']:+.1%})", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
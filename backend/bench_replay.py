@@ -0,0 +1,83 @@
+"""Replay throughput benchmark: bars/s achieved by the replay scheduler versus requested.
+
+Drives ReplaySession/ReplayScheduler the way /ws/replay does, against an in-process client
+that acks every frame after a configurable latency, and prints one JSON object per speed.
+
+    python bench_replay.py --speeds 1 10 100 1000 10000 --duration 3 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from dataset_registry import Dataset
+from replay import ReplayScheduler, ReplaySession
+
+
+def synthetic_dataset(bars: int) -> Dataset:
+    start = 1_600_000_000
+    columns = {
+        'time': [start + 60 * i for i in range(bars)],
+        'open': [100.0] * bars,
+        'high': [101.0] * bars,
+        'low': [99.0] * bars,
+        'close': [100.5] * bars,
+        'volume': [1000.0] * bars,
+    }
+    return Dataset('bench', ('BENCH', '1m'), columns)
+
+
+async def run(speed: float, duration: float, latency: float, bars: int) -> dict:
+    session = ReplaySession(synthetic_dataset(bars), delta=True)
+    scheduler = ReplayScheduler(acks=True)
+    acks: asyncio.Queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    frames = sent_bytes = 0
+    first_index = session.index
+
+    scheduler.play(speed)
+    started = time.monotonic()
+    receive = asyncio.ensure_future(acks.get())
+    while time.monotonic() - started < duration:
+        timeout = scheduler.wait_time()
+        remaining = duration - (time.monotonic() - started)
+        done, _ = await asyncio.wait({receive}, timeout=remaining if timeout is None else min(timeout, remaining))
+        if receive in done:
+            scheduler.ack()
+            receive = asyncio.ensure_future(acks.get())
+        count = scheduler.due()
+        if count:
+            frame = session.next_candles(count)
+            if frame is None:
+                break
+            sent_bytes += len(json.dumps(frame))
+            frames += 1
+            scheduler.sent(count)
+            loop.call_later(latency, acks.put_nowait, True)
+    elapsed = time.monotonic() - started
+    receive.cancel()
+
+    achieved = (session.index - first_index) / elapsed
+    return {
+        'requested_bars_per_s': speed,
+        'achieved_bars_per_s': round(achieved, 1),
+        'ratio': round(achieved / speed, 4),
+        'frames_per_s': round(frames / elapsed, 1),
+        'bytes_per_s': round(sent_bytes / elapsed),
+        'client_latency_s': latency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--speeds', type=float, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds before the client acks a frame')
+    parser.add_argument('--bars', type=int, default=200_000)
+    args = parser.parse_args()
+    for speed in args.speeds:
+        print(json.dumps(asyncio.run(run(speed, args.duration, args.latency, args.bars))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from serialization import columns_to_records
+
+# Rough in-memory cost of one value held in a Python list (float object + list slot)
+LIST_VALUE_BYTES = 32
+# Rough cost of one value once it is also materialized in a row dict
+RECORD_VALUE_BYTES = 100
+
+
+def dataset_key(symbol: str, timeframe: str, start: Optional[str], end: Optional[str], indicators: Optional[str]) -> tuple:
+    """Identity of a /api/historical request; indicator specs are canonicalized so order does not matter."""
+    specs = []
+    if indicators:
+        try:
+            specs = sorted(json.dumps(spec, sort_keys=True) for spec in json.loads(indicators))
+        except (TypeError, ValueError):
+            specs = [indicators]
+    return (symbol.upper(), timeframe, start or '', end or '', tuple(specs))
+
+
+def columns_fingerprint(columns: Dict[str, list]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for key in ('time', 'open', 'high', 'low', 'close', 'volume'):
+        if key in columns:
+            h.update(key.encode())
+            h.update(np.asarray(columns[key], dtype='float64').tobytes())
+    return h.hexdigest()
+
+
+class Dataset:
+    """One fetched bar series held by the registry.
+
+    Columns are kept as returned by DataProvider (layout='columns'); row dicts for the
+    on_candle engine and replay, and NumPy arrays for windowed reads, are built on first
+    use and kept alongside.
+    """
+
+    def __init__(self, handle: str, key: tuple, columns: Dict[str, list]):
+        self.handle = handle
+        self.key = key
+        self.columns = columns
+        self.length = len(columns.get('time', []))
+        self.refs = 0
+        self._records: Optional[List[dict]] = None
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def records(self) -> List[dict]:
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    self._records = columns_to_records(self.columns)
+        return self._records
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Numeric columns as NumPy arrays (None -> NaN, time as int64) for windowing and downsampling."""
+        if self._arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    arrays = {}
+                    for key, values in self.columns.items():
+                        try:
+                            arrays[key] = np.array(values, dtype='float64')
+                        except (TypeError, ValueError):
+                            continue  # object columns such as VP profiles
+                    if 'time' in arrays:
+                        arrays['time'] = arrays['time'].astype('int64')
+                    self._arrays = arrays
+        return self._arrays
+
+    @property
+    def nbytes(self) -> int:
+        values = self.length * len(self.columns)
+        total = values * LIST_VALUE_BYTES
+        if self._records is not None:
+            total += values * RECORD_VALUE_BYTES
+        if self._arrays is not None:
+            total += sum(a.nbytes for a in self._arrays.values())
+        return total
+
+
+class DatasetRegistry:
+    """Datasets addressed by handle, shared between sessions and evicted LRU by memory.
+
+    The handle is derived from the request identity and the bar contents, so identical
+    (symbol, interval, range, indicators) requests resolve to the same dataset, while a
+    refetch that brought new bars gets a new handle without disturbing open replays of the
+    old one. Datasets referenced by an open replay socket (acquire/release) and the most
+    recently put one are never evicted.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._datasets: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latest: Optional[str] = None
+
+    def put(self, key: tuple, columns: Dict[str, list]) -> Dataset:
+        handle = hashlib.blake2b(repr((key, columns_fingerprint(columns))).encode(), digest_size=8).hexdigest()
+        with self._lock:
+            dataset = self._datasets.get(handle)
+            if dataset is None:
+                dataset = Dataset(handle, key, columns)
+                self._datasets[handle] = dataset
+            self._datasets.move_to_end(handle)
+            self._latest = handle
+            self._evict()
+        return dataset
+
+    def get(self, handle: Hashable) -> Optional[Dataset]:
+        with self._lock:
+            dataset = self._datasets.get(handle)
+            if dataset is not None:
+                self._datasets.move_to_end(handle)
+            return dataset
+
+    def latest(self) -> Optional[Dataset]:
+        """Most recently fetched dataset, for clients that do not send a handle yet."""
+        return self.get(self._latest) if self._latest else None
+
+    def acquire(self, handle: Hashable) -> Optional[Dataset]:
+        with self._lock:
+            dataset = self._datasets.get(handle)
+            if dataset is not None:
+                dataset.refs += 1
+                self._datasets.move_to_end(handle)
+            return dataset
+
+    def release(self, dataset: Dataset):
+        with self._lock:
+            dataset.refs = max(0, dataset.refs - 1)
+            self._evict()
+
+    def _evict(self):
+        total = sum(d.nbytes for d in self._datasets.values())
+        for handle in list(self._datasets.keys()):
+            if total <= self.max_bytes:
+                break
+            dataset = self._datasets[handle]
+            # The latest handle was just returned to a client, so it must resolve even when
+            # that dataset alone is over budget; it becomes evictable once another is put
+            if dataset.refs > 0 or handle == self._latest:
+                continue
+            del self._datasets[handle]
+            total -= dataset.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'datasets': len(self._datasets),
+                'bytes': sum(d.nbytes for d in self._datasets.values()),
+                'max_bytes': self.max_bytes,
+                'in_use': sum(1 for d in self._datasets.values() if d.refs > 0),
+            }
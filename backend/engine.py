@@ -1,75 +1,469 @@
-from typing import Dict, List, Optional
-from datetime import datetime
+import copy
+import hashlib
+from collections import OrderedDict
+from types import CodeType, ModuleType
+from typing import Dict, Optional, Union
+import numpy as np
+from array import array
+
+from instrumentation import metrics, timer
+from serialization import columns_to_records
+
+VECTORIZED_ENTRYPOINTS = ('signals', 'target_position')
+# Compiled strategies kept per process, so re-running unchanged code skips compile()
+CODE_CACHE_SIZE = 64
+
+_code_cache: "OrderedDict[str, CodeType]" = OrderedDict()
+_code_cache_stats = {'hits': 0, 'misses': 0}
+
+def strategy_hash(strategy_code: str) -> str:
+    return hashlib.blake2b(strategy_code.encode('utf-8'), digest_size=16).hexdigest()
+
+def compile_strategy(strategy_code: str) -> CodeType:
+    """Code object for strategy_code, from the per-process cache when the source is unchanged."""
+    key = strategy_hash(strategy_code)
+    code = _code_cache.get(key)
+    if code is not None:
+        _code_cache.move_to_end(key)
+        _code_cache_stats['hits'] += 1
+        return code
+    _code_cache_stats['misses'] += 1
+    with timer('strategy_compile'):
+        code = compile(strategy_code, '<strategy>', 'exec')
+    _code_cache[key] = code
+    if len(_code_cache) > CODE_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return code
+
+def code_cache_stats() -> Dict[str, int]:
+    return {**_code_cache_stats, 'size': len(_code_cache)}
+
+def uses_on_candle(strategy_code: str, mode: str = 'auto') -> bool:
+    """Whether run_strategy will call on_candle (and so needs row dicts), judged from the
+    top-level defs of the compiled code without executing it. Code that does not compile
+    counts as vectorized; run_strategy reports the error either way."""
+    if mode in ('candle', 'vectorized'):
+        return mode == 'candle'
+    try:
+        code = compile_strategy(strategy_code)
+    except SyntaxError:
+        return False
+    defined = {const.co_name for const in code.co_consts if isinstance(const, CodeType)} & set(code.co_names)
+    return not any(name in defined for name in VECTORIZED_ENTRYPOINTS)
+
+def records_to_columns(data: list[dict]) -> Dict[str, np.ndarray]:
+    # Numeric fields only; None (missing indicator values) becomes NaN
+    if not data:
+        return {}
+    columns = {}
+    for key, value in data[0].items():
+        if key == 'time' or isinstance(value, (int, float, bool)) or value is None:
+            try:
+                columns[key] = np.array([d.get(key) for d in data], dtype='float64')
+            except (TypeError, ValueError):
+                continue
+    if 'time' in columns:
+        columns['time'] = columns['time'].astype('int64')
+    return columns
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+def _buffer(typecode: str, size: int) -> array:
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+def _grow(buf: array):
+    buf.frombytes(bytes(buf.itemsize * len(buf)))
+
+def equity_curve(time: np.ndarray, close: np.ndarray, initial_capital: float, fill_bars: np.ndarray, fill_side: np.ndarray, fill_price: np.ndarray, fill_qty: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-bar end-of-bar cash, position and equity rebuilt from the fills with cumulative sums."""
+    n = len(close)
+    signed_qty = np.where(fill_side == SIDE_BUY, fill_qty, -fill_qty)
+    cash_delta = np.zeros(n)
+    position_delta = np.zeros(n)
+    np.add.at(cash_delta, fill_bars, -signed_qty * fill_price)
+    np.add.at(position_delta, fill_bars, signed_qty)
+    cash = initial_capital + np.cumsum(cash_delta)
+    position = np.cumsum(position_delta)
+    return {
+        'time': np.asarray(time).astype('int64'),
+        'equity': cash + position * np.asarray(close, dtype='float64'),
+        'cash': cash,
+        'position': position,
+    }
+
+def simulate_orders(time: np.ndarray, close: np.ndarray, initial_capital: float, orders: Optional[np.ndarray] = None, targets: Optional[np.ndarray] = None) -> dict:
+    """Fills an order array (qty > 0 buys, qty < 0 sells) or a target-position array at each
+    bar's close with the same rules as Portfolio.buy/sell: buys need enough cash, sells need
+    enough position (no shorting), rejected orders are dropped.
+
+    When no order would be rejected the fills are computed with cumulative sums only.
+    Otherwise just the bars carrying an order are walked in Python; the cash, position and
+    equity curves are rebuilt with cumulative sums either way.
+    """
+    close = np.asarray(close, dtype='float64')
+    if targets is not None:
+        targets = np.nan_to_num(np.asarray(targets, dtype='float64'))
+        # Orders are placed where the target changes, sized against the actual position
+        event_bars = np.flatnonzero(np.diff(targets, prepend=0.0) != 0)
+        qtys = np.diff(targets, prepend=0.0)[event_bars]
+    else:
+        orders = np.nan_to_num(np.asarray(orders, dtype='float64'))
+        event_bars = np.flatnonzero(orders != 0)
+        qtys = orders[event_bars]
+    prices = close[event_bars]
+
+    # Fast path: assume every order fills. Cumulative sums run left to right, so the running
+    # cash/position equal the sequential Portfolio arithmetic exactly.
+    cash_after = np.cumsum(np.concatenate([[initial_capital], -qtys * prices]))[1:]
+    position_after = np.cumsum(qtys)
+    feasible = np.all(np.where(qtys > 0, cash_after >= 0, position_after >= 0))
+
+    if feasible:
+        filled = np.ones(len(event_bars), dtype=bool)
+        fill_qtys = qtys
+    else:
+        filled = np.zeros(len(event_bars), dtype=bool)
+        fill_qtys = np.zeros(len(event_bars))
+        cash = initial_capital
+        position = 0.0
+        target_list = targets[event_bars].tolist() if targets is not None else None
+        for j, (qty, price) in enumerate(zip(qtys.tolist(), prices.tolist())):
+            if target_list is not None:
+                qty = target_list[j] - position
+            if qty > 0:
+                cost = qty * price
+                if cash >= cost:
+                    cash -= cost
+                    position += qty
+                    filled[j] = True
+                    fill_qtys[j] = qty
+            elif qty < 0:
+                if position >= -qty:
+                    cash += -qty * price
+                    position += qty
+                    filled[j] = True
+                    fill_qtys[j] = qty
+
+    fill_bars = event_bars[filled]
+    fill_qtys = fill_qtys[filled]
+    fill_prices = prices[filled]
+    time = np.asarray(time).astype('int64')
+    trades = {
+        'time': time[fill_bars],
+        'side': np.where(fill_qtys > 0, SIDE_BUY, SIDE_SELL).astype('int8'),
+        'price': fill_prices,
+        'qty': np.abs(fill_qtys),
+    }
+    return {
+        'fill_bars': fill_bars,
+        'trades': trades,
+        'curve': equity_curve(time, close, initial_capital, fill_bars, trades['side'], trades['price'], trades['qty']),
+    }
 
 class Portfolio:
+    """Cash/position bookkeeping for on_candle strategies.
+
+    Fills are kept in preallocated typed `array` buffers (grown by doubling, read by NumPy
+    without copying) instead of per-fill dicts, together with the index of the bar they
+    happened on, so the per-bar equity curve can be rebuilt afterwards in one vectorized pass.
+    `trades` is the legacy list of dicts, extended on access with the fills made since.
+    """
+    __slots__ = (
+        'cash', 'symbol', 'positions', '_current_price', '_current_time', '_bar_index',
+        '_n_trades', '_trade_bar', '_trade_time', '_trade_side', '_trade_price', '_trade_qty', '_trades',
+    )
+
     def __init__(self, initial_capital: float, current_symbol: str):
         self.cash = initial_capital
         self.symbol = current_symbol
         self.positions = 0.0
-        self.trades = []
         self._current_price = 0.0
         self._current_time = 0
+        self._bar_index = -1
+        
+        self._n_trades = 0
+        self._trade_bar = _buffer('q', 64)
+        self._trade_time = _buffer('q', 64)
+        self._trade_side = _buffer('b', 64)
+        self._trade_price = _buffer('d', 64)
+        self._trade_qty = _buffer('d', 64)
+        self._trades: list[dict] = []
         
     def set_price(self, price: float, timestamp: int):
         self._current_price = price
         self._current_time = timestamp
+        self._bar_index += 1
+
+    def _record_trade(self, side: int, qty: float):
+        i = self._n_trades
+        if i == len(self._trade_time):
+            for buf in (self._trade_bar, self._trade_time, self._trade_side, self._trade_price, self._trade_qty):
+                _grow(buf)
+        self._trade_bar[i] = self._bar_index
+        self._trade_time[i] = self._current_time
+        self._trade_side[i] = side
+        self._trade_price[i] = self._current_price
+        self._trade_qty[i] = qty
+        self._n_trades = i + 1
 
     def buy(self, qty: float):
         cost = qty * self._current_price
         if self.cash >= cost:
             self.cash -= cost
             self.positions += qty
-            self.trades.append({
-                'time': self._current_time,
-                'type': 'BUY',
-                'price': self._current_price,
-                'qty': qty
-            })
+            self._record_trade(SIDE_BUY, qty)
 
     def sell(self, qty: float):
         if self.positions >= qty:
             revenue = qty * self._current_price
             self.cash += revenue
             self.positions -= qty
-            self.trades.append({
-                'time': self._current_time,
-                'type': 'SELL',
-                'price': self._current_price,
-                'qty': qty
-            })
+            self._record_trade(SIDE_SELL, qty)
             
     def get_value(self):
         return self.cash + (self.positions * self._current_price)
 
+    def checkpoint(self) -> tuple:
+        # Fill buffers are append-only, so their count is enough to roll them back
+        return (self.cash, self.positions, self._current_price, self._current_time, self._bar_index, self._n_trades)
+
+    def restore(self, state: tuple):
+        self.cash, self.positions, self._current_price, self._current_time, self._bar_index, self._n_trades = state
+        del self._trades[self._n_trades:]
+
+    @property
+    def trade_count(self) -> int:
+        return self._n_trades
+
+    def trade_arrays(self, start: int = 0) -> Dict[str, np.ndarray]:
+        """Fills from index start onwards."""
+        count = self._n_trades - start
+        # Copies, so the buffers can keep growing while callers hold the result
+        return {
+            'time': np.frombuffer(self._trade_time, dtype='int64', count=count, offset=start * 8).copy(),
+            'side': np.frombuffer(self._trade_side, dtype='int8', count=count, offset=start).copy(),
+            'price': np.frombuffer(self._trade_price, dtype='float64', count=count, offset=start * 8).copy(),
+            'qty': np.frombuffer(self._trade_qty, dtype='float64', count=count, offset=start * 8).copy(),
+        }
+
+    def curve_arrays(self, time: np.ndarray, close: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+        """Per-bar equity/cash/position for the bars passed to set_price, in order."""
+        n = self._n_trades
+        trades = self.trade_arrays()
+        fill_bars = np.frombuffer(self._trade_bar, dtype='int64', count=n)
+        return equity_curve(time, close, initial_capital, fill_bars, trades['side'], trades['price'], trades['qty'])
+
+    @property
+    def trades(self) -> list[dict]:
+        # Only fills made since the last access are converted, so reading it on every bar stays cheap
+        if len(self._trades) < self._n_trades:
+            self._trades.extend(trades_from_arrays(self.trade_arrays(len(self._trades))))
+        return self._trades
+
+def trades_from_arrays(trades: Dict[str, np.ndarray]) -> list[dict]:
+    return [
+        {'time': t, 'type': 'BUY' if side == SIDE_BUY else 'SELL', 'price': p, 'qty': q}
+        for t, side, p, q in zip(trades['time'].tolist(), trades['side'].tolist(), trades['price'].tolist(), trades['qty'].tolist())
+    ]
+
+def arrays_to_json(arrays: Dict[str, np.ndarray]) -> Dict[str, list]:
+    return {k: v.tolist() for k, v in arrays.items()}
+
+def result_to_json(result: dict) -> dict:
+    """JSON form of an as_arrays=True run_strategy result.
+
+    "trades" keeps the row-of-dicts shape the frontend uses for markers;
+    trade_log and equity_curve carry the same fills and the per-bar curve as columns.
+    """
+    out = {key: value for key, value in result.items() if key not in ('trade_log', 'equity_curve')}
+    out['trades'] = trades_from_arrays(result['trade_log'])
+    out['trade_log'] = arrays_to_json(result['trade_log'])
+    out['equity_curve'] = arrays_to_json(result['equity_curve'])
+    return out
+
+
+class StrategyRunner:
+    """Runs an on_candle strategy incrementally, for replay-synchronized execution.
+
+    run_to(rows, end) processes bars up to `end` and returns the fills made on the way.
+    Every checkpoint_every bars, the portfolio scalars and a deep copy of the strategy's
+    globals are snapshotted (fills are append-only, so only their count is kept). Moving
+    back to an earlier bar restores the nearest snapshot and re-runs only the bars after it.
+    """
+
+    def __init__(self, strategy_code: str, symbol: str, initial_capital: float = 10000.0, params: Optional[dict] = None, checkpoint_every: int = 256):
+        self.strategy_code = strategy_code
+        self.symbol = symbol
+        self.initial_capital = initial_capital
+        self.params = dict(params or {})
+        self.checkpoint_every = checkpoint_every
+        self._checkpoints: Dict[int, tuple] = {}
+        self._reset()
+
+    def _reset(self):
+        self.env = {'np': np, 'params': dict(self.params)}
+        exec(compile_strategy(self.strategy_code), self.env)
+        self.on_candle = self.env.get('on_candle')
+        if not callable(self.on_candle):
+            raise ValueError("Strategy must define a function 'on_candle(candle, portfolio)'.")
+        self.portfolio = Portfolio(self.initial_capital, self.symbol)
+        self.bars_done = 0
+
+    def _user_state(self) -> dict:
+        return {k: v for k, v in self.env.items() if not (k.startswith('__') or callable(v) or isinstance(v, ModuleType))}
+
+    def _snapshot(self):
+        try:
+            state = copy.deepcopy(self._user_state())
+        except Exception:
+            # Strategy state that cannot be copied (open files, generators, ...): rewinds re-run from bar 0
+            self.checkpoint_every = 0
+            return
+        self._checkpoints[self.bars_done] = (state, self.portfolio.checkpoint())
+
+    def _restore(self, bar: int):
+        state, portfolio_state = self._checkpoints[bar]
+        for key in self._user_state():
+            del self.env[key]
+        self.env.update(copy.deepcopy(state))
+        self.portfolio.restore(portfolio_state)
+        self.bars_done = bar
+        # Later snapshots describe a future that is about to be re-run
+        for later in [b for b in self._checkpoints if b > bar]:
+            del self._checkpoints[later]
+
+    def rewind(self, bar: int):
+        if bar >= self.bars_done:
+            return
+        usable = [b for b in self._checkpoints if b <= bar]
+        if usable:
+            self._restore(max(usable))
+        else:
+            self._checkpoints.clear()
+            self._reset()
+
+    def _run(self, rows, end: int, equity: Optional[list] = None):
+        """Processes rows[bars_done:end], appending the portfolio value after each bar to equity."""
+        portfolio, on_candle = self.portfolio, self.on_candle
+        for i in range(self.bars_done, end):
+            if self.checkpoint_every and i % self.checkpoint_every == 0 and i not in self._checkpoints:
+                self.bars_done = i
+                self._snapshot()
+            candle = rows[i]
+            portfolio.set_price(candle['close'], candle['time'])
+            on_candle(candle, portfolio)
+            if equity is not None:
+                equity.append(portfolio.get_value())
+        self.bars_done = max(self.bars_done, end)
+
+    def run_to(self, rows, end: int) -> Dict[str, np.ndarray]:
+        """Processes rows[bars_done:end] (rewinding first if end is behind) and returns the new fills."""
+        self.rewind(end)
+        first_trade = self.portfolio.trade_count
+        self._run(rows, end)
+        return self.portfolio.trade_arrays(first_trade)
+
+    def advance(self, rows: list[dict], start: int, stop: int) -> dict:
+        """Runs bars start..stop-1; returns their fills, the equity after each bar and the state."""
+        self.rewind(start)
+        self._run(rows, start)
+        first_trade = self.portfolio.trade_count
+        equity: list = []
+        # One pass over the bars; fills are materialized once, after the last of them
+        self._run(rows, stop, equity)
+        return {'fills': trades_from_arrays(self.portfolio.trade_arrays(first_trade)), 'equity': equity, **self.state()}
+
+    def catch_up(self, rows: list[dict], index: int) -> dict:
+        """Runs (or rewinds) to the bar before index; returns every fill so far and the state."""
+        self.run_to(rows, index)
+        return {'trades': trades_from_arrays(self.portfolio.trade_arrays()), 'currentIndex': index, **self.state()}
+
+    def state(self) -> dict:
+        value = self.portfolio.get_value()
+        return {
+            'value': value,
+            'pnl': value - self.initial_capital,
+            'cash': self.portfolio.cash,
+            'position': self.portfolio.positions,
+        }
+
+
 class BacktestEngine:
     def __init__(self, initial_capital: float = 10000.0):
         self.initial_capital = initial_capital
 
-    def run_strategy(self, strategy_code: str, data: list[dict], symbol: str) -> dict:
-        portfolio = Portfolio(self.initial_capital, symbol)
-        
+    def run_strategy(self, strategy_code: str, data: Union[list[dict], Dict[str, np.ndarray]], symbol: str, mode: str = 'auto', params: Optional[dict] = None, as_arrays: bool = False) -> dict:
+        """Runs a strategy over the bars in data (row dicts or parallel columns).
+
+        mode='candle' calls on_candle(candle, portfolio) for every bar. mode='vectorized'
+        calls signals(data) or target_position(data) once with NumPy columns and fills the
+        returned array with simulate_orders. mode='auto' picks vectorized when the strategy
+        defines one of those functions. params is exposed to the strategy as a global dict.
+        as_arrays=True returns trade_log/equity_curve as NumPy columns and skips the
+        JSON-ready conversions (used by sweeps and analytics).
+        """
         # Prepare execution environment
-        exec_env = {}
+        exec_env = {'np': np, 'params': dict(params or {})}
         try:
-            # Compile and execute the user defined function
-            exec(strategy_code, exec_env)
+            # Execute the user defined function (compiled once per distinct source)
+            exec(compile_strategy(strategy_code), exec_env)
             on_candle = exec_env.get('on_candle')
+            vectorized = next((name for name in VECTORIZED_ENTRYPOINTS if callable(exec_env.get(name))), None)
+            
+            if mode == 'vectorized' or (mode == 'auto' and vectorized):
+                if not vectorized:
+                    return {"error": "Vectorized strategies must define 'signals(data)' or 'target_position(data)'."}
+                return self._run_vectorized(exec_env[vectorized], vectorized, data, as_arrays)
             
             if not on_candle or not callable(on_candle):
                 return {"error": "Strategy must define a function 'on_candle(candle, portfolio)'."}
                 
+            if isinstance(data, dict):
+                data = columns_to_records(data)
+            portfolio = Portfolio(self.initial_capital, symbol)
+            
             # Run the strategy loop over historical data
-            for candle in data:
-                portfolio.set_price(candle['close'], candle['time'])
-                on_candle(candle, portfolio)
+            metrics.inc('strategy_bars', len(data), mode='candle')
+            with timer('strategy_loop', mode='candle'):
+                for candle in data:
+                    portfolio.set_price(candle['close'], candle['time'])
+                    on_candle(candle, portfolio)
                 
-            final_pnl = portfolio.get_value() - self.initial_capital
-            return {
-                "success": True,
-                "pnl": final_pnl,
-                "final_value": portfolio.get_value(),
-                "trades": portfolio.trades
-            }
+            times = np.fromiter((candle['time'] for candle in data), dtype='int64', count=len(data))
+            closes = np.fromiter((candle['close'] for candle in data), dtype='float64', count=len(data))
+            curve = portfolio.curve_arrays(times, closes, self.initial_capital)
+            return self._result(portfolio.get_value(), portfolio.trade_arrays(), curve, as_arrays)
             
         except Exception as e:
-            return {"error": f"Strategy execution failed: {str(e)}"}
+            # MemoryError and friends carry no message
+            return {"error": f"Strategy execution failed: {str(e) or type(e).__name__}"}
+
+    def _run_vectorized(self, strategy_fn, kind: str, data: Union[list[dict], Dict[str, np.ndarray]], as_arrays: bool = False) -> dict:
+        columns = data if isinstance(data, dict) else records_to_columns(data)
+        columns = {k: np.asarray(v) for k, v in columns.items()}
+        close = columns['close'].astype('float64')
+        
+        metrics.inc('strategy_bars', len(close), mode='vectorized')
+        with timer('strategy_loop', mode='vectorized'):
+            result = np.asarray(strategy_fn(columns), dtype='float64')
+        if result.shape != close.shape:
+            return {"error": f"{kind}(data) must return one value per bar ({len(close)}), got shape {result.shape}."}
+            
+        if kind == 'target_position':
+            sim = simulate_orders(columns['time'], close, self.initial_capital, targets=result)
+        else:
+            sim = simulate_orders(columns['time'], close, self.initial_capital, orders=result)
+            
+        final_value = float(sim['curve']['equity'][-1]) if len(close) else self.initial_capital
+        return self._result(final_value, sim['trades'], sim['curve'], as_arrays)
+
+    def _result(self, final_value: float, trades: Dict[str, np.ndarray], curve: Dict[str, np.ndarray], as_arrays: bool = False) -> dict:
+        result = {
+            "success": True,
+            "pnl": final_value - self.initial_capital,
+            "final_value": final_value,
+            "trade_log": trades,
+            "equity_curve": curve
+        }
+        return result if as_arrays else result_to_json(result)
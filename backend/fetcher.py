@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional
+
+import pandas as pd
+
+from bar_store import BarStore, _to_utc, normalize_symbol
+
+# Open-ended requests ("the last N days up to now") started within this many seconds of each
+# other are treated as the same request
+COALESCE_WINDOW_SECONDS = 60
+
+
+class BarFetcher:
+    """Coalescing, bounded-concurrency front end of a BarStore.
+
+    fetch() returns a Future for the bars of (symbol, interval, range); identical requests
+    that arrive while one is in flight get that same Future instead of a second download.
+    fetch_many() does the same per symbol and sends the symbols that are not already in
+    flight to the store as one batch, which the provider can serve with a single bulk
+    download. All store access runs on a pool of max_workers threads, which bounds the
+    number of concurrent upstream requests.
+    """
+
+    def __init__(self, store: BarStore, max_workers: int = 4):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bar-fetch')
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    @staticmethod
+    def _key(symbol: str, interval: str, start, end) -> tuple:
+        start_bucket = int(_to_utc(start).timestamp() // COALESCE_WINDOW_SECONDS)
+        end_key = None if end is None else _to_utc(end).timestamp()
+        return (normalize_symbol(symbol), interval, start_bucket, end_key)
+
+    def _claim(self, keys: List[tuple]) -> Dict[tuple, Future]:
+        """In-flight futures for keys, registering new ones for keys nobody is fetching yet.
+
+        Returns only the newly registered futures; callers must resolve them.
+        """
+        new = {}
+        for key in keys:
+            self.requests += 1
+            if key in self._inflight:
+                self.coalesced += 1
+                continue
+            future = Future()
+            future.add_done_callback(lambda _, key=key: self._forget(key))
+            self._inflight[key] = future
+            new[key] = future
+        return new
+
+    def _forget(self, key: tuple):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def fetch(self, symbol: str, interval: str, start, end=None) -> "Future[pd.DataFrame]":
+        return self.fetch_many([symbol], interval, start, end)[symbol]
+
+    def fetch_many(self, symbols: List[str], interval: str, start, end=None) -> Dict[str, "Future[pd.DataFrame]"]:
+        keys = {symbol: self._key(symbol, interval, start, end) for symbol in symbols}
+        with self._lock:
+            new = self._claim(list(dict.fromkeys(keys.values())))
+            futures = {symbol: self._inflight[key] for symbol, key in keys.items()}
+            if new:
+                self.batches += 1
+
+        if new:
+            batch = [symbol for symbol, key in keys.items() if key in new]
+            batch = list({normalize_symbol(s): s for s in batch}.values())
+            self._pool.submit(self._run_batch, batch, interval, start, end, {normalize_symbol(s): new[keys[s]] for s in batch})
+        return futures
+
+    def _run_batch(self, symbols: List[str], interval: str, start, end, futures: Dict[str, Future]):
+        try:
+            frames = self.store.get_bars_many(symbols, interval, start, end)
+            for symbol in symbols:
+                futures[normalize_symbol(symbol)].set_result(frames[symbol])
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+
+    def prefetch(self, symbols: List[str], interval: str, start, end=None, timeout: Optional[float] = None) -> Dict[str, int]:
+        """Warms the store for a watchlist; returns the number of bars now held per symbol (-1 on failure)."""
+        futures = self.fetch_many(symbols, interval, start, end)
+        counts = {}
+        for symbol, future in futures.items():
+            try:
+                counts[symbol] = len(future.result(timeout=timeout))
+            except Exception as e:
+                print(f"Error prefetching {symbol} {interval} bars: {e}")
+                counts[symbol] = -1
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'in_flight': len(self._inflight),
+            }
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Rough per-object cost for object columns (VP session profiles)
+OBJECT_OVERHEAD_BYTES = 512
+
+
+def bar_fingerprint(df: pd.DataFrame, date_col: str) -> str:
+    """Digest of the bar timestamps and OHLCV values; changes whenever any bar does."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.DatetimeIndex(df[date_col]).as_unit('ns').asi8.tobytes())
+    for col in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype='float64')).tobytes())
+    return h.hexdigest()
+
+
+def _nbytes(outputs: Dict[str, np.ndarray]) -> int:
+    total = 0
+    for values in outputs.values():
+        total += values.nbytes
+        if values.dtype == object:
+            total += OBJECT_OVERHEAD_BYTES * int(np.count_nonzero(values != None))  # noqa: E711
+    return total
+
+
+class IndicatorCache:
+    """In-process LRU of computed indicator outputs, evicted by total size in bytes.
+
+    Keys are (symbol, interval, bar fingerprint, canonical indicator spec); values are
+    {output suffix: read-only array}. The fingerprint covers the bar timestamps, so it
+    also pins the date range the values were computed over.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, outputs: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for suffix, values in outputs.items():
+            arr = np.array(values.to_numpy() if isinstance(values, pd.Series) else values)
+            arr.flags.writeable = False
+            arrays[suffix] = arr
+        size = _nbytes(arrays)
+        if size > self.max_bytes:
+            return arrays
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (arrays, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return arrays
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,297 @@
+import re
+import pandas as pd
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple
+from volume_profile import compute_volume_profile, session_payload
+from instrumentation import metrics, timer
+
+# Intervals whose VWAP resets every session instead of accumulating over the whole range
+INTRADAY_INTERVALS = ('1m', '5m', '1h')
+
+
+def is_intraday(interval: str) -> bool:
+    # Also covers resampled timeframes such as 15m or 4h
+    return interval in INTRADAY_INTERVALS or re.fullmatch(r'\d+[mh]', interval or '') is not None
+
+
+class IndicatorContext:
+    """Per-request evaluation context for the indicator graph.
+
+    Every shared intermediate (EMAs, rolling windows, true range, session groupings, ...)
+    is a node keyed by what it computes, so it is evaluated at most once per request no
+    matter how many indicators depend on it.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_col: str, interval: str):
+        self.df = df
+        self.date_col = date_col
+        self.interval = interval
+        self._nodes: Dict[Tuple, Any] = {}
+
+    def node(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        if key not in self._nodes:
+            self._nodes[key] = compute()
+        return self._nodes[key]
+
+    def source(self, source) -> pd.Series:
+        # Plain strings are bar columns, tuples are keys of already computed nodes
+        if isinstance(source, str):
+            return self.df[source]
+        return self._nodes[source]
+
+    def ema(self, span: int, source='Close') -> pd.Series:
+        return self.node(('ema', source, span), lambda: self.source(source).ewm(span=span, adjust=False).mean())
+
+    def rolling_mean(self, source, window: int) -> pd.Series:
+        return self.node(('rolling_mean', source, window), lambda: self.source(source).rolling(window=window).mean())
+
+    def rolling_std(self, source, window: int) -> pd.Series:
+        return self.node(('rolling_std', source, window), lambda: self.source(source).rolling(window=window).std())
+
+    def diff(self, source='Close') -> pd.Series:
+        return self.node(('diff', source), lambda: self.source(source).diff())
+
+    def gain(self, source='Close') -> pd.Series:
+        delta = self.diff(source)
+        return self.node(('gain', source), lambda: delta.where(delta > 0, 0))
+
+    def loss(self, source='Close') -> pd.Series:
+        delta = self.diff(source)
+        return self.node(('loss', source), lambda: -delta.where(delta < 0, 0))
+
+    def true_range(self) -> pd.Series:
+        def compute():
+            prev_close = self.df['Close'].shift()
+            high_low = self.df['High'] - self.df['Low']
+            high_close = (self.df['High'] - prev_close).abs()
+            low_close = (self.df['Low'] - prev_close).abs()
+            return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        return self.node(('true_range',), compute)
+
+    def typical_volume(self) -> pd.Series:
+        def compute():
+            typical_price = (self.df['High'] + self.df['Low'] + self.df['Close']) / 3
+            return typical_price * self.df['Volume']
+        return self.node(('typical_volume',), compute)
+
+    def session_codes(self) -> np.ndarray:
+        """0-based session (trading date, exchange local time) of every bar."""
+        return self.node(('session_codes',), lambda: pd.factorize(self.df[self.date_col].dt.normalize())[0])
+
+    def session_cumsum(self, source) -> pd.Series:
+        codes = self.session_codes()
+        return self.node(('session_cumsum', source), lambda: self.source(source).groupby(codes).cumsum())
+
+    def cumsum(self, source) -> pd.Series:
+        return self.node(('cumsum', source), lambda: self.source(source).cumsum())
+
+    def session_agg(self, column: str, how: str) -> np.ndarray:
+        """Per-session aggregate of a bar column, indexed by session code."""
+        codes = self.session_codes()
+        return self.node(('session_agg', column, how), lambda: self.df[column].groupby(codes).agg(how).to_numpy())
+
+
+class IndicatorDef:
+    def __init__(self, name: str, compute: Callable, inputs: Tuple[str, ...], outputs: Tuple[str, ...], params: Dict[str, Tuple[type, Any]]):
+        self.name = name
+        self.compute = compute
+        self.inputs = inputs
+        # Output suffixes; '' means the column is named after the indicator id itself
+        self.outputs = outputs
+        self.params = params
+
+    def normalize_params(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Fills defaults and coerces types, so equivalent requests share one canonical form."""
+        raw = raw or {}
+        return {name: cast(raw.get(name, default)) for name, (cast, default) in self.params.items()}
+
+    def output_columns(self, ind_id: str) -> List[str]:
+        return [ind_id if suffix == '' else f"{ind_id}_{suffix}" for suffix in self.outputs]
+
+
+INDICATORS: Dict[str, IndicatorDef] = {}
+
+
+def register(name: str, inputs: Tuple[str, ...], outputs: Tuple[str, ...] = ('',), params: Dict[str, Tuple[type, Any]] = None):
+    """Registers an indicator. compute(ctx, **params) returns {output suffix: values}."""
+    def decorator(compute: Callable) -> Callable:
+        INDICATORS[name] = IndicatorDef(name, compute, inputs, outputs, params or {})
+        return compute
+    return decorator
+
+
+@register('EMA', inputs=('Close',), params={'length': (int, 20)})
+def _ema(ctx: IndicatorContext, length: int):
+    return {'': ctx.ema(length)}
+
+
+@register('RSI', inputs=('Close',), params={'length': (int, 14)})
+def _rsi(ctx: IndicatorContext, length: int):
+    ctx.gain()
+    ctx.loss()
+    rs = ctx.rolling_mean(('gain', 'Close'), length) / ctx.rolling_mean(('loss', 'Close'), length)
+    return {'': 100 - (100 / (1 + rs))}
+
+
+@register('VWAP', inputs=('High', 'Low', 'Close', 'Volume'))
+def _vwap(ctx: IndicatorContext):
+    ctx.typical_volume()
+    if is_intraday(ctx.interval):
+        return {'': ctx.session_cumsum(('typical_volume',)) / ctx.session_cumsum('Volume')}
+    return {'': ctx.cumsum(('typical_volume',)) / ctx.cumsum('Volume')}
+
+
+@register('MACD', inputs=('Close',), outputs=('macd', 'signal', 'hist'),
+          params={'fast': (int, 12), 'slow': (int, 26), 'signal': (int, 9)})
+def _macd(ctx: IndicatorContext, fast: int, slow: int, signal: int):
+    macd_line = ctx.node(('macd_line', fast, slow), lambda: ctx.ema(fast) - ctx.ema(slow))
+    signal_line = ctx.ema(signal, source=('macd_line', fast, slow))
+    return {'macd': macd_line, 'signal': signal_line, 'hist': macd_line - signal_line}
+
+
+@register('BB', inputs=('Close',), outputs=('upper', 'middle', 'lower'),
+          params={'length': (int, 20), 'multiplier': (float, 2.0)})
+def _bb(ctx: IndicatorContext, length: int, multiplier: float):
+    sma = ctx.rolling_mean('Close', length)
+    std = ctx.rolling_std('Close', length)
+    return {'upper': sma + (std * multiplier), 'middle': sma, 'lower': sma - (std * multiplier)}
+
+
+@register('ATR', inputs=('High', 'Low', 'Close'), params={'length': (int, 14)})
+def _atr(ctx: IndicatorContext, length: int):
+    ctx.true_range()
+    return {'': ctx.rolling_mean(('true_range',), length)}
+
+
+@register('FVG', inputs=('Open', 'High', 'Low', 'Close'), outputs=('bull', 'bear', 'top', 'bottom'))
+def _fvg(ctx: IndicatorContext):
+    # Fair Value Gap:
+    # Bullish FVG: Low of candle 3 > High of candle 1
+    # Bearish FVG: High of candle 3 < Low of candle 1
+    df = ctx.df
+    high_2 = df['High'].shift(2)
+    low_2 = df['Low'].shift(2)
+    bull = (df['Low'] > high_2) & (df['Close'].shift(1) > df['Open'].shift(1))
+    bear = (df['High'] < low_2) & (df['Close'].shift(1) < df['Open'].shift(1))
+    # FVG box top and bottom
+    top = np.where(bear, low_2, np.where(bull, df['Low'], np.nan))
+    bottom = np.where(bear, df['High'], np.where(bull, high_2, np.nan))
+    return {'bull': bull, 'bear': bear, 'top': top, 'bottom': bottom}
+
+
+@register('DAILY_LEVELS', inputs=('High', 'Low'), outputs=('prev_high', 'prev_low'))
+def _daily_levels(ctx: IndicatorContext):
+    # Previous session's high/low joined back onto every bar of the next session
+    codes = ctx.session_codes()
+    prev = codes - 1
+    has_prev = prev >= 0
+    highs = ctx.session_agg('High', 'max')
+    lows = ctx.session_agg('Low', 'min')
+    return {
+        'prev_high': np.where(has_prev, highs[np.maximum(prev, 0)], np.nan),
+        'prev_low': np.where(has_prev, lows[np.maximum(prev, 0)], np.nan),
+    }
+
+
+@register('VP', inputs=('High', 'Low', 'Volume'), outputs=('poc', 'vah', 'val', 'profile'),
+          params={'value_area': (float, 70.0), 'bins': (int, 50)})
+def _vp(ctx: IndicatorContext, value_area: float, bins: int):
+    codes = ctx.session_codes()
+    df = ctx.df
+    vp = compute_volume_profile(
+        codes,
+        df['High'].to_numpy(dtype='float64'),
+        df['Low'].to_numpy(dtype='float64'),
+        df['Volume'].to_numpy(dtype='float64'),
+        num_bins=bins,
+        value_area=value_area / 100.0,
+    )
+    # The profile is sent once per session, on its first bar
+    profiles = np.full(len(df), None, dtype=object)
+    sessions, first_rows = np.unique(codes, return_index=True)
+    for session, row in zip(sessions, first_rows):
+        profiles[row] = session_payload(vp, session)
+    return {'poc': vp['poc'][codes], 'vah': vp['vah'][codes], 'val': vp['val'][codes], 'profile': profiles}
+
+
+class IndicatorPlan:
+    """Deduplicated set of computations for one request.
+
+    Identical (type, params) requests are bound to a single computation; the shared
+    intermediates they depend on are deduplicated by the IndicatorContext at evaluation.
+    """
+
+    def __init__(self, specs: List[Dict[str, Any]]):
+        self.computations: Dict[Tuple, Tuple[IndicatorDef, Dict[str, Any]]] = {}
+        self.bindings: List[Tuple[str, Tuple]] = []
+        for spec in specs:
+            definition = INDICATORS.get(spec.get('type'))
+            if definition is None:
+                print(f"Unknown indicator type: {spec.get('type')}")
+                continue
+            params = definition.normalize_params(spec.get('params'))
+            key = (definition.name, tuple(sorted(params.items())))
+            self.computations.setdefault(key, (definition, params))
+            self.bindings.append((spec.get('id'), key))
+
+    def evaluate(self, df: pd.DataFrame, date_col: str, interval: str, cache=None, cache_prefix: Tuple = (),
+                 streams=None, series_key: Tuple = ()) -> Tuple[pd.DataFrame, List[str]]:
+        """Runs each distinct computation once and returns df with the output columns appended.
+
+        With an IndicatorCache, results are looked up under cache_prefix + (computation key,)
+        first, so only indicators that were not computed before for these bars are evaluated.
+        With a StreamingStore, indicators that have a streaming form are computed by it for
+        series_key, so a series that only gained bars is not recomputed.
+        """
+        ctx = IndicatorContext(df, date_col, interval)
+        results: Dict[Tuple, Dict[str, Any]] = {}
+        pending = {}
+        for key, computation in self.computations.items():
+            cached = cache.get(cache_prefix + (key,)) if cache is not None else None
+            if cached is not None:
+                results[key] = cached
+            else:
+                pending[key] = computation
+
+        streamed: Dict[Tuple, Dict[str, Any]] = {}
+        if streams is not None and pending:
+            try:
+                with timer('indicator', type='streaming'):
+                    streamed = streams.outputs(series_key, pending, df, date_col, interval, ctx)
+            except Exception as e:
+                metrics.inc('errors', stage='indicator')
+                print(f"Error updating streaming indicators: {e}")
+
+        for key, (definition, params) in pending.items():
+            outputs = streamed.get(key)
+            if outputs is None:
+                try:
+                    with timer('indicator', type=definition.name):
+                        outputs = definition.compute(ctx, **params)
+                except Exception as e:
+                    metrics.inc('errors', stage='indicator')
+                    print(f"Error calculating {definition.name} indicator: {e}")
+                    continue
+            results[key] = cache.put(cache_prefix + (key,), outputs) if cache is not None else outputs
+
+        columns: Dict[str, Any] = {}
+        indicator_keys: List[str] = []
+        for ind_id, key in self.bindings:
+            definition = self.computations[key][0]
+            names = definition.output_columns(ind_id)
+            indicator_keys.extend(names)
+            if key not in results:
+                continue
+            for suffix, name in zip(definition.outputs, names):
+                values = results[key][suffix]
+                columns[name] = values.to_numpy() if isinstance(values, pd.Series) else values
+
+        if columns:
+            df = pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+        return df, indicator_keys
+
+
+def compute_indicators(df: pd.DataFrame, date_col: str, interval: str, specs: List[Dict[str, Any]], cache=None, cache_prefix: Tuple = (),
+                       streams=None, series_key: Tuple = ()) -> Tuple[pd.DataFrame, List[str]]:
+    return IndicatorPlan(specs).evaluate(df, date_col, interval, cache=cache, cache_prefix=cache_prefix,
+                                         streams=streams, series_key=series_key)
@@ -0,0 +1,222 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'backtest_'
+# Seconds between stack samples while a request is being profiled
+PROFILE_INTERVAL_SECONDS = 0.005
+
+_LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> _LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """Process-wide counters and summaries (count/sum/max of observations), keyed by name and labels.
+
+    Pool workers drain() theirs after every job and the parent merge()s them, so one
+    /api/metrics scrape covers work done in any process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[_LabelKey, float] = {}
+        self._summaries: Dict[_LabelKey, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    def drain(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {'counters': self._counters, 'summaries': self._summaries}
+            self._counters, self._summaries = {}, {}
+        return data
+
+    def merge(self, data: Dict[str, Any]):
+        with self._lock:
+            for key, value in data['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (count, total, peak) in data['summaries'].items():
+                summary = self._summaries.get(key)
+                if summary is None:
+                    self._summaries[key] = [count, total, peak]
+                else:
+                    summary[0] += count
+                    summary[1] += total
+                    summary[2] = max(summary[2], peak)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(self._counters.items())]
+            summaries = [{'name': name, 'labels': dict(labels), 'count': s[0], 'sum': s[1], 'max': s[2], 'mean': s[1] / s[0]}
+                         for (name, labels), s in sorted(self._summaries.items())]
+        return {'counters': counters, 'summaries': summaries}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format: counters as *_total, summaries as _count/_sum and a *_max gauge."""
+        def labels_text(labels) -> str:
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{labels_text(labels)} {value:g}")
+        # Each family has to be contiguous, so the peaks follow as separate gauge families
+        for suffix, kind in (('', 'summary'), ('_max', 'gauge')):
+            for (name, labels), (count, total, peak) in summaries:
+                metric = f"{METRIC_PREFIX}{name}{suffix}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                if suffix:
+                    lines.append(f"{metric}{labels_text(labels)} {peak:.6g}")
+                else:
+                    lines.append(f"{metric}_count{labels_text(labels)} {count:g}")
+                    lines.append(f"{metric}_sum{labels_text(labels)} {total:.6g}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+# Stage timings of the current request, when it asked for a Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+
+def add_request_timing(stage: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Times the block into the `<name>_seconds` summary and the request's Server-Timing stages."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe(f"{name}_seconds", elapsed, **labels)
+        add_request_timing('_'.join([name] + [str(v) for v in labels.values()]), elapsed)
+
+
+@contextmanager
+def collect_timings():
+    """Collects the stages timed inside the block (in this context) into the yielded list."""
+    timings: List[Tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value; repeated stages (e.g. two EMAs) are summed."""
+    durations: Dict[str, float] = {}
+    counts: Counter = Counter()
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+        counts[stage] += 1
+    parts = []
+    for stage, seconds in durations.items():
+        desc = f';desc="x{counts[stage]}"' if counts[stage] > 1 else ''
+        parts.append(f"{stage};dur={seconds * 1000:.2f}{desc}")
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(parts)
+
+
+class StackSampler:
+    """Minimal sampling profiler: a thread that snapshots every other thread's stack.
+
+    Samples cover all threads, so executor and fetch-pool work done for the request is
+    included (as is anything else running at the time). write() saves the collapsed-stack
+    format ("frame;frame;frame count" per line) read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, directory: Optional[str] = None) -> str:
+        directory = directory or os.getenv('PROFILE_DIR') or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiled():
+    """Samples stacks for the duration of the block; yields a one-item list that receives
+    the report path. Only one block profiles at a time, others run unprofiled (path None)."""
+    report: List[Optional[str]] = [None]
+    if not _profile_lock.acquire(blocking=False):
+        yield report
+        return
+    sampler = StackSampler()
+    try:
+        sampler.start()
+        yield report
+    finally:
+        sampler.stop()
+        _profile_lock.release()
+        report[0] = sampler.write()
@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine import strategy_hash
+from instrumentation import metrics, timer
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+# Requests in flight to the model at once; later ones wait for a slot
+DEFAULT_CONCURRENCY = 4
+# Answers kept by (strategy, context, conversation, question), and for how long
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL_SECONDS = 3600.0
+# Candles and indicator readings shown to the model, ending at the replay position
+RECENT_CANDLES = 10
+# Strategy code beyond this many characters is cut off in the prompt
+MAX_CODE_CHARS = 8000
+# Dataset summaries and backtest summaries remembered for later questions
+SUMMARY_CACHE_SIZE = 64
+
+SYSTEM_INSTRUCTION = (
+    "You are an expert quantitative developer and AI Trading Assistant. "
+    "Analyze the user's trading strategy, performance metrics, and current market data, "
+    "and answer their questions clearly and concisely."
+)
+
+OHLCV_KEYS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+History = List[Tuple[str, str]]
+
+
+def _num(value: Any) -> str:
+    if value is None or (isinstance(value, float) and not np.isfinite(value)):
+        return '-'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    return f"{float(value):.6g}"
+
+
+def dataset_summary(dataset, end: Optional[int] = None, recent: int = RECENT_CANDLES) -> str:
+    """Key stats of bars [0, end) of a registry dataset, its last candles and indicator readings."""
+    arrays = dataset.arrays
+    times = arrays.get('time')
+    if times is None or not len(times):
+        return "No market data loaded."
+    end = len(times) if end is None else max(1, min(end, len(times)))
+    close = arrays['close'][:end]
+    first, last = close[0], close[end - 1]
+    returns = np.diff(close) / close[:-1] if end > 1 else np.zeros(0)
+    lines = [
+        f"Bars: {end} of {len(times)} ({_date(times[0])} to {_date(times[end - 1])})",
+        f"Close: {_num(last)} (first {_num(first)}, change {_num((last / first - 1) * 100)}%)",
+        f"Range: high {_num(np.nanmax(arrays['high'][:end]))}, low {_num(np.nanmin(arrays['low'][:end]))}",
+        f"Bar return volatility: {_num(np.nanstd(returns) * 100)}%",
+    ]
+    indicators = [key for key in arrays if key not in OHLCV_KEYS]
+    if indicators:
+        lines.append("Indicators at last bar: " + ', '.join(f"{key}={_num(arrays[key][end - 1])}" for key in indicators))
+    lo = max(0, end - recent)
+    lines.append("Recent candles (time,open,high,low,close,volume):")
+    for i in range(lo, end):
+        lines.append(','.join([_date(times[i])] + [_num(arrays[key][i]) for key in OHLCV_KEYS[1:] if key in arrays]))
+    return '\n'.join(lines)
+
+
+def _date(ts) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.gmtime(int(ts)))
+
+
+def backtest_summary(result: Dict[str, Any]) -> str:
+    """One line of scalar results and metrics of an /api/backtest response."""
+    stats = {key: result.get(key) for key in ('pnl', 'final_value')}
+    stats['trades'] = len(result.get('trades') or [])
+    for key, value in (result.get('metrics') or {}).items():
+        if isinstance(value, (int, float)) or value is None:
+            stats[key] = value
+    return ', '.join(f"{key}={_num(value)}" for key, value in stats.items())
+
+
+def build_prompt(question: str, context: Dict[str, Any], market: Optional[str], backtest: Optional[str]) -> str:
+    code = context.get('strategyCode') or 'N/A'
+    if len(code) > MAX_CODE_CHARS:
+        code = code[:MAX_CODE_CHARS] + "\n# ... (truncated)"
+    parts = [f"Strategy Code:\n{code}", f"Symbol: {context.get('symbol', 'N/A')}"]
+    if backtest:
+        parts.append(f"Backtest: {backtest}")
+    else:
+        parts.append(f"PnL: {context.get('pnl', 'N/A')}")
+    if market:
+        parts.append(f"Market Data:\n{market}")
+    elif context.get('lastCandle'):
+        parts.append(f"Latest Candle: {json.dumps(context.get('lastCandle'))}")
+    return "Context Data:\n" + '\n'.join(parts) + f"\n\nUser Question:\n{question}"
+
+
+class StubBackend:
+    """Offline backend that streams a canned (or echoed) answer a few words at a time."""
+
+    name = 'stub'
+
+    def __init__(self, reply: Optional[str] = None, delay: float = 0.0, words_per_chunk: int = 3):
+        self.reply = reply
+        # Simulated latency before each chunk
+        self.delay = delay
+        self.words_per_chunk = words_per_chunk
+        self.calls = []
+
+    async def stream(self, system: str, history: History, prompt: str) -> AsyncIterator[str]:
+        self.calls.append((system, list(history), prompt))
+        question = prompt.rsplit("User Question:\n", 1)[-1]
+        words = (self.reply or f"Stub answer to: {question}").split(' ')
+        for i in range(0, len(words), self.words_per_chunk):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield (' ' if i else '') + ' '.join(words[i:i + self.words_per_chunk])
+
+    async def aclose(self):
+        pass
+
+
+class GeminiBackend:
+    """Google Gemini through one long-lived client, whose HTTP connections are reused across requests."""
+
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL):
+        from google import genai
+        self.types = genai.types
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+
+    async def stream(self, system: str, history: History, prompt: str) -> AsyncIterator[str]:
+        types = self.types
+        contents = [
+            types.Content(role="model" if role == "assistant" else "user", parts=[types.Part.from_text(text=text)])
+            for role, text in history
+        ]
+        contents.append(types.Content(role="user", parts=[types.Part.from_text(text=prompt)]))
+        chunks = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=types.GenerateContentConfig(system_instruction=system),
+        )
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+    async def aclose(self):
+        close = getattr(self.client.aio, 'aclose', None)
+        if close is not None:
+            await close()
+
+
+class LLMGateway:
+    """Async front of an LLM backend: bounded concurrency, an answer cache and compact context.
+
+    Context is a short text summary built server-side: stats, recent candles and indicator
+    readings of the registry dataset up to the replay position, plus the metrics of the last
+    backtest of the same strategy on it (record_backtest), instead of raw client data.
+    """
+
+    def __init__(self, backend, max_concurrency: int = DEFAULT_CONCURRENCY, cache_size: int = DEFAULT_CACHE_SIZE,
+                 cache_ttl: float = DEFAULT_CACHE_TTL_SECONDS, system_instruction: str = SYSTEM_INSTRUCTION):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.system_instruction = system_instruction
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._answers: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._summaries: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._backtests: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    def _remember(self, store: OrderedDict, key, value, limit: int):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > limit:
+                store.popitem(last=False)
+
+    def record_backtest(self, handle: str, strategy_code: str, result: Dict[str, Any]):
+        """Keeps the summary of a finished backtest for questions about the same strategy and data."""
+        if 'error' not in result:
+            self._remember(self._backtests, (handle, strategy_hash(strategy_code)), backtest_summary(result), SUMMARY_CACHE_SIZE)
+
+    def market_summary(self, dataset, last_time: Optional[float] = None) -> str:
+        end = None
+        if last_time is not None:
+            times = dataset.arrays.get('time')
+            if times is not None:
+                if last_time > 1e11:  # milliseconds
+                    last_time /= 1000
+                end = int(np.searchsorted(times, last_time, side='right'))
+        key = (dataset.handle, end)
+        summary = self._summaries.get(key)
+        if summary is None:
+            with timer('llm_context'):
+                summary = dataset_summary(dataset, end)
+            self._remember(self._summaries, key, summary, SUMMARY_CACHE_SIZE)
+        return summary
+
+    def prompt(self, question: str, context: Dict[str, Any], dataset=None) -> str:
+        market = backtest = None
+        if dataset is not None and dataset.length:
+            last_candle = context.get('lastCandle') or {}
+            market = self.market_summary(dataset, last_candle.get('time'))
+            backtest = self._backtests.get((dataset.handle, strategy_hash(context.get('strategyCode') or '')))
+        return build_prompt(question, context, market, backtest)
+
+    @staticmethod
+    def cache_key(strategy_code: str, prompt: str, history: History) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (strategy_hash(strategy_code), prompt, json.dumps(history)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._answers.get(key)
+            if entry is None:
+                return None
+            stored_at, text = entry
+            if time.monotonic() - stored_at > self.cache_ttl:
+                del self._answers[key]
+                return None
+            self._answers.move_to_end(key)
+            return text
+
+    async def stream(self, question: str, history: History, context: Dict[str, Any], dataset=None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields {"delta": text} chunks as the model produces them, then {"done": True, "cached": bool},
+        or {"error": ...} if the backend fails."""
+        prompt = self.prompt(question, context, dataset)
+        key = self.cache_key(context.get('strategyCode') or '', prompt, history)
+        text = self._cached(key)
+        if text is not None:
+            self.counts['hits'] += 1
+            metrics.inc('llm_requests', outcome='hit')
+            yield {"delta": text}
+            yield {"done": True, "cached": True}
+            return
+
+        self.counts['misses'] += 1
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        waited = time.perf_counter()
+        async with self._semaphore:
+            metrics.observe('llm_queue_seconds', time.perf_counter() - waited)
+            self.in_flight += 1
+            parts = []
+            try:
+                with timer('llm', backend=self.backend.name):
+                    async for chunk in self.backend.stream(self.system_instruction, history, prompt):
+                        parts.append(chunk)
+                        yield {"delta": chunk}
+            except Exception as e:
+                self.counts['errors'] += 1
+                metrics.inc('llm_requests', outcome='error')
+                yield {"error": str(e) or type(e).__name__}
+                return
+            finally:
+                self.in_flight -= 1
+        metrics.inc('llm_requests', outcome='miss')
+        self._remember(self._answers, key, (time.monotonic(), ''.join(parts)), self.cache_size)
+        yield {"done": True, "cached": False}
+
+    async def complete(self, question: str, history: History, context: Dict[str, Any], dataset=None) -> Dict[str, Any]:
+        """The whole answer as {"response", "cached"}, or {"error"}."""
+        parts = []
+        async for event in self.stream(question, history, context, dataset):
+            if 'error' in event:
+                return event
+            if 'delta' in event:
+                parts.append(event['delta'])
+            elif event.get('done'):
+                return {"response": ''.join(parts), "cached": event['cached']}
+        return {"response": ''.join(parts), "cached": False}
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.backend.name, 'in_flight': self.in_flight, 'max_concurrency': self.max_concurrency,
+                'cached_answers': len(self._answers), **self.counts}
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def gateway_from_env() -> Optional[LLMGateway]:
+    """LLM_BACKEND=stub answers offline; otherwise Gemini when GEMINI_API_KEY is set, else None."""
+    if os.getenv('LLM_BACKEND', 'gemini') == 'stub':
+        backend = StubBackend(delay=float(os.getenv('LLM_STUB_DELAY_S', '0')))
+    elif os.getenv('GEMINI_API_KEY'):
+        backend = GeminiBackend(os.getenv('GEMINI_API_KEY'), model=os.getenv('LLM_MODEL', DEFAULT_MODEL))
+    else:
+        return None
+    return LLMGateway(
+        backend,
+        max_concurrency=int(os.getenv('LLM_CONCURRENCY', str(DEFAULT_CONCURRENCY))),
+        cache_size=int(os.getenv('LLM_CACHE_SIZE', str(DEFAULT_CACHE_SIZE))),
+        cache_ttl=float(os.getenv('LLM_CACHE_TTL_S', str(DEFAULT_CACHE_TTL_SECONDS))),
+    )
@@ -1,15 +1,29 @@
 from fastapi import FastAPI, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import asyncio
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
 import json
 import os
+from functools import partial
+from typing import Dict, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from google import genai
-from engine import BacktestEngine
 from data_provider import DataProvider
+from sweep import run_sweep, numeric_columns
+from robustness import monte_carlo, run_walk_forward
+from resample import exchange_timezone
+from dataset_registry import DatasetRegistry, dataset_key
+from bar_window import window
+from replay import ReplaySession, ReplayScheduler
+from strategy_pool import pool_from_env
+from llm_gateway import gateway_from_env
+from instrumentation import add_request_timing, collect_timings, metrics, profiled, server_timing_header
 
 load_dotenv()
 
@@ -24,108 +38,392 @@ app.add_middleware(
 )
 
 
-# Global storage for simplicity in this prototype
-active_data_streams = {}
+# ?profile=1 samples the stacks of one request; off unless the server opts in
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
 
-@app.get("/api/search")
-def search_symbols(q: str = ''):
-    """Returns a list of matching symbols from the DataProvider."""
-    return DataProvider.search_symbols(q)
 
-from typing import Optional
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # ?timing=1 (or an X-Server-Timing request header) opts a request into a Server-Timing header
+    want_timing = request.query_params.get('timing') == '1' or 'x-server-timing' in request.headers
+    want_profile = PROFILING_ENABLED and request.query_params.get('profile') == '1'
+    start = time.perf_counter()
+    with collect_timings() as timings, (profiled() if want_profile else nullcontext([None])) as report:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get('route')
+    metrics.observe('http_request_seconds', elapsed, path=route.path if route is not None else 'unmatched')
+    if want_timing:
+        response.headers['Server-Timing'] = server_timing_header(timings, elapsed)
+        response.headers['Timing-Allow-Origin'] = '*'
+    if report[0]:
+        response.headers['X-Profile'] = report[0]
+    return response
+
+
+def in_context(fn):
+    # Executor threads do not inherit contextvars; carry the request's timing collector over
+    return partial(contextvars.copy_context().run, fn)
+
+
+# Fetched datasets by handle, shared by every session of this process
+dataset_registry = DatasetRegistry(max_bytes=int(os.getenv("DATASET_REGISTRY_MB", "512")) * 1024 * 1024)
+
+
+# Backtests run in worker processes, so a slow strategy never blocks the event loop
+strategy_pool = pool_from_env()
+
+# Cancel events of running sweeps and walk-forward analyses, by the job_id of their request
+sweep_jobs: Dict[str, threading.Event] = {}
+
+# One long-lived LLM client for every chat request (None without an API key or LLM_BACKEND=stub)
+llm_gateway = gateway_from_env()
+
+
+def resolve_dataset(handle: Optional[str]):
+    # Clients that do not send a handle get the most recently fetched dataset
+    return dataset_registry.get(handle) if handle else dataset_registry.latest()
+
+
+@app.on_event("startup")
+async def warm_symbol_index():
+    # Build the instrument index off the request path; the first keystroke should not pay for it
+    asyncio.get_event_loop().run_in_executor(None, DataProvider.get_symbol_index)
+    asyncio.get_event_loop().run_in_executor(None, strategy_pool.start)
+
+@app.on_event("shutdown")
+def stop_strategy_pool():
+    strategy_pool.shutdown()
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    if llm_gateway is not None:
+        await llm_gateway.aclose()
+
+@app.get("/api/search")
+def search_symbols(q: str = '', limit: int = 20):
+    """Returns ranked matches for q from the instrument index (prefix, name and typo matches)."""
+    return DataProvider.search_symbols(q, limit)
 
 @app.get("/api/historical")
-async def get_historical_data(symbol: str = 'RELIANCE.NS', timeframe: str = '1D', start: Optional[str] = None, end: Optional[str] = None, indicators: Optional[str] = None):
-    """Fetches real historical data using yfinance via DataProvider."""
+async def get_historical_data(symbol: str = 'RELIANCE.NS', timeframe: str = '1D', start: Optional[str] = None, end: Optional[str] = None, indicators: Optional[str] = None, layout: str = 'records',
+                              from_time: Optional[int] = None, to_time: Optional[int] = None, cursor: Optional[int] = None, limit: Optional[int] = None, width: Optional[int] = None):
+    """Fetches real historical data using yfinance via DataProvider.
+
+    layout='records' returns a list of row dicts (default), layout='columns' returns
+    parallel arrays per field, which is much cheaper to build and to serialize.
+    The response carries a dataset handle for /api/backtest and /ws/replay.
+
+    With any of from_time/to_time/cursor/limit/width only that window of the dataset is
+    returned (see /api/bars), e.g. limit=100 for the first paint.
+    """
     # Run synchronous yfinance IO in a threadpool
     loop = asyncio.get_event_loop()
-    data = await loop.run_in_executor(None, DataProvider.get_historical_data, symbol, timeframe, start, end, indicators)
+    columns = await loop.run_in_executor(None, in_context(partial(DataProvider.get_historical_data, symbol, timeframe, start, end, indicators, layout='columns')))
     
-    active_data_streams['current'] = data
+    dataset = dataset_registry.put(dataset_key(symbol, timeframe, start, end, indicators), columns or {})
+    if any(v is not None for v in (from_time, to_time, cursor, limit, width)):
+        page = window(dataset, from_time, to_time, cursor, limit, width)
+        return {**page, "initialCount": min(100, dataset.length)}
+    if layout == 'columns':
+        return {"columns": columns, "count": dataset.length, "initialCount": 100, "handle": dataset.handle}
     # Return everything to the frontend so it can calculate ranges, but let frontend slice it initially
-    return {"data": data, "initialCount": 100}
+    return {"data": dataset.records, "initialCount": 100, "handle": dataset.handle}
+
+@app.get("/api/bars")
+def get_bars(handle: Optional[str] = None, from_time: Optional[int] = None, to_time: Optional[int] = None, cursor: Optional[int] = None, limit: Optional[int] = None, width: Optional[int] = None):
+    """Pages through an already fetched dataset without refetching it.
+
+    Bars are selected by time range (unix seconds, inclusive) and/or cursor (the previous
+    page's next_cursor), capped at limit; to_time with only a limit pages backwards.
+    width asks for a level-of-detail view: when the window holds more bars than that,
+    candles are min/max-preserving buckets and indicators LTTB-downsampled series.
+    """
+    dataset = resolve_dataset(handle)
+    if dataset is None:
+        return {"error": "Unknown dataset. Fetch historical data first."}
+    return window(dataset, from_time, to_time, cursor, limit, width)
+
+@app.get("/api/indicator-cache/stats")
+def indicator_cache_stats():
+    """Hit/miss statistics of the in-process indicator result cache, and how many refreshes
+    updated their indicators incrementally ("streaming")."""
+    return {**DataProvider.get_indicator_cache().stats(), 'streaming': DataProvider.get_streaming_store().stats()}
+
+@app.post("/api/prefetch")
+async def prefetch_bars(request: Request):
+    """Warms the bar store for a watchlist so later chart loads are served locally.
+
+    Body: {symbols, timeframes, start, end}; symbols defaults to the popular stocks list.
+    Each timeframe is fetched as one bulk download. Returns bars held per timeframe/symbol.
+    """
+    payload = await request.json()
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, partial(
+        DataProvider.prefetch, payload.get('symbols'), payload.get('timeframes'), payload.get('start'), payload.get('end')))
+
+@app.get("/api/fetcher/stats")
+def fetcher_stats():
+    """Request/coalescing counters of the upstream fetch layer."""
+    return DataProvider.get_fetcher().stats()
+
+@app.get("/api/metrics")
+def get_metrics(format: str = 'json'):
+    """Timers and counters of the hot paths (upstream fetch, indicators, serialization,
+    strategy compile/loop, replay frames), as JSON or, with format=prometheus, in the
+    Prometheus text format."""
+    if format == 'prometheus':
+        return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+    return metrics.snapshot()
+
+@app.get("/api/datasets/stats")
+def dataset_registry_stats():
+    """Size and usage of the dataset registry."""
+    return dataset_registry.stats()
 
 @app.post("/api/backtest")
 async def run_backtest(request: Request):
     payload = await request.json()
     strategy_code = payload.get('code', '')
     symbol = payload.get('symbol', 'AAPL')
+    mode = payload.get('mode', 'auto')
     
-    data = active_data_streams.get('current', [])
-    if not data:
+    dataset = resolve_dataset(payload.get('handle'))
+    if dataset is None or not dataset.length:
         return {"error": "No data available. Fetch historical data first."}
-        
-    engine = BacktestEngine(initial_capital=10000.0)
-    results = engine.run_strategy(strategy_code, data, symbol)
-    return results
+
+    # Runs (and computes metrics) in a pool worker under time/memory limits; cancel with job_id
+    future = strategy_pool.submit(dataset, strategy_code, symbol, mode=mode, initial_capital=10000.0,
+                                  bars_per_year=payload.get('bars_per_year'), rolling_window=payload.get('rolling_window'),
+                                  job_id=payload.get('job_id'))
+    result = await asyncio.wrap_future(future)
+    for stage, seconds in future.stages:
+        add_request_timing(stage, seconds)
+    if llm_gateway is not None:
+        llm_gateway.record_backtest(dataset.handle, strategy_code, result)
+    return result
+
+@app.post("/api/backtest/cancel")
+async def cancel_backtest(request: Request):
+    """Cancels a backtest started with {job_id}; its worker process is killed and replaced."""
+    payload = await request.json()
+    return {"cancelled": strategy_pool.cancel(payload.get('job_id', ''))}
+
+@app.get("/api/strategy-pool/stats")
+def strategy_pool_stats():
+    """Worker, queue and outcome counters of the backtest worker pool."""
+    return strategy_pool.stats()
+
+@app.post("/api/sweep")
+async def run_parameter_sweep(request: Request):
+    """Runs one strategy over a parameter grid and a set of symbols/timeframes on a process pool.
+
+    Body: {code, param_grid: {name: [values]}, symbols: [...], timeframes: [...], start, end,
+    indicators, mode, max_workers, rank_by, job_id}. Streams newline-delimited JSON: one "result" line
+    per finished run (with its running rank), then a final "done" line with the full ranking.
+    The strategy sees the current combination through the global dict `params`. Every run has
+    the backtest pool's time and CPU/memory limits; cancel with job_id, or by disconnecting.
+    """
+    payload = await request.json()
+    strategy_code = payload.get('code', '')
+    symbols = payload.get('symbols') or [payload.get('symbol', 'RELIANCE.NS')]
+    timeframes = payload.get('timeframes') or [payload.get('timeframe', '1D')]
+    
+    loop = asyncio.get_event_loop()
+    # One bulk download per timeframe for every symbol the store does not hold yet
+    await loop.run_in_executor(None, in_context(partial(DataProvider.prefetch, symbols, timeframes, payload.get('start'), payload.get('end'))))
+    datasets = {}
+    for symbol in symbols:
+        for timeframe in timeframes:
+            columns = await loop.run_in_executor(None, in_context(partial(
+                DataProvider.get_historical_data, symbol, timeframe, payload.get('start'), payload.get('end'),
+                payload.get('indicators'), layout='columns')))
+            if columns:
+                datasets[f"{symbol}:{timeframe}"] = numeric_columns(columns)
+    if not datasets:
+        return {"error": "No data available for the requested symbols/timeframes."}
+
+    job_id = payload.get('job_id')
+    cancelled = threading.Event()
+    if job_id:
+        sweep_jobs[job_id] = cancelled
+    results = run_sweep(
+        strategy_code,
+        payload.get('param_grid', {}),
+        datasets,
+        symbols={key: key.split(':')[0] for key in datasets},
+        mode=payload.get('mode', 'auto'),
+        max_workers=payload.get('max_workers'),
+        rank_by=payload.get('rank_by', 'pnl'),
+        timeout=strategy_pool.timeout,
+        cpu_seconds=strategy_pool.cpu_seconds,
+        memory_mb=strategy_pool.memory_mb,
+        cancelled=cancelled,
+    )
+
+    def lines():
+        try:
+            for r in results:
+                yield json.dumps(r) + "\n"
+        finally:
+            results.close()
+            sweep_jobs.pop(job_id, None)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/sweep/cancel")
+async def cancel_sweep(request: Request):
+    """Cancels a sweep or walk-forward started with {job_id}; its worker processes are killed."""
+    payload = await request.json()
+    cancelled = sweep_jobs.get(payload.get('job_id', ''))
+    if cancelled is None:
+        return {"cancelled": False}
+    cancelled.set()
+    return {"cancelled": True}
+
+@app.post("/api/robustness")
+async def run_robustness(request: Request):
+    """Monte Carlo and walk-forward robustness checks of a strategy on a fetched dataset.
+
+    Body: {code, symbol, handle, mode, monte_carlo: {paths, block, confidence, seed},
+    walk_forward: {param_grid, splits, train_ratio, anchored, rank_by, max_workers}, job_id}; either
+    section may be null to skip it. Monte Carlo resamples the trades and bar returns of one
+    backtest into confidence intervals for PnL, drawdown and Sharpe; walk-forward optimizes
+    on rolling training windows and reports the out-of-sample results, on a process pool with
+    the backtest limits (cancel it with /api/sweep/cancel and job_id).
+    """
+    payload = await request.json()
+    strategy_code = payload.get('code', '')
+    symbol = payload.get('symbol', 'AAPL')
+    mode = payload.get('mode', 'auto')
+    dataset = resolve_dataset(payload.get('handle'))
+    if dataset is None or not dataset.length:
+        return {"error": "No data available. Fetch historical data first."}
+
+    loop = asyncio.get_event_loop()
+    response = {"handle": dataset.handle}
+    mc = payload.get('monte_carlo', {})
+    wf = payload.get('walk_forward', {})
+    walk_forward = None
+    job_id = payload.get('job_id')
+    cancelled = threading.Event()
+    if wf is not None:
+        if job_id:
+            sweep_jobs[job_id] = cancelled
+        walk_forward = loop.run_in_executor(None, in_context(partial(
+            run_walk_forward, strategy_code, numeric_columns(dataset.columns), wf.get('param_grid'), symbol=symbol,
+            n_splits=int(wf.get('splits', 5)), train_ratio=float(wf.get('train_ratio', 0.75)), anchored=bool(wf.get('anchored', False)),
+            mode=mode, max_workers=wf.get('max_workers'), rank_by=wf.get('rank_by', 'sharpe'), timeout=strategy_pool.timeout,
+            cpu_seconds=strategy_pool.cpu_seconds, memory_mb=strategy_pool.memory_mb,
+            cancelled=cancelled)))
+    if mc is not None:
+        future = strategy_pool.submit(dataset, strategy_code, symbol, mode=mode, initial_capital=10000.0)
+        result = await asyncio.wrap_future(future)
+        if 'error' in result:
+            response["monte_carlo"] = {"error": result['error']}
+        else:
+            response["backtest"] = {"pnl": result['pnl'], "metrics": result['metrics']}
+            response["monte_carlo"] = await loop.run_in_executor(None, in_context(partial(
+                monte_carlo, result, initial_capital=10000.0, n_paths=int(mc.get('paths', 10000)), block=int(mc.get('block', 1)),
+                confidence=float(mc.get('confidence', 0.95)), seed=mc.get('seed'), tz=exchange_timezone(symbol))))
+    if walk_forward is not None:
+        try:
+            response["walk_forward"] = await walk_forward
+        finally:
+            sweep_jobs.pop(job_id, None)
+    return response
 
 @app.websocket("/ws/replay")
 async def websocket_endpoint(websocket: WebSocket):
+    """Replays the dataset named by ?handle=..., held in the registry until the socket closes.
+
+    With ?protocol=delta, seeks resync the chart with "delta"/"truncate" frames carrying only
+    the bars the client is missing, playback sends columnar "candles" frames batching every
+    bar due in that frame, and the client acks each frame ({"action": "ack"}) for backpressure.
+    Legacy clients get the full-prefix "sync" frame and one "candle" frame per bar.
+    {"action": "strategy", "code": ...} runs the strategy live with the replay, in the strategy
+    pool under the backtest limits: candle frames then carry its fills and PnL, and seeks
+    resend its full state in a "strategy" frame.
+    """
     await websocket.accept()
-    current_index = 100
+    
+    handle = websocket.query_params.get('handle')
+    delta = websocket.query_params.get('protocol') == 'delta'
+    dataset = resolve_dataset(handle)
+    if dataset is not None:
+        dataset = dataset_registry.acquire(dataset.handle)
+    session = ReplaySession(dataset, delta=delta)
+    scheduler = ReplayScheduler(acks=delta)
+    receive = asyncio.ensure_future(websocket.receive_text())
+
+    async def send_frame(frame):
+        text = json.dumps(frame)
+        metrics.inc('replay_frames', type=frame.get('type'))
+        metrics.observe('replay_frame_bytes', len(text), type=frame.get('type'))
+        await websocket.send_text(text)
     
     try:
-        data_records = active_data_streams.get('current', [])
-        total_records = len(data_records)
-        
-        playing = False
-        speed = 1.0
-        
         while True:
-            # Check for new messages without blocking forever if we are playing
-            try:
-                # If playing, only wait for a short time before sending the next candle.
-                # If not playing, wait indefinitely for a 'play' command.
-                timeout = (1.0 / speed) if playing else None
-                msg = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
-                cmd = json.loads(msg)
+            # Wait for a command, but no longer than until the next frame is due while playing
+            done, _ = await asyncio.wait({receive}, timeout=scheduler.wait_time())
+            if receive in done:
+                cmd = json.loads(receive.result())
+                receive = asyncio.ensure_future(websocket.receive_text())
                 
                 if cmd.get('action') == 'play':
-                    playing = True
-                    speed = float(cmd.get('speed', 1))
+                    scheduler.play(float(cmd.get('speed', 1)))
                 elif cmd.get('action') == 'pause':
-                    playing = False
+                    scheduler.pause()
+                elif cmd.get('action') == 'ack':
+                    scheduler.ack()
+                elif cmd.get('action') == 'strategy':
+                    # Runs on_candle along with the replay, step by step in the strategy pool ({"code": null} stops it)
+                    strategy = None
+                    if cmd.get('code'):
+                        if session.dataset is None:
+                            await send_frame({"type": "strategy", "error": "No data available. Fetch historical data first."})
+                        else:
+                            strategy = strategy_pool.live(session.dataset, cmd['code'], cmd.get('symbol', ''), params=cmd.get('params'))
+                    for frame in await session.attach_strategy(strategy):
+                        await send_frame(frame)
                 elif cmd.get('action') == 'seek':
-                    playing = False
-                    data_records = active_data_streams.get('current', [])
-                    total_records = len(data_records)
-                    
-                    if 'time' in cmd:
-                        target_time = float(cmd['time'])
-                        # Find index where time matches
-                        new_idx = next((i for i, d in enumerate(data_records) if d['time'] >= target_time), current_index)
-                    else:
-                        new_idx = int(cmd.get('index', current_index))
-                    
-                    current_index = max(0, min(new_idx, total_records - 1))
-                    
-                    # Instead of just waiting, send bulk data immediately to resync the chart
-                    await websocket.send_text(json.dumps({
-                        "type": "sync",
-                        "data": data_records[:current_index + 1],
-                        "currentIndex": current_index
-                    }))
+                    scheduler.pause()
+                    if handle is None:
+                        # Legacy clients follow whatever was fetched last
+                        latest = dataset_registry.latest()
+                        if latest is not None and latest is not dataset:
+                            if dataset is not None:
+                                dataset_registry.release(dataset)
+                            dataset = dataset_registry.acquire(latest.handle)
+                            session.set_dataset(dataset)
                     
-            except asyncio.TimeoutError:
-                # Timeout means no new message arrived, which is expected while playing.
-                pass
+                    # Instead of just waiting, send the missing bars immediately to resync the chart
+                    for frame in session.seek(time=cmd.get('time'), index=cmd.get('index')) + await session.strategy_sync():
+                        await send_frame(frame)
             
-            # Send next candle if playing
-            if playing:
-                data_records = active_data_streams.get('current', [])
-                total_records = len(data_records)
-                
-                if current_index < total_records:
-                    await websocket.send_text(json.dumps({
-                        "type": "candle",
-                        "data": data_records[current_index],
-                        "currentIndex": current_index
-                    }))
-                    current_index += 1
+            # Send every bar that is due by now
+            count = scheduler.due()
+            if count:
+                first = session.index
+                if delta:
+                    frames = [session.next_candles(count)]
                 else:
-                    playing = False # End of replay
+                    frames = [session.next_candle() for _ in range(count)]
+                frames = [frame for frame in frames if frame is not None]
+                if not frames:
+                    scheduler.pause() # End of replay
+                    continue
+                for frame in frames:
+                    await send_frame(await session.with_strategy(frame))
+                # Fewer than count bars are left at the end of the data
+                scheduler.sent(session.index - first)
     except Exception as e:
         print("WebSocket disconnected")
+    finally:
+        receive.cancel()
+        if dataset is not None:
+            dataset_registry.release(dataset)
 
 class ChatMessage(BaseModel):
     role: str
@@ -135,53 +433,26 @@ class ChatRequest(BaseModel):
     user_message: str
     chat_history: list[ChatMessage]
     context: dict
+    stream: bool = False
 
 @app.post("/api/chat")
 async def chat_with_llm(req: ChatRequest):
-    try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            return {"error": "GEMINI_API_KEY is not set in backend/.env"}
-            
-        client = genai.Client(api_key=api_key)
-        
-        system_instruction = (
-            "You are an expert quantitative developer and AI Trading Assistant. "
-            "Analyze the user's trading strategy, performance metrics, and current market data, "
-            "and answer their questions clearly and concisely."
-        )
-        
-        ctx_str = f"Strategy Code:\n{req.context.get('strategyCode', 'N/A')}\n\n"
-        ctx_str += f"Symbol: {req.context.get('symbol', 'N/A')}\n"
-        ctx_str += f"PnL: {req.context.get('pnl', 'N/A')}\n"
-        if req.context.get('lastCandle'):
-            ctx_str += f"Latest Candle: {json.dumps(req.context.get('lastCandle'))}\n"
-            
-        contents = []
-        for msg in req.chat_history:
-            contents.append(
-                genai.types.Content(
-                    role="model" if msg.role == "assistant" else "user",
-                    parts=[genai.types.Part.from_text(text=msg.content)]
-                )
-            )
-            
-        augmented_message = f"Context Data:\n{ctx_str}\n\nUser Question:\n{req.user_message}"
-        contents.append(
-            genai.types.Content(
-                role="user",
-                parts=[genai.types.Part.from_text(text=augmented_message)]
-            )
-        )
-        
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=contents,
-            config=genai.types.GenerateContentConfig(
-                system_instruction=system_instruction,
-            ),
-        )
-        
-        return {"response": response.text}
-    except Exception as e:
-        return {"error": str(e)}
+    """Answers a question about the strategy, its last backtest and the market data up to the replay position.
+
+    context carries strategyCode, symbol, pnl, lastCandle and the dataset handle. With
+    stream=true, the answer is streamed as newline-delimited JSON: {"delta": text} chunks,
+    then {"done": true, "cached": bool}, or an {"error"} line.
+    """
+    if llm_gateway is None:
+        return {"error": "GEMINI_API_KEY is not set in backend/.env"}
+    history = [(msg.role, msg.content) for msg in req.chat_history]
+    dataset = resolve_dataset(req.context.get('handle'))
+    if req.stream:
+        events = llm_gateway.stream(req.user_message, history, req.context, dataset)
+        return StreamingResponse((json.dumps(event) + "\n" async for event in events), media_type="application/x-ndjson")
+    return await llm_gateway.complete(req.user_message, history, req.context, dataset)
+
+@app.get("/api/chat/stats")
+def chat_stats():
+    """Cache hits/misses, errors and requests in flight of the LLM gateway."""
+    return llm_gateway.stats() if llm_gateway is not None else {"backend": None}
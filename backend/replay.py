@@ -0,0 +1,204 @@
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Bars the frontend shows before replay starts (the initialCount of /api/historical)
+INITIAL_BARS = 100
+# Bars per delta frame when catching a client up after a forward seek
+DELTA_CHUNK_BARS = 5000
+# Upper bound on frames per second while playing; faster speeds put several bars in a frame
+FRAME_RATE = 60
+# Frames a client may have unacknowledged before the scheduler holds back
+MAX_UNACKED_FRAMES = 8
+
+
+class ReplaySession:
+    """Replay cursor over one registry dataset for a /ws/replay connection.
+
+    Seeks binary-search a sorted copy of the bar timestamps. The session tracks how many
+    leading bars the client already holds, so with delta=True a seek only sends what is
+    missing: forward seeks send the gap as chunked columnar "delta" frames, backward seeks
+    send a single "truncate" frame. With delta=False seeks answer with the full-prefix
+    "sync" frame older clients expect.
+
+    With a strategy attached (a strategy_pool.LiveStrategy), its on_candle runs on each bar
+    as it is emitted: with_strategy() adds the fills and portfolio state to a candle frame
+    under "strategy", and strategy_sync() reports its full state after a seek. Both await
+    the pool, so the session itself never runs user code.
+    """
+
+    def __init__(self, dataset, start_index: int = INITIAL_BARS, delta: bool = False):
+        self.delta = delta
+        self.index = start_index
+        self.strategy = None
+        self.set_dataset(dataset)
+
+    def set_dataset(self, dataset):
+        self.dataset = dataset
+        columns = dataset.columns if dataset is not None else {}
+        self.times = np.asarray(columns.get('time', []), dtype='int64')
+        self.length = len(self.times)
+        # A fresh dataset was just fetched, so the client holds its first INITIAL_BARS bars
+        self.client_len = min(INITIAL_BARS, self.length)
+        self.strategy = None
+
+    def locate(self, time: Optional[float] = None, index: Optional[int] = None) -> int:
+        """Index of the first bar at or after time (or the given index), clamped to the data."""
+        if time is not None:
+            found = int(np.searchsorted(self.times, float(time), side='left'))
+            new_index = found if found < self.length else self.index
+        else:
+            new_index = int(index if index is not None else self.index)
+        return max(0, min(new_index, self.length - 1))
+
+    def seek(self, time: Optional[float] = None, index: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Moves the cursor and returns the frames that resync the client."""
+        if not self.length:
+            return []
+        self.index = self.locate(time, index)
+        target_len = self.index + 1
+
+        if not self.delta:
+            self.client_len = target_len
+            return [{"type": "sync", "data": self.dataset.records[:target_len], "currentIndex": self.index}]
+
+        if target_len <= self.client_len:
+            self.client_len = target_len
+            return [{"type": "truncate", "length": target_len, "currentIndex": self.index}]
+
+        frames = []
+        for start in range(self.client_len, target_len, DELTA_CHUNK_BARS):
+            stop = min(start + DELTA_CHUNK_BARS, target_len)
+            frames.append({
+                "type": "delta",
+                "start": start,
+                "columns": {key: values[start:stop] for key, values in self.dataset.columns.items()},
+                "final": stop == target_len,
+                "currentIndex": self.index,
+            })
+        self.client_len = target_len
+        return frames
+
+    def row(self, index: int) -> Dict[str, Any]:
+        # One row dict straight from the columns, without materializing every record
+        return {key: values[index] for key, values in self.dataset.columns.items()}
+
+    def next_candle(self) -> Optional[Dict[str, Any]]:
+        """The candle frame at the cursor, advancing it; None at the end of the data."""
+        if self.index >= self.length:
+            return None
+        frame = {"type": "candle", "data": self.row(self.index), "currentIndex": self.index}
+        self.index += 1
+        self.client_len = max(self.client_len, self.index)
+        return frame
+
+    def next_candles(self, count: int) -> Optional[Dict[str, Any]]:
+        """Up to count bars from the cursor as one columnar "candles" frame, advancing it."""
+        if self.index >= self.length or count <= 0:
+            return None
+        start, stop = self.index, min(self.index + count, self.length)
+        self.index = stop
+        self.client_len = max(self.client_len, stop)
+        frame = {
+            "type": "candles",
+            "start": start,
+            "columns": {key: values[start:stop] for key, values in self.dataset.columns.items()},
+            "currentIndex": stop - 1,
+        }
+        return frame
+
+    async def with_strategy(self, frame: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Runs the attached strategy over the bars of a candle(s) frame and adds its update."""
+        if self.strategy is None or frame is None:
+            return frame
+        stop = frame["currentIndex"] + 1
+        start = frame.get("start", stop - 1)
+        update = await self.strategy.advance(start, stop)
+        if "error" in update:
+            self.strategy = None
+        frame["strategy"] = update
+        return frame
+
+    async def attach_strategy(self, strategy) -> List[Dict[str, Any]]:
+        """Runs strategy along with the replay from now on (None detaches); returns its sync frame."""
+        self.strategy = strategy
+        return await self.strategy_sync()
+
+    async def strategy_sync(self) -> List[Dict[str, Any]]:
+        """Catches the strategy up to the bar before the cursor and reports all of its fills so far."""
+        if self.strategy is None:
+            return []
+        update = await self.strategy.catch_up(self.index)
+        if "error" in update:
+            self.strategy = None
+        return [{"type": "strategy", **update}]
+
+
+class ReplayScheduler:
+    """Paces replay from a monotonic clock instead of per-message timeouts.
+
+    play(speed) anchors the clock; due() is the number of bars owed since then, so incoming
+    commands never reset the pacing. At speeds above frame_rate the owed bars are batched
+    into at most frame_rate frames per second. With acks enabled, the scheduler stops
+    emitting once MAX_UNACKED_FRAMES are outstanding; the bars owed meanwhile are sent in
+    larger frames, capped at two frames' worth, and anything beyond that is dropped from the
+    schedule, so a slow client falls behind in time instead of buffering an unbounded backlog.
+    """
+
+    def __init__(self, frame_rate: float = FRAME_RATE, acks: bool = False, clock: Callable[[], float] = time.monotonic):
+        self.frame_rate = frame_rate
+        self.acks = acks
+        self.clock = clock
+        self.speed = 1.0
+        self.playing = False
+        self.unacked = 0
+        self._anchor = 0.0
+        self._emitted = 0
+        self._last_frame = -math.inf
+
+    def play(self, speed: float):
+        self.speed = max(float(speed), 1e-6)
+        self.playing = True
+        self._anchor = self.clock()
+        self._emitted = 0
+
+    def pause(self):
+        self.playing = False
+
+    def ack(self):
+        self.unacked = max(0, self.unacked - 1)
+
+    def blocked(self) -> bool:
+        return self.acks and self.unacked >= MAX_UNACKED_FRAMES
+
+    def due(self) -> int:
+        """Bars owed right now; the first bar is due as soon as play starts."""
+        if not self.playing or self.blocked():
+            return 0
+        now = self.clock()
+        if now - self._last_frame < 1.0 / self.frame_rate:
+            return 0
+        owed = int((now - self._anchor) * self.speed) + 1 - self._emitted
+        # Never catch up more than a couple of frames' worth after a stall
+        cap = max(1, math.ceil(self.speed / self.frame_rate) * 2)
+        if owed > cap:
+            self._anchor += (owed - cap) / self.speed
+            owed = cap
+        return max(0, owed)
+
+    def sent(self, bars: int):
+        self._emitted += bars
+        self._last_frame = self.clock()
+        if self.acks:
+            self.unacked += 1
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next frame is due; None while paused or held back by backpressure."""
+        if not self.playing or self.blocked():
+            return None
+        now = self.clock()
+        next_bar = self._anchor + self._emitted / self.speed
+        next_frame = self._last_frame + 1.0 / self.frame_rate
+        return max(0.0, max(next_bar, next_frame) - now)
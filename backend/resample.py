@@ -0,0 +1,141 @@
+import hashlib
+import re
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import OHLCV_COLUMNS
+
+# Exchange-local timezone and session open (minutes after local midnight). Intraday buckets
+# are anchored to the session open, so NSE hours run 09:15-10:15, ... like upstream 1h bars.
+SESSION_PROFILES = {
+    'NSE': ('Asia/Kolkata', 9 * 60 + 15),
+    'US': ('America/New_York', 9 * 60 + 30),
+    'CRYPTO': ('UTC', 0),
+}
+
+TIMEFRAME_RE = re.compile(r'^(\d+)(m|h|D|d|W|w)$')
+MINUTE_NS = 60 * 10**9
+DAY_NS = 24 * 60 * MINUTE_NS
+
+
+def parse_timeframe(timeframe: str) -> Tuple[int, str]:
+    """'15m' -> (15, 'm'), '4h' -> (4, 'h'), '1D' -> (1, 'D'), '2W' -> (2, 'W')."""
+    match = TIMEFRAME_RE.match(timeframe or '')
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    unit = match.group(2)
+    return int(match.group(1)), unit.upper() if unit in ('d', 'w') else unit
+
+
+def source_interval(timeframe: str) -> str:
+    """Coarsest upstream interval the timeframe can be built from (coarser intervals reach further back)."""
+    n, unit = parse_timeframe(timeframe)
+    if unit == 'm':
+        if n % 60 == 0:
+            return '1h'
+        return '5m' if n % 5 == 0 else '1m'
+    if unit == 'h':
+        return '1h'
+    return '1d'
+
+
+def is_native(timeframe: str, interval: str) -> bool:
+    """True when timeframe is exactly the upstream interval, so there is nothing to aggregate."""
+    n, unit = parse_timeframe(timeframe)
+    minutes = {'m': n, 'h': n * 60}.get(unit)
+    return {'1m': minutes == 1, '5m': minutes == 5, '1h': minutes == 60, '1d': (n, unit) == (1, 'D')}.get(interval, False)
+
+
+def session_profile(symbol: str) -> str:
+    symbol = symbol.upper()
+    if symbol.endswith('.NS') or symbol.endswith('.BO'):
+        return 'NSE'
+    if '-' in symbol:  # crypto pairs like BTC-USD trade around the clock
+        return 'CRYPTO'
+    return 'US'
+
+
+def exchange_timezone(symbol: str) -> str:
+    """Timezone of the symbol's exchange, for local session dates."""
+    return SESSION_PROFILES[session_profile(symbol)][0]
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.DatetimeIndex(df.index).as_unit('ns').asi8.tobytes())
+    for col in OHLCV_COLUMNS:
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype='float64')).tobytes())
+    return h.hexdigest()
+
+
+def bucket_labels(index: pd.DatetimeIndex, timeframe: str, profile: str) -> np.ndarray:
+    """Local wall-clock start (ns) of the bucket each bar falls into.
+
+    Intraday buckets never span two sessions; daily buckets are local calendar dates and
+    weekly buckets start on Monday. nD/nW group n consecutive trading days/weeks.
+    """
+    tz, session_open = SESSION_PROFILES[profile]
+    index = index.tz_localize('UTC') if index.tz is None else index
+    wall = index.tz_convert(tz).tz_localize(None).as_unit('ns').asi8
+    day = wall // DAY_NS
+    n, unit = parse_timeframe(timeframe)
+
+    if unit in ('m', 'h'):
+        size = n if unit == 'm' else n * 60
+        minute = (wall - day * DAY_NS) // MINUTE_NS
+        k = np.floor_divide(minute - session_open, size)
+        return day * DAY_NS + (session_open + k * size) * MINUTE_NS
+
+    labels = day * DAY_NS if unit == 'D' else (day - (day + 3) % 7) * DAY_NS  # 1970-01-01 was a Thursday
+    if n > 1:
+        # Group n consecutive distinct periods, labelled by the first one
+        rank = np.cumsum(np.r_[True, labels[1:] != labels[:-1]]) - 1
+        group = rank // n
+        first = np.r_[True, group[1:] != group[:-1]]
+        labels = labels[first][np.cumsum(first) - 1]
+    return labels
+
+
+def resample_bars(df: pd.DataFrame, timeframe: str, profile: str) -> pd.DataFrame:
+    """Aggregates a time-sorted OHLCV frame (yfinance-shaped, DatetimeIndex) into timeframe bars."""
+    tz = SESSION_PROFILES[profile][0]
+    n, unit = parse_timeframe(timeframe)
+    df = df.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    if df.empty:
+        index = pd.DatetimeIndex([], tz=tz, name='Date' if unit in ('D', 'W') else 'Datetime')
+        return pd.DataFrame({col: np.empty(0) for col in OHLCV_COLUMNS}, index=index)
+
+    labels = bucket_labels(pd.DatetimeIndex(df.index), timeframe, profile)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+
+    out = {
+        'Open': df['Open'].to_numpy(dtype='float64')[starts],
+        'High': np.maximum.reduceat(df['High'].to_numpy(dtype='float64'), starts),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(dtype='float64'), starts),
+        'Close': df['Close'].to_numpy(dtype='float64')[ends],
+        'Volume': np.add.reduceat(np.nan_to_num(df['Volume'].to_numpy(dtype='float64')), starts),
+    }
+    index = pd.DatetimeIndex(labels[starts]).tz_localize(tz, ambiguous=True, nonexistent='shift_forward')
+    index.name = 'Date' if unit in ('D', 'W') else 'Datetime'
+    return pd.DataFrame(out, index=index)
+
+
+def resample_cached(df: pd.DataFrame, symbol: str, timeframe: str, cache=None) -> pd.DataFrame:
+    """resample_bars, memoized in an IndicatorCache-style LRU keyed by the source bars' fingerprint."""
+    profile = session_profile(symbol)
+    if cache is None:
+        return resample_bars(df, timeframe, profile)
+
+    key = ('resample', symbol, timeframe, frame_fingerprint(df))
+    cached = cache.get(key)
+    if cached is None:
+        bars = resample_bars(df, timeframe, profile)
+        arrays = {col: bars[col].to_numpy() for col in OHLCV_COLUMNS}
+        arrays['time'] = bars.index.as_unit('ns').asi8
+        cached = cache.put(key, arrays)
+    index = pd.DatetimeIndex(pd.to_datetime(cached['time'], unit='ns', utc=True)).tz_convert(SESSION_PROFILES[profile][0])
+    index.name = 'Date' if parse_timeframe(timeframe)[1] in ('D', 'W') else 'Datetime'
+    return pd.DataFrame({col: cached[col] for col in OHLCV_COLUMNS}, index=index)
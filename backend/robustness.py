@@ -0,0 +1,259 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analytics import infer_bars_per_year, round_trip_pnl
+from instrumentation import timer
+from strategy_pool import DEFAULT_CPU_SECONDS, DEFAULT_MEMORY_MB, DEFAULT_TIMEOUT_SECONDS
+from sweep import SharedDataset, SweepPool, expand_grid
+
+DEFAULT_PATHS = 10000
+# Upper bound on values materialized per batch of Monte Carlo paths (~32 MB of float64)
+BATCH_VALUES = 4_000_000
+# Percentiles reported for every simulated statistic
+PERCENTILES = (5, 25, 50, 75, 95)
+# Walk-forward defaults: folds, and the share of each fold's bars used for training
+DEFAULT_SPLITS = 5
+DEFAULT_TRAIN_RATIO = 0.75
+
+
+def _max_drawdown(equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Relative and absolute max drawdown of each row of a (paths x steps) equity matrix."""
+    peak = np.maximum.accumulate(equity, axis=1)
+    return (equity / peak - 1.0).min(axis=1), (equity - peak).min(axis=1)
+
+
+def _distribution(values: np.ndarray, observed: Optional[float] = None, confidence: float = 0.95) -> Dict[str, Any]:
+    """Mean, percentiles and the two-sided confidence interval of simulated values; with
+    observed, also the share of paths at or below it."""
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {'mean': None}
+    tail = (1.0 - confidence) / 2 * 100
+    lower, upper = np.percentile(values, [tail, 100 - tail])
+    out = {
+        'mean': float(values.mean()),
+        'percentiles': {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+        'ci': [float(lower), float(upper)],
+    }
+    if observed is not None and np.isfinite(observed):
+        out['observed'] = float(observed)
+        out['observed_percentile'] = float(np.mean(values <= observed) * 100)
+    return out
+
+
+def _batches(n_paths: int, length: int):
+    size = max(1, BATCH_VALUES // max(1, length))
+    for start in range(0, n_paths, size):
+        yield min(size, n_paths - start)
+
+
+def trade_monte_carlo(trade_pnl: np.ndarray, initial_capital: float, n_paths: int = DEFAULT_PATHS, method: str = 'shuffle',
+                      rng: Optional[np.random.Generator] = None, confidence: float = 0.95) -> Dict[str, Any]:
+    """Resamples the sequence of round-trip PnLs into n_paths equity paths.
+
+    method='shuffle' permutes the trade order (final PnL is fixed, only the path and so the
+    drawdown changes); method='bootstrap' draws trades with replacement, which also varies
+    the final PnL. Paths are simulated in batches of whole matrices, not one by one.
+    """
+    trade_pnl = np.asarray(trade_pnl, dtype='float64')
+    n = len(trade_pnl)
+    if n < 2:
+        return {'method': method, 'paths': 0, 'error': "At least 2 closed round trips are needed."}
+    rng = rng or np.random.default_rng()
+    pnl, drawdown, drawdown_abs = [], [], []
+    for size in _batches(n_paths, n):
+        if method == 'bootstrap':
+            sample = trade_pnl[rng.integers(0, n, size=(size, n))]
+        else:
+            sample = rng.permuted(np.broadcast_to(trade_pnl, (size, n)), axis=1)
+        # Starting capital in column 0 so a loss on the first trade counts as drawdown
+        equity = np.empty((size, n + 1))
+        equity[:, 0] = initial_capital
+        np.cumsum(sample, axis=1, out=equity[:, 1:])
+        equity[:, 1:] += initial_capital
+        dd, dd_abs = _max_drawdown(equity)
+        pnl.append(equity[:, -1] - initial_capital)
+        drawdown.append(dd)
+        drawdown_abs.append(dd_abs)
+
+    pnl, drawdown, drawdown_abs = np.concatenate(pnl), np.concatenate(drawdown), np.concatenate(drawdown_abs)
+    observed = np.r_[initial_capital, initial_capital + np.cumsum(trade_pnl)][None, :]
+    observed_dd, observed_dd_abs = _max_drawdown(observed)
+    out = {
+        'method': method,
+        'paths': len(drawdown),
+        'trades': n,
+        'max_drawdown': _distribution(drawdown, float(observed_dd[0]), confidence),
+        'max_drawdown_abs': _distribution(drawdown_abs, float(observed_dd_abs[0]), confidence),
+    }
+    if method == 'bootstrap':
+        out['pnl'] = _distribution(pnl, float(trade_pnl.sum()), confidence)
+        out['prob_loss'] = float(np.mean(pnl < 0))
+    return out
+
+
+def return_monte_carlo(equity: np.ndarray, n_paths: int = DEFAULT_PATHS, block: int = 1, bars_per_year: float = 252.0,
+                       rng: Optional[np.random.Generator] = None, confidence: float = 0.95) -> Dict[str, Any]:
+    """Moving-block bootstrap of the per-bar returns of an equity curve into n_paths curves.
+
+    Blocks of `block` consecutive returns are drawn with replacement, keeping short-range
+    dependence (volatility clusters, holding periods) that an i.i.d. draw (block=1) breaks.
+    """
+    equity = np.asarray(equity, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = equity[1:] / equity[:-1] - 1.0
+    returns = returns[np.isfinite(returns)]
+    n = len(returns)
+    if n < 2:
+        return {'paths': 0, 'error': "At least 3 bars are needed."}
+    block = max(1, min(int(block), n))
+    blocks = -(-n // block)
+    rng = rng or np.random.default_rng()
+    total_return, drawdown, sharpe = [], [], []
+    for size in _batches(n_paths, n):
+        starts = rng.integers(0, n - block + 1, size=(size, blocks))
+        index = (starts[:, :, None] + np.arange(block)).reshape(size, -1)[:, :n]
+        sample = returns[index]
+        mean = sample.mean(axis=1)
+        std = np.sqrt(np.maximum(np.einsum('ij,ij->i', sample, sample) / n - mean * mean, 0.0) * (n / (n - 1)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe.append(np.where(std > 0, mean / std * np.sqrt(bars_per_year), np.nan))
+        # Growth of 1 along each path, reusing the sample's memory; the running peak starts at 1
+        curve = np.cumprod(np.add(sample, 1.0, out=sample), axis=1, out=sample)
+        total_return.append(curve[:, -1] - 1.0)
+        peak = np.maximum(np.maximum.accumulate(curve, axis=1), 1.0)
+        drawdown.append((np.divide(curve, peak, out=peak)).min(axis=1) - 1.0)
+
+    total_return, drawdown, sharpe = np.concatenate(total_return), np.concatenate(drawdown), np.concatenate(sharpe)
+    observed_dd, _ = _max_drawdown(np.r_[1.0, np.cumprod(1.0 + returns)][None, :])
+    observed_std = returns.std(ddof=1)
+    observed_sharpe = returns.mean() / observed_std * np.sqrt(bars_per_year) if observed_std > 0 else None
+    return {
+        'block': block,
+        'paths': len(total_return),
+        'bars': n,
+        'total_return': _distribution(total_return, float(np.prod(1.0 + returns) - 1.0), confidence),
+        'max_drawdown': _distribution(drawdown, float(observed_dd[0]), confidence),
+        'sharpe': _distribution(sharpe, observed_sharpe, confidence),
+        'prob_loss': float(np.mean(total_return < 0)),
+    }
+
+
+def monte_carlo(result: Dict[str, Any], initial_capital: float = 10000.0, n_paths: int = DEFAULT_PATHS, block: int = 1,
+                confidence: float = 0.95, seed: Optional[int] = None, bars_per_year: Optional[float] = None,
+                tz: Optional[str] = None) -> Dict[str, Any]:
+    """Trade-order shuffle, trade bootstrap and return bootstrap of a run_strategy result
+    (as_arrays=True, or its JSON form from /api/backtest). A seed makes the paths reproducible;
+    tz is the exchange timezone used to infer bars_per_year when it is not given."""
+    rng = np.random.default_rng(seed)
+    trade_pnl = round_trip_pnl(result['trade_log'])
+    curve = result['equity_curve']
+    with timer('monte_carlo'):
+        return {
+            'shuffle': trade_monte_carlo(trade_pnl, initial_capital, n_paths, 'shuffle', rng, confidence),
+            'bootstrap': trade_monte_carlo(trade_pnl, initial_capital, n_paths, 'bootstrap', rng, confidence),
+            'returns': return_monte_carlo(curve['equity'], n_paths, block, bars_per_year or infer_bars_per_year(curve['time'], tz),
+                                          rng, confidence),
+            'confidence': confidence,
+        }
+
+
+def walk_forward_splits(n_bars: int, n_splits: int = DEFAULT_SPLITS, train_ratio: float = DEFAULT_TRAIN_RATIO,
+                        anchored: bool = False) -> List[Dict[str, Tuple[int, int]]]:
+    """Consecutive out-of-sample test windows covering the end of the data, each preceded by its training window.
+
+    Rolling splits train on the train_ratio / (1 - train_ratio) test lengths right before
+    each test window; anchored splits train on everything before it.
+    """
+    test = int(n_bars / (train_ratio / (1.0 - train_ratio) + n_splits))
+    if test < 1:
+        return []
+    train = n_bars - n_splits * test
+    splits = []
+    for k in range(n_splits):
+        test_lo = train + k * test
+        train_lo = 0 if anchored else test_lo - train
+        splits.append({'train': (train_lo, test_lo), 'test': (test_lo, test_lo + test)})
+    return splits
+
+
+def run_walk_forward(strategy_code: str, columns: Dict[str, np.ndarray], param_grid: Optional[Dict[str, List[Any]]] = None,
+                     symbol: str = '', n_splits: int = DEFAULT_SPLITS, train_ratio: float = DEFAULT_TRAIN_RATIO,
+                     anchored: bool = False, mode: str = 'auto', initial_capital: float = 10000.0,
+                     max_workers: Optional[int] = None, rank_by: str = 'sharpe', timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                     cpu_seconds: Optional[float] = DEFAULT_CPU_SECONDS, memory_mb: int = DEFAULT_MEMORY_MB,
+                     cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Walk-forward analysis on a process pool.
+
+    For every fold, each param_grid combination runs on the training window, the best one by
+    rank_by (descending) runs on the following test window, and its out-of-sample result is
+    reported next to the in-sample one. All training runs of all folds are submitted at once;
+    a fold's test run is submitted as soon as its last training run finishes. Bars are shared
+    with the workers as in run_sweep, and every run gets the same timeout and CPU/memory
+    limits; indicator columns come precomputed over the whole range, so test windows start
+    with warmed-up indicators (the strategy's own state starts fresh).
+    """
+    n_bars = len(columns.get('time', []))
+    splits = walk_forward_splits(n_bars, n_splits, train_ratio, anchored)
+    if not splits:
+        return {'error': f"Not enough bars ({n_bars}) for {n_splits} walk-forward splits."}
+    combos = expand_grid(param_grid or {})
+    key = 'walk_forward'
+    shared = SharedDataset(key, columns)
+    folds = [{'fold': k, 'train': list(s['train']), 'test': list(s['test']), 'candidates': []} for k, s in enumerate(splits)]
+    pool = None
+    try:
+        pool = SweepPool([shared], max_workers or os.cpu_count() or 1, timeout, cpu_seconds, memory_mb, cancelled)
+        for fold, split in zip(folds, splits):
+            for params in combos:
+                pool.submit((fold, 'train'), key, symbol, strategy_code, params, mode, initial_capital, split['train'])
+        for (fold, phase), summary in pool.results():
+            if phase == 'test':
+                fold['test_result'] = summary
+                continue
+            fold['candidates'].append(summary)
+            if len(fold['candidates']) < len(combos):
+                continue
+            ranked = [c for c in fold['candidates'] if c.get(rank_by) is not None]
+            best = max(ranked, key=lambda c: c[rank_by]) if ranked else fold['candidates'][0]
+            fold['params'] = best.get('params', {})
+            fold['train_result'] = best
+            pool.submit((fold, 'test'), key, symbol, strategy_code, fold['params'], mode, initial_capital, tuple(fold['test']))
+    finally:
+        if pool is not None:
+            pool.close()
+        shared.close()
+    if cancelled is not None and cancelled.is_set():
+        return {'error': "Walk-forward cancelled."}
+
+    for fold in folds:
+        if len(combos) == 1:
+            del fold['candidates']
+    return {'folds': folds, 'summary': walk_forward_summary(folds, rank_by), 'anchored': anchored, 'train_ratio': train_ratio}
+
+
+def walk_forward_summary(folds: List[Dict[str, Any]], rank_by: str = 'sharpe') -> Dict[str, Any]:
+    """Out-of-sample totals across folds, and how the test results compare with training."""
+    tested = [f for f in folds if 'error' not in f.get('test_result', {'error': None})]
+    test_pnl = np.array([f['test_result']['pnl'] for f in tested], dtype='float64')
+    out: Dict[str, Any] = {
+        'folds': len(folds),
+        'failed': len(folds) - len(tested),
+        'oos_pnl': float(test_pnl.sum()) if len(tested) else None,
+        'profitable_folds': int((test_pnl > 0).sum()),
+    }
+    # Walk-forward efficiency: out-of-sample over in-sample return per bar (1 = no decay)
+    ratios = []
+    for f in tested:
+        train, test = f['train_result'], f['test_result']
+        train_bars, test_bars = f['train'][1] - f['train'][0], f['test'][1] - f['test'][0]
+        if train.get('total_return') and test.get('total_return') is not None:
+            ratios.append((test['total_return'] / test_bars) / (train['total_return'] / train_bars))
+    out['efficiency'] = float(np.median(ratios)) if ratios else None
+    scores = [f['test_result'].get(rank_by) for f in tested if f['test_result'].get(rank_by) is not None]
+    out[f'oos_{rank_by}_mean'] = float(np.mean(scores)) if scores else None
+    out['param_changes'] = sum(1 for a, b in zip(tested, tested[1:]) if a.get('params') != b.get('params'))
+    return out
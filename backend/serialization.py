@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any
+
+
+def float_list(values) -> list:
+    """Converts a numeric column to a JSON-ready list, mapping NaN to None without a per-row loop."""
+    arr = np.asarray(values, dtype='float64')
+    mask = np.isnan(arr)
+    if not mask.any():
+        return arr.tolist()
+    out = arr.astype(object)
+    out[mask] = None
+    return out.tolist()
+
+
+def object_list(values) -> list:
+    """Passes through non-numeric columns (e.g. VP profiles), mapping missing values to None."""
+    series = pd.Series(values, dtype=object)
+    return series.where(series.notna(), None).tolist()
+
+
+def frame_to_columns(df: pd.DataFrame, date_col: str, indicator_keys: List[str]) -> Dict[str, list]:
+    """Builds parallel arrays per field straight from the DataFrame columns."""
+    columns: Dict[str, list] = {
+        # Lightweight charts needs unix timestamp in seconds
+        'time': pd.DatetimeIndex(df[date_col]).as_unit('s').asi8.tolist(),
+        'open': float_list(df['Open']),
+        'high': float_list(df['High']),
+        'low': float_list(df['Low']),
+        'close': float_list(df['Close']),
+        'volume': float_list(df['Volume']),
+    }
+    for key in indicator_keys:
+        if key not in df.columns:
+            columns[key] = [None] * len(df)
+            continue
+        col = df[key]
+        if pd.api.types.is_bool_dtype(col) or pd.api.types.is_numeric_dtype(col):
+            columns[key] = float_list(col)
+        else:
+            columns[key] = object_list(col)
+    return columns
+
+
+def columns_to_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Row-of-dicts compatibility shape built from the columnar one (lists or NumPy arrays,
+    whose values become plain Python numbers)."""
+    keys = list(columns.keys())
+    values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+    return [dict(zip(keys, row)) for row in zip(*values)]
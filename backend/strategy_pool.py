@@ -0,0 +1,447 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows; jobs then only get the wall-clock timeout
+    resource = None
+
+from analytics import compute_metrics
+from dataset_registry import Dataset
+from engine import CODE_CACHE_SIZE, BacktestEngine, StrategyRunner, code_cache_stats, result_to_json, strategy_hash, uses_on_candle
+from instrumentation import collect_timings, metrics
+from resample import exchange_timezone
+
+# Wall-clock seconds a backtest may take before its worker is killed
+DEFAULT_TIMEOUT_SECONDS = 30.0
+# CPU seconds per job, enforced inside the worker with RLIMIT_CPU
+DEFAULT_CPU_SECONDS = 30
+# Memory a worker process may allocate, in MB
+DEFAULT_MEMORY_MB = 1024
+# Datasets a worker keeps after a job, so re-running on the same data does not resend it
+WORKER_DATASETS = 4
+# Live replay strategies a worker keeps between steps
+WORKER_RUNNERS = 8
+# How often a waiting job checks for cancellation
+POLL_INTERVAL_SECONDS = 0.05
+
+
+class StrategyLimitExceeded(Exception):
+    pass
+
+
+class _DatasetMissing(Exception):
+    pass
+
+
+# ---- worker process side ----
+
+def _on_cpu_limit(signum, frame):
+    raise StrategyLimitExceeded("CPU time limit exceeded")
+
+
+def _limit_memory(memory_mb: int):
+    if resource is None or not memory_mb:
+        return
+    # RLIMIT_DATA covers heap and anonymous mmaps (numpy buffers) without counting mapped libraries
+    limit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+    resource.setrlimit(limit, (memory_mb * 1024 * 1024, resource.getrlimit(limit)[1]))
+
+
+def _limit_cpu(seconds: Optional[float]):
+    if resource is None:
+        return
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if not seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _dataset(job: Dict[str, Any], datasets: "OrderedDict[str, Dataset]") -> Dataset:
+    handle = job['handle']
+    if job['columns'] is not None:
+        datasets[handle] = Dataset(handle, (), job['columns'])
+        if len(datasets) > WORKER_DATASETS:
+            datasets.popitem(last=False)
+    elif handle not in datasets:
+        raise _DatasetMissing(handle)
+    datasets.move_to_end(handle)
+    return datasets[handle]
+
+
+def _run_job(job: Dict[str, Any], datasets: "OrderedDict[str, Dataset]") -> Dict[str, Any]:
+    dataset = _dataset(job, datasets)
+    # on_candle strategies take row dicts; vectorized ones get the NumPy columns without a records round trip
+    data = dataset.records if uses_on_candle(job['code'], job['mode']) else dataset.arrays
+
+    engine = BacktestEngine(initial_capital=job['initial_capital'])
+    _limit_cpu(job['cpu_seconds'])
+    try:
+        results = engine.run_strategy(job['code'], data, job['symbol'], mode=job['mode'],
+                                      params=job['params'], as_arrays=True)
+    finally:
+        _limit_cpu(None)
+    if 'error' in results:
+        return results
+    metrics = compute_metrics(results, bars_per_year=job['bars_per_year'], rolling_window=job['rolling_window'],
+                              tz=exchange_timezone(job['symbol']))
+    return {**result_to_json(results), "metrics": metrics}
+
+
+def _run_live(job: Dict[str, Any], datasets: "OrderedDict[str, Dataset]", runners: "OrderedDict[str, StrategyRunner]") -> Dict[str, Any]:
+    rows = _dataset(job, datasets).records
+    # Taken out while it runs, so a step that fails leaves no half-run strategy behind
+    runner = runners.pop(job['runner'], None)
+    _limit_cpu(job['cpu_seconds'])
+    try:
+        if runner is None:
+            # New here (or evicted): the first step replays from bar 0, which rebuilds its state
+            runner = StrategyRunner(job['code'], job['symbol'], initial_capital=job['initial_capital'], params=job['params'])
+        if job['op'] == 'sync':
+            update = runner.catch_up(rows, job['index'])
+        else:
+            update = runner.advance(rows, job['start'], job['stop'])
+    finally:
+        _limit_cpu(None)
+    runners[job['runner']] = runner
+    if len(runners) > WORKER_RUNNERS:
+        runners.popitem(last=False)
+    return update
+
+
+def _worker_main(conn, memory_mb: int):
+    # The parent handles Ctrl+C and shuts workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    _limit_memory(memory_mb)
+    datasets: "OrderedDict[str, Dataset]" = OrderedDict()
+    runners: "OrderedDict[str, StrategyRunner]" = OrderedDict()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        hits = code_cache_stats()['hits']
+        with collect_timings() as stages:
+            try:
+                result = _run_live(job, datasets, runners) if 'runner' in job else _run_job(job, datasets)
+            except _DatasetMissing:
+                result = None  # the parent resends the job with its columns
+            except MemoryError:
+                datasets.clear()
+                runners.clear()
+                result = {"error": "Strategy execution failed: memory limit exceeded"}
+            except Exception as e:
+                result = {"error": f"Strategy execution failed: {str(e)}"}
+        # The worker's metrics travel back with the result and are merged into the parent's, and
+        # the datasets and runners it still holds keep the parent's mirror in step (MemoryError clears them)
+        conn.send((result, code_cache_stats()['hits'] > hits, metrics.drain(), stages, list(datasets), list(runners)))
+
+
+# ---- parent side ----
+
+class _Worker:
+    def __init__(self, context, memory_mb: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Mirrors of what the worker holds, used to route jobs and skip resending data
+        self.datasets: "OrderedDict[str, None]" = OrderedDict()
+        self.runners: "OrderedDict[str, None]" = OrderedDict()
+        self.codes: "OrderedDict[str, None]" = OrderedDict()
+
+    def stop(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class _Job:
+    def __init__(self, job_id: str, message: Dict[str, Any], code_key: str, timeout: float):
+        self.id = job_id
+        self.message = message
+        self.code_key = code_key
+        self.timeout = timeout
+        self.cancelled = threading.Event()
+        self.future: Future = Future()
+        self.future.stages = []
+
+
+class StrategyPool:
+    """Runs backtests in a pool of long-lived worker processes, off the API process.
+
+    Workers are started once (spawned, like the sweep pool, since the server is
+    multi-threaded) and reused across jobs. A stuck or runaway strategy only ever occupies
+    its own worker:
+    - a job that exceeds its wall-clock timeout, or is cancelled, gets its worker killed and replaced;
+    - inside the worker, RLIMIT_CPU turns a CPU-time overrun into a job error;
+    - RLIMIT_DATA caps the memory a worker can allocate.
+
+    Workers cache compiled strategies by source hash and keep the last few datasets.
+    Jobs are routed to an idle worker that already holds their dataset and code when one
+    exists, so re-running an unchanged strategy neither resends bars nor recompiles.
+
+    Live replay strategies (see LiveStrategy) run here too, one step per job, and stay in
+    the worker that last stepped them.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = DEFAULT_TIMEOUT_SECONDS, cpu_seconds: float = DEFAULT_CPU_SECONDS,
+                 memory_mb: int = DEFAULT_MEMORY_MB):
+        self.size = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: List[_Worker] = []
+        self._cond = threading.Condition()
+        self._started = False
+        self._closed = False
+        # One dispatch thread per worker; jobs beyond that wait in the executor's queue
+        self._dispatch = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='strategy-job')
+        self._jobs: Dict[str, _Job] = {}
+        self._ids = itertools.count(1)
+        self.counters = {'completed': 0, 'failed': 0, 'timeouts': 0, 'cancelled': 0, 'crashed': 0, 'code_cache_hits': 0}
+
+    def start(self):
+        """Spawns the workers; called at server startup so the first backtest does not wait for them."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        workers = [_Worker(self._context, self.memory_mb) for _ in range(self.size)]
+        with self._cond:
+            self._idle.extend(workers)
+            self._cond.notify_all()
+
+    def submit(self, dataset, code: str, symbol: str, mode: str = 'auto', params: Optional[dict] = None,
+               initial_capital: float = 10000.0, bars_per_year: Optional[float] = None, rolling_window: Optional[int] = None,
+               job_id: Optional[str] = None, timeout: Optional[float] = None) -> "Future[Dict[str, Any]]":
+        """Queues a backtest of code over a registry dataset; the Future resolves to the
+        /api/backtest response ({..., "metrics"} or {"error"}). Once done, future.stages
+        lists the (stage, seconds) timed in the worker."""
+        message = {
+            'handle': dataset.handle, 'columns': dataset.columns, 'code': code, 'symbol': symbol, 'mode': mode,
+            'params': params, 'initial_capital': initial_capital, 'bars_per_year': bars_per_year,
+            'rolling_window': rolling_window, 'cpu_seconds': self.cpu_seconds,
+        }
+        return self._submit(message, job_id, timeout)
+
+    def live(self, dataset, code: str, symbol: str, params: Optional[dict] = None,
+             initial_capital: float = 10000.0) -> "LiveStrategy":
+        """An on_candle strategy to step along with a replay of dataset."""
+        return LiveStrategy(self, f"live-{next(self._ids)}", dataset, code, symbol, params, initial_capital)
+
+    def submit_live(self, strategy: "LiveStrategy", op: str, **args) -> "Future[Dict[str, Any]]":
+        """Queues one step ('step' with start/stop, or 'sync' with index) of a live strategy."""
+        message = {
+            'handle': strategy.dataset.handle, 'columns': strategy.dataset.columns, 'code': strategy.code,
+            'symbol': strategy.symbol, 'params': strategy.params, 'initial_capital': strategy.initial_capital,
+            'cpu_seconds': self.cpu_seconds, 'runner': strategy.key, 'op': op, **args,
+        }
+        return self._submit(message, None, None)
+
+    def _submit(self, message: Dict[str, Any], job_id: Optional[str], timeout: Optional[float]) -> "Future[Dict[str, Any]]":
+        job_id = job_id or f"job-{next(self._ids)}"
+        job = _Job(job_id, message, strategy_hash(message['code']), timeout or self.timeout)
+        with self._cond:
+            self._jobs[job_id] = job
+        job.future.add_done_callback(lambda _: self._forget(job_id))
+        self._dispatch.submit(self._run, job)
+        return job.future
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued or running job; a running one has its worker killed."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancelled.set()
+        return True
+
+    def _count(self, name: str, n: int = 1):
+        with self._cond:
+            self.counters[name] += n
+
+    def _forget(self, job_id: str):
+        with self._cond:
+            self._jobs.pop(job_id, None)
+
+    def _acquire(self, job: _Job) -> Optional[_Worker]:
+        handle = job.message['handle']
+        runner = job.message.get('runner')
+        with self._cond:
+            while not self._idle and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            # Prefer a worker that has the live runner, then the dataset, then the code
+            best = max(self._idle, key=lambda w: (runner in w.runners, handle in w.datasets, job.code_key in w.codes))
+            self._idle.remove(best)
+            return best
+
+    def _release(self, worker: _Worker):
+        with self._cond:
+            if self._closed:
+                worker.stop()
+                return
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _replace(self, worker: _Worker):
+        worker.stop(kill=True)
+        if not self._closed:
+            self._release(_Worker(self._context, self.memory_mb))
+
+    def _cancelled(self, job: _Job):
+        self._count('cancelled')
+        job.future.set_result({"error": "Backtest cancelled."})
+
+    def _run(self, job: _Job):
+        self.start()
+        job.future.set_running_or_notify_cancel()
+        if job.cancelled.is_set():
+            return self._cancelled(job)
+        worker = self._acquire(job)
+        if worker is None:
+            return self._cancelled(job)
+        if job.cancelled.is_set():
+            self._release(worker)
+            return self._cancelled(job)
+
+        handle = job.message['handle']
+        message = dict(job.message, columns=None if handle in worker.datasets else job.message['columns'])
+        started = time.monotonic()
+        deadline = started + job.timeout
+        try:
+            reply = self._exchange(worker, job, message, deadline)
+            if reply is not None and reply[0] is None:
+                # The worker dropped the dataset since we last saw it; send the bars along this time
+                reply = self._exchange(worker, job, dict(message, columns=job.message['columns']), deadline)
+        except (EOFError, OSError):
+            # The worker died mid-job (killed at a hard limit, a crash in an extension, ...)
+            self._count('crashed')
+            self._replace(worker)
+            job.future.set_result({"error": "Strategy execution failed: worker process exited unexpectedly"})
+            return
+        if reply is None:
+            return
+
+        result, code_cached, worker_metrics, stages, datasets, runners = reply
+        metrics.merge(worker_metrics)
+        metrics.observe('strategy_job_seconds', time.monotonic() - started)
+        # Stages timed in the worker (compile, on_candle loop, ...), for the caller's Server-Timing header
+        job.future.stages = stages
+        worker.datasets = OrderedDict.fromkeys(datasets)
+        worker.runners = OrderedDict.fromkeys(runners)
+        self._remember(worker.codes, job.code_key, CODE_CACHE_SIZE)
+        self._count('completed')
+        self._count('failed', 'error' in result)
+        self._count('code_cache_hits', code_cached)
+        self._release(worker)
+        job.future.set_result(result)
+
+    def _exchange(self, worker: _Worker, job: _Job, message: Dict[str, Any], deadline: float):
+        # Sends one message and waits for the reply; None once the job was cancelled or timed out
+        worker.conn.send(message)
+        while not worker.conn.poll(POLL_INTERVAL_SECONDS):
+            if job.cancelled.is_set():
+                self._replace(worker)
+                self._cancelled(job)
+                return None
+            if time.monotonic() > deadline:
+                self._count('timeouts')
+                self._replace(worker)
+                job.future.set_result({"error": f"Strategy execution failed: timed out after {job.timeout:g}s"})
+                return None
+        return worker.conn.recv()
+
+    @staticmethod
+    def _remember(held: "OrderedDict[str, None]", key: str, capacity: Optional[int]):
+        held[key] = None
+        held.move_to_end(key)
+        if capacity and len(held) > capacity:
+            held.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job.future.running())
+            return {
+                'workers': self.size,
+                'idle': len(self._idle),
+                'running': running,
+                'queued': len(self._jobs) - running,
+                **self.counters,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for job in list(self._jobs.values()):
+            job.cancelled.set()
+        self._dispatch.shutdown(wait=True)
+        for worker in idle:
+            worker.stop()
+
+
+class LiveStrategy:
+    """An on_candle strategy running along with one replay session, inside the pool.
+
+    Each step is a pool job, so user code gets the same timeout and CPU/memory limits as
+    a backtest and never runs on the API's event loop. The StrategyRunner stays in the
+    worker that last stepped it; a step that lands on another worker rebuilds it there.
+    """
+
+    def __init__(self, pool: StrategyPool, key: str, dataset, code: str, symbol: str, params: Optional[dict],
+                 initial_capital: float):
+        self.pool = pool
+        self.key = key
+        self.dataset = dataset
+        self.code = code
+        self.symbol = symbol
+        self.params = params
+        self.initial_capital = initial_capital
+
+    async def advance(self, start: int, stop: int) -> Dict[str, Any]:
+        """Runs bars start..stop-1: {"fills", "equity", value/pnl/cash/position} or {"error"}."""
+        return await asyncio.wrap_future(self.pool.submit_live(self, 'step', start=start, stop=stop))
+
+    async def catch_up(self, index: int) -> Dict[str, Any]:
+        """Runs or rewinds to the bar before index: {"trades", "currentIndex", ...state} or {"error"}."""
+        return await asyncio.wrap_future(self.pool.submit_live(self, 'sync', index=index))
+
+
+def pool_from_env() -> StrategyPool:
+    return StrategyPool(
+        workers=int(os.getenv('STRATEGY_WORKERS', str(max(2, min(4, os.cpu_count() or 2))))),
+        timeout=float(os.getenv('STRATEGY_TIMEOUT_S', str(DEFAULT_TIMEOUT_SECONDS))),
+        cpu_seconds=float(os.getenv('STRATEGY_CPU_S', str(DEFAULT_CPU_SECONDS))),
+        memory_mb=int(os.getenv('STRATEGY_MEMORY_MB', str(DEFAULT_MEMORY_MB))),
+    )
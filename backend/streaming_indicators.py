@@ -0,0 +1,411 @@
+import copy
+import math
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from indicator_cache import bar_fingerprint
+from indicators import IndicatorContext, is_intraday
+
+NAN = float('nan')
+
+
+class RollingMean:
+    """Mean over the last `window` values with O(1) update.
+
+    NaN until the window is full and while it holds a NaN, like rolling(window).mean();
+    NaNs are counted instead of summed, so the mean recovers once they leave the window.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if math.isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+        if len(self.values) < self.window or self.nans:
+            return NAN
+        return self.total / self.window
+
+    def seed(self, values: np.ndarray):
+        """The state update() would have reached after being fed values."""
+        tail = values[-self.window:]
+        missing = np.isnan(tail)
+        self.values = deque(tail.tolist())
+        self.total = float(tail[~missing].sum())
+        self.nans = int(missing.sum())
+
+
+class EWM:
+    """pandas ewm(span=span, adjust=False).mean() one value at a time.
+
+    Like pandas (ignore_na=False), a NaN repeats the last value and keeps decaying its
+    weight, so the first value after a gap counts for more than alpha.
+    """
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value: Optional[float] = None
+        self.weight = 1.0
+
+    def update(self, x: float) -> float:
+        if self.value is None:
+            if not math.isnan(x):
+                self.value = x
+            return NAN if self.value is None else self.value
+        self.weight *= 1.0 - self.alpha
+        if not math.isnan(x):
+            if x != self.value:
+                self.value = (self.weight * self.value + self.alpha * x) / (self.weight + self.alpha)
+            self.weight = 1.0
+        return self.value
+
+    def seed(self, values: np.ndarray, last: float):
+        """The state after being fed values, the last of which returned last."""
+        valid = np.flatnonzero(~np.isnan(values))
+        if len(valid):
+            self.value = last
+            # Decayed once per bar since the last value that was not NaN
+            self.weight = (1.0 - self.alpha) ** (len(values) - 1 - valid[-1])
+
+
+class StreamingIndicator(ABC):
+    """Base class for incremental indicators.
+
+    update(bar) consumes one bar (dict with Open/High/Low/Close/Volume and the bar's trading
+    date under 'session') and returns {output suffix: value}, matching the batch columns produced by
+    the indicator registry within floating point tolerance. seed(ctx, outputs, n) sets the
+    state update() would have reached after the first n bars of ctx, from the batch outputs
+    and context nodes, so a series is not streamed from its first bar.
+    """
+
+    @abstractmethod
+    def update(self, bar: Dict[str, Any]) -> Dict[str, float]:
+        ...
+
+    @abstractmethod
+    def seed(self, ctx: IndicatorContext, outputs: Dict[str, np.ndarray], n: int):
+        ...
+
+
+def _values(series, n: int) -> np.ndarray:
+    return np.asarray(series, dtype='float64')[:n]
+
+
+def _session_ids(dates: pd.Series) -> np.ndarray:
+    # Trading dates as int64 (exchange local time), like the batch session grouping
+    return pd.DatetimeIndex(dates.dt.normalize()).asi8
+
+
+def _session(ctx: IndicatorContext, i: int) -> int:
+    return int(_session_ids(ctx.df[ctx.date_col].iloc[i:i + 1])[0])
+
+
+def _session_start(ctx: IndicatorContext, n: int) -> int:
+    # First bar of the session that bar n - 1 belongs to
+    codes = ctx.session_codes()[:n]
+    return int(np.searchsorted(codes, codes[-1]))
+
+
+class StreamingEMA(StreamingIndicator):
+    def __init__(self, length: int):
+        self.ewm = EWM(length)
+
+    def update(self, bar):
+        return {'': self.ewm.update(bar['Close'])}
+
+    def seed(self, ctx, outputs, n):
+        self.ewm.seed(_values(ctx.df['Close'], n), outputs[''][n - 1])
+
+
+class StreamingRSI(StreamingIndicator):
+    def __init__(self, length: int):
+        self.prev_close: Optional[float] = None
+        self.gain = RollingMean(length)
+        self.loss = RollingMean(length)
+
+    def update(self, bar):
+        close = bar['Close']
+        if self.prev_close is None:
+            self.prev_close = close
+            # diff() is NaN on the first bar, which the batch gain/loss series turn into 0
+            self.gain.update(0.0)
+            self.loss.update(0.0)
+            return {'': NAN}
+        delta = close - self.prev_close
+        self.prev_close = close
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else 0.0)
+        if math.isnan(gain) or math.isnan(loss):
+            return {'': NAN}
+        if loss == 0:
+            return {'': 100.0 if gain > 0 else NAN}
+        return {'': 100 - (100 / (1 + gain / loss))}
+
+    def seed(self, ctx, outputs, n):
+        self.prev_close = float(ctx.df['Close'].iloc[n - 1])
+        self.gain.seed(_values(ctx.gain(), n))
+        self.loss.seed(_values(ctx.loss(), n))
+
+
+class StreamingMACD(StreamingIndicator):
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.fast = EWM(fast)
+        self.slow = EWM(slow)
+        self.signal = EWM(signal)
+
+    def update(self, bar):
+        macd_line = self.fast.update(bar['Close']) - self.slow.update(bar['Close'])
+        signal_line = self.signal.update(macd_line)
+        return {'macd': macd_line, 'signal': signal_line, 'hist': macd_line - signal_line}
+
+    def seed(self, ctx, outputs, n):
+        close = _values(ctx.df['Close'], n)
+        self.fast.seed(close, ctx.ema(self.fast.span).iloc[n - 1])
+        self.slow.seed(close, ctx.ema(self.slow.span).iloc[n - 1])
+        self.signal.seed(_values(outputs['macd'], n), outputs['signal'][n - 1])
+
+
+class StreamingBB(StreamingIndicator):
+    """Bollinger Bands over a window; the std is recomputed from the window, O(window) per bar."""
+
+    def __init__(self, length: int, multiplier: float):
+        self.length = length
+        self.multiplier = multiplier
+        self.window = deque(maxlen=length)
+
+    def update(self, bar):
+        self.window.append(bar['Close'])
+        if len(self.window) < self.length or self.length < 2:
+            return {'upper': NAN, 'middle': NAN, 'lower': NAN}
+        sma = sum(self.window) / self.length
+        std = math.sqrt(sum((x - sma) ** 2 for x in self.window) / (self.length - 1))
+        return {'upper': sma + std * self.multiplier, 'middle': sma, 'lower': sma - std * self.multiplier}
+
+    def seed(self, ctx, outputs, n):
+        self.window.extend(_values(ctx.df['Close'], n)[-self.length:].tolist())
+
+
+class StreamingATR(StreamingIndicator):
+    def __init__(self, length: int):
+        self.prev_close: Optional[float] = None
+        self.mean = RollingMean(length)
+
+    def update(self, bar):
+        high, low = bar['High'], bar['Low']
+        ranges = [high - low]
+        if self.prev_close is not None:
+            ranges += [abs(high - self.prev_close), abs(low - self.prev_close)]
+        # Row-wise max skipping NaN, like the batch concat(...).max(axis=1)
+        ranges = [r for r in ranges if not math.isnan(r)]
+        self.prev_close = bar['Close']
+        return {'': self.mean.update(max(ranges) if ranges else NAN)}
+
+    def seed(self, ctx, outputs, n):
+        self.prev_close = float(ctx.df['Close'].iloc[n - 1])
+        self.mean.seed(_values(ctx.true_range(), n))
+
+
+class StreamingVWAP(StreamingIndicator):
+    def __init__(self, intraday: bool):
+        self.intraday = intraday
+        self.session = None
+        self.typical_volume = 0.0
+        self.volume = 0.0
+
+    def update(self, bar):
+        if self.intraday:
+            if bar['session'] != self.session:
+                self.session = bar['session']
+                self.typical_volume = 0.0
+                self.volume = 0.0
+        typical_volume = (bar['High'] + bar['Low'] + bar['Close']) / 3 * bar['Volume']
+        # cumsum() skips NaN but stays NaN on that bar
+        if math.isnan(typical_volume) or math.isnan(bar['Volume']):
+            self.typical_volume += 0.0 if math.isnan(typical_volume) else typical_volume
+            self.volume += 0.0 if math.isnan(bar['Volume']) else bar['Volume']
+            return {'': NAN}
+        self.typical_volume += typical_volume
+        self.volume += bar['Volume']
+        return {'': self.typical_volume / self.volume if self.volume else NAN}
+
+    def seed(self, ctx, outputs, n):
+        start = 0
+        if self.intraday:
+            self.session = _session(ctx, n - 1)
+            start = _session_start(ctx, n)
+        self.typical_volume = float(np.nansum(_values(ctx.typical_volume(), n)[start:]))
+        self.volume = float(np.nansum(_values(ctx.df['Volume'], n)[start:]))
+
+
+class StreamingFVG(StreamingIndicator):
+    def __init__(self):
+        self.bars = deque(maxlen=2)
+
+    def update(self, bar):
+        out = {'bull': False, 'bear': False, 'top': NAN, 'bottom': NAN}
+        if len(self.bars) == 2:
+            first, middle = self.bars
+            out['bull'] = bar['Low'] > first['High'] and middle['Close'] > middle['Open']
+            out['bear'] = bar['High'] < first['Low'] and middle['Close'] < middle['Open']
+            if out['bear']:
+                out['top'], out['bottom'] = first['Low'], bar['High']
+            elif out['bull']:
+                out['top'], out['bottom'] = bar['Low'], first['High']
+        self.bars.append(bar)
+        return out
+
+    def seed(self, ctx, outputs, n):
+        rows = ctx.df[['Open', 'High', 'Low', 'Close']].iloc[max(0, n - 2):n].astype('float64')
+        self.bars.extend(rows.to_dict('records'))
+
+
+class StreamingDailyLevels(StreamingIndicator):
+    def __init__(self):
+        self.session = None
+        self.high = NAN
+        self.low = NAN
+        self.prev_high = NAN
+        self.prev_low = NAN
+
+    def update(self, bar):
+        if bar['session'] != self.session:
+            if self.session is not None:
+                self.prev_high, self.prev_low = self.high, self.low
+            self.session = bar['session']
+            self.high, self.low = NAN, NAN
+        # max/min skipping NaN, like groupby().max()/min()
+        self.high = bar['High'] if math.isnan(self.high) else max(self.high, bar['High'])
+        self.low = bar['Low'] if math.isnan(self.low) else min(self.low, bar['Low'])
+        return {'prev_high': self.prev_high, 'prev_low': self.prev_low}
+
+    def seed(self, ctx, outputs, n):
+        start = _session_start(ctx, n)
+        self.session = _session(ctx, n - 1)
+        high, low = _values(ctx.df['High'], n)[start:], _values(ctx.df['Low'], n)[start:]
+        high, low = high[~np.isnan(high)], low[~np.isnan(low)]
+        self.high = float(high.max()) if len(high) else NAN
+        self.low = float(low.min()) if len(low) else NAN
+        self.prev_high = float(outputs['prev_high'][n - 1])
+        self.prev_low = float(outputs['prev_low'][n - 1])
+
+
+STREAMING_INDICATORS = {
+    'EMA': lambda interval, length: StreamingEMA(length),
+    'RSI': lambda interval, length: StreamingRSI(length),
+    'MACD': lambda interval, fast, slow, signal: StreamingMACD(fast, slow, signal),
+    'BB': lambda interval, length, multiplier: StreamingBB(length, multiplier),
+    'ATR': lambda interval, length: StreamingATR(length),
+    'VWAP': lambda interval: StreamingVWAP(is_intraday(interval)),
+    'FVG': lambda interval: StreamingFVG(),
+    'DAILY_LEVELS': lambda interval: StreamingDailyLevels(),
+}
+
+
+def _bars(df: pd.DataFrame, date_col: str) -> List[Dict[str, Any]]:
+    sessions = _session_ids(df[date_col]).tolist()
+    columns = [df[col].to_numpy(dtype='float64').tolist() for col in ('Open', 'High', 'Low', 'Close', 'Volume')]
+    return [
+        {'session': session, 'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v}
+        for session, o, h, l, c, v in zip(sessions, *columns)
+    ]
+
+
+class _Series:
+    def __init__(self, committed: int, fingerprint: str, streams: Dict[Hashable, tuple]):
+        # The saved states have seen the first `committed` bars (all but the last one served,
+        # which may still be forming); streams maps computation key -> (state, outputs so far)
+        self.committed = committed
+        self.fingerprint = fingerprint
+        self.streams = streams
+
+
+class StreamingStore:
+    """Streaming indicator state of recently served series, for the bar-append path.
+
+    When a refresh of a series brings the same earlier bars plus new ones, outputs() feeds
+    only the bars from the last one served on, instead of recomputing the whole history.
+    Any other change (a revised bar, a moved start) starts the series over: its indicators
+    are computed in batch and the streaming state is seeded from those results.
+    """
+
+    def __init__(self, max_series: int = 64):
+        self.max_series = max_series
+        self._series: "OrderedDict[Hashable, _Series]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.appends = 0
+        self.rebuilds = 0
+
+    def outputs(self, series_key: Hashable, computations: Dict[Hashable, tuple], df: pd.DataFrame, date_col: str,
+                interval: str, ctx: Optional[IndicatorContext] = None) -> Dict[Hashable, Dict[str, np.ndarray]]:
+        """{computation key: {output suffix: values}} over every bar of df, for the
+        (definition, params) computations that have a streaming form. Batch computations
+        run on ctx (an IndicatorContext over df), so they share its intermediates."""
+        computations = {key: (definition, params) for key, (definition, params) in computations.items()
+                        if definition.name in STREAMING_INDICATORS}
+        if not computations or df.empty:
+            return {}
+        with self._lock:
+            series = self._series.get(series_key)
+        start = 0
+        if series is not None and series.committed < len(df) \
+                and bar_fingerprint(df.iloc[:series.committed], date_col) == series.fingerprint:
+            start = series.committed
+        saved = {key: series.streams[key] for key in computations if start and key in series.streams}
+        bars = _bars(df.iloc[start:], date_col) if saved else []
+        last = len(df) - 1
+        ctx = ctx or IndicatorContext(df, date_col, interval)
+
+        results, streams = {}, {}
+        for key, (definition, params) in computations.items():
+            if key in saved:
+                instance, previous = copy.deepcopy(saved[key][0]), saved[key][1]
+                new: Dict[str, list] = {suffix: [] for suffix in definition.outputs}
+                for i, bar in enumerate(bars, start):
+                    if i == last:
+                        committed = copy.deepcopy(instance)
+                    values = instance.update(bar)
+                    for suffix in definition.outputs:
+                        new[suffix].append(values[suffix])
+                outputs = {suffix: np.concatenate([previous[suffix], np.array(values)]) for suffix, values in new.items()}
+            else:
+                outputs = {suffix: np.asarray(values) for suffix, values in definition.compute(ctx, **params).items()}
+                committed = STREAMING_INDICATORS[definition.name](interval, **params)
+                if last:
+                    committed.seed(ctx, outputs, last)
+            results[key] = outputs
+            streams[key] = (committed, {suffix: values[:last] for suffix, values in outputs.items()})
+
+        fingerprint = bar_fingerprint(df.iloc[:last], date_col)
+        with self._lock:
+            self.appends += len(saved)
+            self.rebuilds += len(computations) - len(saved)
+            if series is not None and series.fingerprint == fingerprint and series.committed == last:
+                # Keep other indicators of the series that this request did not ask for
+                streams = {**series.streams, **streams}
+            self._series[series_key] = _Series(last, fingerprint, streams)
+            self._series.move_to_end(series_key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'series': len(self._series), 'appends': self.appends, 'rebuilds': self.rebuilds}
@@ -0,0 +1,275 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from analytics import compute_metrics
+from engine import BacktestEngine, uses_on_candle
+from resample import exchange_timezone
+from serialization import columns_to_records
+from strategy_pool import (DEFAULT_CPU_SECONDS, DEFAULT_MEMORY_MB, DEFAULT_TIMEOUT_SECONDS, POLL_INTERVAL_SECONDS,
+                           _limit_cpu, _limit_memory, _on_cpu_limit, resource)
+
+# Per-worker state: shared memory handles and the column views built on top of them
+_WORKER_SHM: Dict[str, shared_memory.SharedMemory] = {}
+_WORKER_DATA: Dict[str, Dict[str, np.ndarray]] = {}
+_WORKER_RECORDS: Dict[str, list] = {}
+_WORKER_LIMITS: Dict[str, Any] = {'cpu_seconds': None}
+
+
+def expand_grid(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a {name: [values]} grid as a list of param dicts."""
+    if not param_grid:
+        return [{}]
+    names = list(param_grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+
+def numeric_columns(columns: Dict[str, list]) -> Dict[str, np.ndarray]:
+    """Keeps the columns that can be stored as float64 (drops e.g. VP profile objects)."""
+    out = {}
+    for key, values in columns.items():
+        arr = np.array(values, dtype=object)
+        arr[arr == None] = np.nan  # noqa: E711
+        try:
+            out[key] = arr.astype('float64')
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+class SharedDataset:
+    """Bar columns packed into one float64 shared memory block, attached by workers without copying."""
+
+    def __init__(self, key: str, columns: Dict[str, np.ndarray]):
+        self.key = key
+        self.names = list(columns.keys())
+        self.length = len(next(iter(columns.values()))) if columns else 0
+        size = max(1, len(self.names) * self.length * 8)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        block = np.ndarray((len(self.names), self.length), dtype='float64', buffer=self.shm.buf)
+        for row, name in enumerate(self.names):
+            block[row] = columns[name]
+
+    def spec(self) -> Tuple[str, str, List[str], int]:
+        return self.key, self.shm.name, self.names, self.length
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(spec: Tuple[str, str, List[str], int]):
+    key, shm_name, names, length = spec
+    # Pool workers share the parent's resource tracker, so the block is unlinked exactly once by the parent
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(names), length), dtype='float64', buffer=shm.buf)
+    columns = {name: block[row] for row, name in enumerate(names)}
+    if 'time' in columns:
+        columns['time'] = columns['time'].astype('int64')
+    _WORKER_SHM[key] = shm
+    _WORKER_DATA[key] = columns
+
+
+def _init_worker(specs: List[Tuple[str, str, List[str], int]], cpu_seconds: Optional[float] = None, memory_mb: int = 0):
+    # The limits of a StrategyPool worker: RLIMIT_DATA for the process, RLIMIT_CPU per task
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    _limit_memory(memory_mb)
+    _WORKER_LIMITS['cpu_seconds'] = cpu_seconds
+    for spec in specs:
+        _attach(spec)
+
+
+def _run_task(dataset_key: str, symbol: str, strategy_code: str, params: Dict[str, Any], mode: str, initial_capital: float,
+              window: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    data: Any = _WORKER_DATA[dataset_key]
+    if uses_on_candle(strategy_code, mode):
+        # on_candle strategies need row dicts; build them once per worker and dataset
+        if dataset_key not in _WORKER_RECORDS:
+            _WORKER_RECORDS[dataset_key] = columns_to_records(data)
+        data = _WORKER_RECORDS[dataset_key]
+    if window is not None:
+        # Bars [lo, hi) only, e.g. one walk-forward train or test period
+        lo, hi = window
+        data = data[lo:hi] if isinstance(data, list) else {key: values[lo:hi] for key, values in data.items()}
+    _limit_cpu(_WORKER_LIMITS['cpu_seconds'])
+    try:
+        result = BacktestEngine(initial_capital).run_strategy(strategy_code, data, symbol, mode=mode, params=params, as_arrays=True)
+    finally:
+        _limit_cpu(None)
+    summary = {'dataset': dataset_key, 'params': params}
+    if window is not None:
+        summary['window'] = list(window)
+    if 'error' in result:
+        summary['error'] = result['error']
+        return summary
+    summary.update({
+        'pnl': result['pnl'],
+        'final_value': result['final_value'],
+        'num_trades': len(result['trade_log']['time']),
+    })
+    # Sharpe, drawdown, win rate, ... so the sweep can be ranked by any of them
+    summary.update(compute_metrics(result, tz=exchange_timezone(symbol)))
+    return summary
+
+
+class SweepPool:
+    """A ProcessPoolExecutor running _run_task over shared datasets, under the StrategyPool's limits.
+
+    Workers get RLIMIT_DATA and a per-task RLIMIT_CPU (an overrun fails that task only).
+    The parent enforces the wall-clock timeout: a task running past it has the workers
+    killed, is reported as timed out, and every other unfinished task is resubmitted to a
+    fresh pool. Setting cancelled, or closing the results() generator, kills the workers.
+    """
+
+    def __init__(self, shared: List[SharedDataset], workers: int, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 cpu_seconds: Optional[float] = DEFAULT_CPU_SECONDS, memory_mb: int = DEFAULT_MEMORY_MB,
+                 cancelled: Optional[threading.Event] = None):
+        self.workers = workers
+        self.timeout = timeout
+        self.cancelled = cancelled or threading.Event()
+        self._initargs = ([s.spec() for s in shared], cpu_seconds, memory_mb)
+        # Unfinished tasks in submission order, {future: (tag, args)}, and finished futures as they complete
+        self._tasks: "OrderedDict[Future, Tuple[Any, tuple]]" = OrderedDict()
+        self._started: Dict[Future, float] = {}
+        self._done: "queue.Queue[Future]" = queue.Queue()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: the API server is multi-threaded, and forking it could copy held locks into workers
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=self._initargs)
+
+    def submit(self, tag: Any, *args):
+        """Queues _run_task(*args); results() yields it back as (tag, summary)."""
+        future = self._executor.submit(_run_task, *args)
+        self._tasks[future] = (tag, args)
+        future.add_done_callback(self._done.put)
+
+    def results(self) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """(tag, summary) of each task as it finishes, including tasks submitted meanwhile."""
+        try:
+            while self._tasks:
+                if self.cancelled.is_set():
+                    return
+                yield from self._expired()
+                try:
+                    future = self._done.get(timeout=POLL_INTERVAL_SECONDS)
+                except queue.Empty:
+                    continue
+                if future not in self._tasks:
+                    continue  # from a pool that was killed; the task was resubmitted
+                if isinstance(future.exception(), BrokenProcessPool):
+                    # A worker died mid-task (a hard crash, the OOM killer, ...): fail what was running, rerun the rest
+                    yield from self._abort(self._running(), "Strategy execution failed: worker process exited unexpectedly")
+                    continue
+                tag, args = self._tasks.pop(future)
+                self._started.pop(future, None)
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = _failed(args, f"Task failed: {e}")
+                yield tag, summary
+        finally:
+            self.close()
+
+    def _running(self) -> List[Future]:
+        # Workers take tasks in submission order, so the running ones are the oldest unfinished ones
+        return list(itertools.islice(self._tasks, self.workers))
+
+    def _expired(self) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        now = time.monotonic()
+        for future in self._running():
+            if now - self._started.setdefault(future, now) > self.timeout and not future.done():
+                yield from self._abort([future], f"Strategy execution failed: timed out after {self.timeout:g}s")
+                return
+
+    def _abort(self, futures: List[Future], error: str) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        # Kills the workers, fails the given tasks and resubmits every other unfinished one to a fresh pool
+        failed = [self._tasks.pop(future) for future in futures]
+        self._kill()
+        tasks, self._tasks = self._tasks, OrderedDict()
+        self._started.clear()
+        self._executor = self._new_executor()
+        for tag, args in tasks.values():
+            self.submit(tag, *args)
+        for tag, args in failed:
+            yield tag, _failed(args, error)
+
+    def _kill(self):
+        # ProcessPoolExecutor cannot stop a running task; the futures left fail with BrokenProcessPool
+        for process in list((self._executor._processes or {}).values()):
+            process.kill()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Kills the workers if tasks are unfinished, else shuts the pool down."""
+        if self._tasks:
+            self._kill()
+            self._tasks.clear()
+        else:
+            self._executor.shutdown(wait=True)
+
+
+def _failed(args: tuple, error: str) -> Dict[str, Any]:
+    # The summary of a _run_task(*args) that raised or never finished
+    summary = {'dataset': args[0], 'params': args[3], 'error': error}
+    if len(args) > 6 and args[6] is not None:
+        summary['window'] = list(args[6])
+    return summary
+
+
+def run_sweep(strategy_code: str, param_grid: Dict[str, List[Any]], datasets: Dict[str, Dict[str, np.ndarray]],
+              symbols: Optional[Dict[str, str]] = None, mode: str = 'auto', initial_capital: float = 10000.0,
+              max_workers: Optional[int] = None, rank_by: str = 'pnl', timeout: float = DEFAULT_TIMEOUT_SECONDS,
+              cpu_seconds: Optional[float] = DEFAULT_CPU_SECONDS, memory_mb: int = DEFAULT_MEMORY_MB,
+              cancelled: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+    """Runs strategy_code for every (dataset, param combination) on a process pool.
+
+    datasets maps a key (e.g. "RELIANCE.NS:1D") to numeric bar columns, which are placed in
+    shared memory once and attached by every worker. Yields {"type": "result", ...} as each
+    run completes, with its rank among the runs finished so far, then a final
+    {"type": "done", "ranking": [...]} sorted by rank_by (descending), which may be pnl or
+    any analytics metric (sharpe, sortino, max_drawdown, win_rate, ...).
+    Each run gets the timeout and CPU/memory limits of a backtest (see SweepPool); once
+    cancelled is set the workers are killed and nothing more is yielded.
+    """
+    combos = expand_grid(param_grid)
+    symbols = symbols or {}
+    shared = [SharedDataset(key, columns) for key, columns in datasets.items()]
+    finished: List[Dict[str, Any]] = []
+    pool = None
+    try:
+        pool = SweepPool(shared, max_workers or os.cpu_count() or 1, timeout, cpu_seconds, memory_mb, cancelled)
+        for key in datasets:
+            for params in combos:
+                pool.submit(None, key, symbols.get(key, key), strategy_code, params, mode, initial_capital)
+        total = len(datasets) * len(combos)
+        for _, summary in pool.results():
+            finished.append(summary)
+            score = summary.get(rank_by)
+            rank = None
+            if score is not None:
+                rank = 1 + sum(1 for r in finished if r.get(rank_by) is not None and r[rank_by] > score)
+            yield {'type': 'result', 'rank': rank, 'completed': len(finished), 'total': total, **summary}
+    finally:
+        if pool is not None:
+            pool.close()
+        for s in shared:
+            s.close()
+    if cancelled is not None and cancelled.is_set():
+        return
+
+    ranking = sorted((r for r in finished if r.get(rank_by) is not None), key=lambda r: r[rank_by], reverse=True)
+    yield {'type': 'done', 'ranking': ranking}
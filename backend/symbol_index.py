@@ -0,0 +1,255 @@
+import csv
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bundled seed master; point INSTRUMENT_MASTER at a full export (e.g. NSE's EQUITY_L.csv) for everything
+DEFAULT_MASTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instruments.csv')
+# Results kept per trie node, i.e. the most a single lookup can return
+MAX_RESULTS = 20
+# Longest name prefix indexed as one key ("TATACONSULTANCY..." for "tata cons")
+MAX_NAME_KEY = 16
+# Shortest query that is retried with typo tolerance (one edit)
+FUZZY_MIN_LENGTH = 4
+# Yahoo suffix per exchange column value; symbols that already carry one are kept as is
+EXCHANGE_SUFFIX = {'NSE': '.NS', 'BSE': '.BO'}
+# Suffix assumed for a bare ticker the master does not know
+DEFAULT_SUFFIX = '.NS'
+
+# Header aliases, so exchange exports can be loaded without conversion
+COLUMN_ALIASES = {
+    'symbol': ('symbol', 'ticker', 'tradingsymbol'),
+    'name': ('name', 'name of company', 'company name', 'security name'),
+    'exchange': ('exchange', 'exch'),
+    'type': ('type', 'instrument_type', 'series'),
+    'rank': ('rank',),
+}
+
+# Key tiers: a symbol match outranks a name match
+TIER_SYMBOL, TIER_FULL_SYMBOL, TIER_NAME = 0, 1, 2
+
+NON_ALNUM_RE = re.compile(r'[^0-9A-Z]+')
+
+
+def normalize(text: str) -> str:
+    """'Bajaj-Auto.NS' -> 'BAJAJAUTONS'; queries and keys are compared in this form."""
+    return NON_ALNUM_RE.sub('', (text or '').upper())
+
+
+def base_symbol(symbol: str) -> str:
+    """Ticker without its exchange or quote suffix: 'RELIANCE.NS' -> 'RELIANCE', 'BTC-USD' -> 'BTC'."""
+    symbol = symbol.upper()
+    for suffix in ('.NS', '.BO'):
+        if symbol.endswith(suffix):
+            return symbol[:-len(suffix)]
+    return symbol.split('-')[0] if '-' in symbol and not symbol.startswith('^') else symbol
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.top: list = []
+
+
+class SymbolIndex:
+    """Prebuilt type-ahead index over an instrument master.
+
+    Every instrument is inserted into one character trie under its bare ticker, its full
+    Yahoo symbol, its whole name and each name word, all normalized to [0-9A-Z]. Each node
+    holds the MAX_RESULTS best instruments below it, ranked by key tier (symbol before name)
+    and master rank, so a prefix lookup is one walk of len(query) nodes. When nothing starts
+    with the query, keys one edit away are looked up in the same trie ("RELAINCE",
+    "INFOSIS").
+    """
+
+    def __init__(self, instruments: Iterable[Dict[str, str]]):
+        self.instruments: List[Dict[str, str]] = []
+        self._by_symbol: Dict[str, int] = {}
+        self._by_base: Dict[str, List[int]] = {}
+        self._exact: Dict[str, List[int]] = {}
+        self._root = _Node()
+
+        for row in instruments:
+            symbol = row['symbol'].upper()
+            if symbol in self._by_symbol:
+                continue
+            i = len(self.instruments)
+            self.instruments.append({'symbol': symbol, 'name': row.get('name') or symbol, 'exchange': row.get('exchange') or ''})
+            self._by_symbol[symbol] = i
+            self._by_base.setdefault(base_symbol(symbol), []).append(i)
+            rank = row.get('rank')
+            priority = float(rank) if rank not in (None, '') else float(i)
+            for key, tier in self._keys(symbol, self.instruments[i]['name']):
+                self._insert(key, (tier, priority, i))
+        self._finalize(self._root)
+
+    @staticmethod
+    def _keys(symbol: str, name: str) -> List[Tuple[str, int]]:
+        base, full, words = normalize(base_symbol(symbol)), normalize(symbol), [normalize(w) for w in name.split()]
+        keys = [(base, TIER_SYMBOL)]
+        if full != base:
+            keys.append((full, TIER_FULL_SYMBOL))
+        # The first word is a prefix of the whole name, so only later words get keys of their own
+        keys.append((''.join(words)[:MAX_NAME_KEY], TIER_NAME))
+        keys += [(word, TIER_NAME) for word in words[1:] if len(word) >= 2]
+        return [(key, tier) for key, tier in keys if key]
+
+    def _insert(self, key: str, entry: tuple):
+        node = self._root
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+            node.top.append(entry)
+            if len(node.top) > 4 * MAX_RESULTS:
+                node.top = self._best(node.top)
+        if entry[0] != TIER_NAME:
+            self._exact.setdefault(key, []).append(entry[2])
+
+    @staticmethod
+    def _best(entries: list) -> list:
+        # Best entry per instrument, then the MAX_RESULTS best overall
+        seen, out = set(), []
+        for entry in sorted(entries):
+            if entry[2] not in seen:
+                seen.add(entry[2])
+                out.append(entry)
+                if len(out) == MAX_RESULTS:
+                    break
+        return out
+
+    def _finalize(self, root: _Node):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.top = [entry[2] for entry in self._best(node.top)]
+            stack.extend(node.children.values())
+
+    def __len__(self) -> int:
+        return len(self.instruments)
+
+    def _walk(self, key: str) -> Optional[_Node]:
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _walk_from(self, node: Optional[_Node], key: str) -> Optional[_Node]:
+        for ch in key:
+            if node is None:
+                return None
+            node = node.children.get(ch)
+        return node
+
+    def _near(self, key: str) -> List[int]:
+        """Instruments with a key starting within one edit (Damerau) of key.
+
+        Enumerates the edits against the trie instead of scoring every node: for each
+        position, the substitutions and insertions are the children of the node the
+        untouched prefix leads to, and each candidate is one short walk. The first character
+        is taken as typed. Later edits come first, as they keep more of what was typed.
+        """
+        prefix = [self._root]
+        for ch in key:
+            node = prefix[-1].children.get(ch)
+            if node is None:
+                break
+            prefix.append(node)
+
+        ids = []
+        for i in range(min(len(prefix) - 1, len(key) - 1), 0, -1):
+            node, rest = prefix[i], key[i + 1:]
+            candidates = [self._walk_from(node, rest)]  # key[i] deleted
+            for ch, child in node.children.items():
+                if ch != key[i]:
+                    candidates.append(self._walk_from(child, rest))  # key[i] replaced by ch
+                candidates.append(self._walk_from(child, key[i:]))  # ch inserted before key[i]
+            if rest:
+                candidates.append(self._walk_from(node, rest[0] + key[i] + rest[1:]))  # swapped
+            for hit in candidates:
+                if hit is not None:
+                    ids.extend(hit.top)
+        return ids
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[Dict[str, str]]:
+        """Ranked matches: exact tickers, then prefix matches, then near misses."""
+        key = normalize(query)
+        if not key:
+            return []
+        ids = list(self._exact.get(key, []))
+        node = self._walk(key)
+        if node is not None:
+            ids.extend(node.top)
+        if not ids and len(key) >= FUZZY_MIN_LENGTH:
+            # Nothing starts with the query, so it most likely has a typo
+            ids = self._near(key)
+
+        out, seen = [], set()
+        for i in ids:
+            if i not in seen:
+                seen.add(i)
+                out.append(self.instruments[i])
+                if len(out) == limit:
+                    break
+        return out
+
+    def resolve(self, symbol: str) -> str:
+        """Yahoo symbol for what a user typed: 'RELIANCE' -> 'RELIANCE.NS', 'BTC' -> 'BTC-USD'.
+
+        Known symbols are returned unchanged; a bare ticker maps to its first listing in the
+        master (list NSE before BSE to prefer it). Anything the master does not know keeps
+        its suffix if it has one and otherwise gets DEFAULT_SUFFIX.
+        """
+        symbol = (symbol or '').strip().upper()
+        if symbol in self._by_symbol:
+            return symbol
+        listings = self._by_base.get(symbol)
+        if listings:
+            return self.instruments[min(listings)]['symbol']
+        if '.' in symbol or '-' in symbol or symbol.startswith('^') or '=' in symbol:
+            return symbol
+        return f"{symbol}{DEFAULT_SUFFIX}"
+
+
+def load_master(path: str) -> List[Dict[str, str]]:
+    """Instrument rows from a CSV master; exchange-suffixes bare NSE/BSE tickers."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        headers = {h.strip().lower(): h for h in reader.fieldnames or []}
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            columns[field] = next((headers[a] for a in aliases if a in headers), None)
+        if columns['symbol'] is None:
+            raise ValueError(f"{path} has no symbol column")
+
+        # NSE's EQUITY_L.csv has no exchange column
+        default_exchange = 'NSE' if 'name of company' in headers else ''
+        rows = []
+        for raw in reader:
+            row = {field: (raw.get(col) or '').strip() for field, col in columns.items() if col}
+            symbol = row.get('symbol', '').upper()
+            if not symbol:
+                continue
+            exchange = row.get('exchange', '').upper() or default_exchange
+            suffix = EXCHANGE_SUFFIX.get(exchange)
+            if suffix and '.' not in symbol and not symbol.startswith('^'):
+                symbol += suffix
+            row['symbol'], row['exchange'] = symbol, exchange
+            rows.append(row)
+        return rows
+
+
+def build_index(path: Optional[str] = None, fallback: Iterable[Dict[str, str]] = ()) -> SymbolIndex:
+    """Index over the master at path (INSTRUMENT_MASTER, else the bundled seed) plus fallback rows."""
+    path = path or os.getenv('INSTRUMENT_MASTER') or DEFAULT_MASTER_PATH
+    rows: List[Dict[str, str]] = []
+    try:
+        rows = load_master(path)
+    except Exception as e:
+        print(f"Error loading instrument master {path}: {e}")
+    return SymbolIndex(list(rows) + list(fallback))
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import infer_bars_per_year
+
+
+def unix_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.as_unit('s').asi8
+
+
+def test_nse_daily_bars_are_not_crypto():
+    # Midnight IST is 18:30 UTC the day before, so Mondays fall on UTC Sundays
+    bars = unix_seconds(pd.bdate_range('2023-01-02', periods=300).tz_localize('Asia/Kolkata'))
+    assert infer_bars_per_year(bars, 'Asia/Kolkata') == 252.0
+    assert infer_bars_per_year(bars) == 252.0
+
+
+def test_crypto_daily_bars_trade_weekends():
+    bars = unix_seconds(pd.date_range('2023-01-01', periods=300, freq='D', tz='UTC'))
+    assert infer_bars_per_year(bars, 'UTC') == 365.0
+    assert infer_bars_per_year(bars) == 365.0
+
+
+def test_intraday_bars_per_session():
+    days = pd.bdate_range('2023-01-02', periods=20)
+    opens = pd.to_timedelta(np.arange(9 * 60 + 15, 15 * 60 + 30, 5), unit='m')
+    bars = unix_seconds(pd.DatetimeIndex((days.values[:, None] + opens.values[None, :]).ravel()).tz_localize('Asia/Kolkata'))
+    assert infer_bars_per_year(bars, 'Asia/Kolkata') == pytest.approx(75 * 252)
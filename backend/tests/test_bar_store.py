@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import BarStore, FrameProvider
+
+
+def daily_bars(start: str, periods: int) -> pd.DataFrame:
+    index = pd.date_range(start, periods=periods, freq='D', tz='UTC', name='Date')
+    close = np.arange(periods, dtype='float64') + 100
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000.0}, index=index)
+
+
+def ts(value: str) -> pd.Timestamp:
+    return pd.Timestamp(value, tz='UTC')
+
+
+@pytest.fixture
+def provider():
+    return FrameProvider({('ABC', '1d'): daily_bars('2024-01-01', 120)})
+
+
+@pytest.fixture
+def store(provider, tmp_path):
+    return BarStore(provider, root=str(tmp_path))
+
+
+def test_repeated_window_is_served_from_disk(store, provider):
+    first = store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    again = store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    inside = store.get_bars('ABC', '1d', '2024-02-10', '2024-02-20')
+    assert len(provider.calls) == 1
+    assert len(first) == 29
+    pd.testing.assert_frame_equal(first, again)
+    assert inside.index[0] == ts('2024-02-10') and len(inside) == 10
+
+
+def test_earlier_start_fetches_only_the_head(store, provider):
+    store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    bars = store.get_bars('ABC', '1d', '2024-01-15', '2024-03-01')
+    assert [(start, end) for _, _, start, end in provider.calls[1:]] == [(ts('2024-01-15'), ts('2024-02-01'))]
+    assert bars.index[0] == ts('2024-01-15') and bars.index[-1] == ts('2024-02-29')
+    assert bars.index.is_unique
+
+
+def test_later_end_fetches_the_tail_from_the_last_stored_bar(store, provider):
+    store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    bars = store.get_bars('ABC', '1d', '2024-02-01', '2024-03-10')
+    # The last stored bar may have been forming when it was fetched, so it is refetched too
+    assert [(start, end) for _, _, start, end in provider.calls[1:]] == [(ts('2024-02-29'), ts('2024-03-10'))]
+    assert len(bars) == 38 and bars.index.is_unique
+
+
+def test_head_and_tail_gaps_in_one_request(store, provider):
+    store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    bars = store.get_bars('ABC', '1d', '2024-01-20', '2024-03-05')
+    assert sorted((start, end) for _, _, start, end in provider.calls[1:]) == [
+        (ts('2024-01-20'), ts('2024-02-01')),
+        (ts('2024-02-29'), ts('2024-03-05')),
+    ]
+    assert len(bars) == 45
+
+
+def test_refetched_bars_replace_stored_ones(store, provider):
+    store.get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    revised = daily_bars('2024-01-01', 120)
+    revised.loc[ts('2024-02-29'), 'Close'] = 1.0
+    provider.add('ABC', '1d', revised)
+    bars = store.get_bars('ABC', '1d', '2024-02-01', '2024-03-10')
+    assert bars.loc[ts('2024-02-29'), 'Close'] == 1.0
+
+
+def test_open_ended_requests_refresh_the_tail_after_refresh_after(provider, tmp_path):
+    now = pd.Timestamp.now(tz='UTC').floor('h')
+    index = pd.date_range(end=now, periods=48, freq='h', name='Datetime')
+    provider.add('ABC', '1h', pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 10.0}, index=index))
+    store = BarStore(provider, root=str(tmp_path), refresh_after=60.0)
+    start = now - pd.Timedelta(hours=24)
+
+    assert len(store.get_bars('ABC', '1h', start)) == 25
+    store.get_bars('ABC', '1h', start)
+    assert len(provider.calls) == 1
+
+    store.refresh_after = 0.0
+    store.get_bars('ABC', '1h', start)
+    assert len(provider.calls) == 2
+    assert provider.calls[1][2] == now
+
+
+def test_store_persists_across_instances(provider, tmp_path):
+    BarStore(provider, root=str(tmp_path)).get_bars('ABC', '1d', '2024-02-01', '2024-03-01')
+    bars = BarStore(provider, root=str(tmp_path)).get_bars('ABC', '1d', '2024-02-05', '2024-02-25')
+    assert len(provider.calls) == 1 and len(bars) == 20
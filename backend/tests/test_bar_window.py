@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from bar_window import MIN_LOD_WIDTH, bucket_ohlcv, lttb, window, window_bounds
+from dataset_registry import Dataset
+
+N = 1000
+
+
+def columns(n: int = N, seed: int = 5) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    spread = np.abs(rng.normal(0, 1, n))
+    ema = close.copy()
+    ema[:20] = np.nan
+    return {
+        'time': (1_700_000_000 + 60 * np.arange(n)).tolist(),
+        'open': (close - 0.5).tolist(), 'high': (close + spread).tolist(), 'low': (close - spread).tolist(),
+        'close': close.tolist(), 'volume': rng.integers(1, 100, n).astype('float64').tolist(),
+        'ema': [None if np.isnan(v) else v for v in ema],
+    }
+
+
+@pytest.fixture
+def dataset():
+    return Dataset('h', ('X',), columns())
+
+
+def test_cursor_pages_cover_every_bar_once(dataset):
+    times, cursor = [], 0
+    while cursor is not None:
+        page = window(dataset, cursor=cursor, limit=300)
+        times += page['columns']['time']
+        cursor = page['next_cursor']
+    assert times == dataset.columns['time']
+    assert page['start'] == 900 and page['end'] == N
+
+
+def test_time_range_is_inclusive(dataset):
+    t = dataset.columns['time']
+    page = window(dataset, from_time=t[10], to_time=t[19])
+    assert (page['start'], page['end']) == (10, 20)
+    assert page['columns']['close'] == dataset.columns['close'][10:20]
+    # Times between bars snap inward
+    assert window_bounds(np.asarray(t), t[10] + 1, t[19] - 1) == (11, 19)
+
+
+def test_scrolling_back_takes_the_limit_bars_ending_at_to_time(dataset):
+    t = np.asarray(dataset.columns['time'])
+    assert window_bounds(t, to_time=t[499], limit=100) == (400, 500)
+    assert window_bounds(t, to_time=t[49], limit=100) == (0, 50)
+    assert window_bounds(t, from_time=t[950], limit=100) == (950, N)
+    assert window_bounds(t, cursor=N + 5, limit=10) == (N, N)
+
+
+def test_window_that_fits_is_returned_as_is(dataset):
+    page = window(dataset, cursor=0, limit=50, width=100)
+    assert 'lod' not in page and page['columns']['ema'] == dataset.columns['ema'][:50]
+
+
+@pytest.mark.parametrize('lo,hi,buckets', [(0, N, 100), (0, N, 7), (13, 977, 64), (0, 5, 10)])
+def test_buckets_preserve_ohlcv_invariants(dataset, lo, hi, buckets):
+    arrays = dataset.arrays
+    out = bucket_ohlcv(arrays, lo, hi, buckets)
+    starts = np.searchsorted(arrays['time'], out['time'])
+    ends = np.r_[starts[1:], hi]
+    assert starts[0] == lo and len(starts) == min(buckets, hi - lo)
+    for i, (a, b) in enumerate(zip(starts, ends)):
+        assert out['open'][i] == arrays['open'][a]
+        assert out['close'][i] == arrays['close'][b - 1]
+        assert out['high'][i] == arrays['high'][a:b].max()
+        assert out['low'][i] == arrays['low'][a:b].min()
+    # Extremes and volume survive downsampling
+    assert out['high'].max() == arrays['high'][lo:hi].max()
+    assert out['low'].min() == arrays['low'][lo:hi].min()
+    assert out['volume'].sum() == arrays['volume'][lo:hi].sum()
+
+
+def test_bucket_sizes_differ_by_at_most_one(dataset):
+    out = bucket_ohlcv(dataset.arrays, 0, N, 300)
+    sizes = np.diff(np.r_[np.searchsorted(dataset.arrays['time'], out['time']), N])
+    assert sizes.max() - sizes.min() <= 1
+
+
+def test_lod_view(dataset):
+    page = window(dataset, width=100)
+    assert page['lod'] is True and len(page['columns']['time']) == 100
+    assert page['bars_per_bucket'] == N / 100
+    assert max(page['columns']['high']) == max(dataset.columns['high'])
+    ema = page['series']['ema']
+    assert len(ema['time']) == 100
+    # LTTB runs over the defined values only
+    assert ema['time'][0] == dataset.columns['time'][20] and ema['time'][-1] == dataset.columns['time'][-1]
+    assert len(window(dataset, width=1)['columns']['time']) == MIN_LOD_WIDTH
+
+
+@pytest.mark.parametrize('threshold', [3, 10, 99, 500])
+def test_lttb_keeps_endpoints_and_order(threshold):
+    rng = np.random.default_rng(threshold)
+    x = np.arange(N)
+    y = np.cumsum(rng.normal(0, 1, N))
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == N - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(N)
+    y[437] = 50.0
+    assert 437 in lttb(np.arange(N), y, 20)
+
+
+def test_lttb_returns_everything_when_it_fits():
+    np.testing.assert_array_equal(lttb(np.arange(5), np.ones(5), 5), np.arange(5))
+    np.testing.assert_array_equal(lttb(np.arange(5), np.ones(5), 2), np.arange(5))
@@ -0,0 +1,85 @@
+import numpy as np
+
+from dataset_registry import LIST_VALUE_BYTES, DatasetRegistry, dataset_key
+
+
+def columns(n: int = 100, shift: float = 0.0) -> dict:
+    close = (100 + np.arange(n) + shift).tolist()
+    return {'time': list(range(n)), 'open': close, 'high': close, 'low': close, 'close': close, 'volume': [1.0] * n}
+
+
+def size(n: int = 100) -> int:
+    return n * 6 * LIST_VALUE_BYTES
+
+
+def key(symbol: str = 'ABC.NS') -> tuple:
+    return dataset_key(symbol, '1D', None, None, None)
+
+
+def test_identical_requests_share_a_handle():
+    registry = DatasetRegistry()
+    first = registry.put(key(), columns())
+    second = registry.put(dataset_key('abc.ns', '1D', None, None, None), columns())
+    assert second is first
+    assert registry.get(first.handle) is first and registry.latest() is first
+    # Indicator specs are compared canonically
+    assert dataset_key('X', '1D', None, None, '[{"type": "EMA", "id": "e"}, {"id": "r", "type": "RSI"}]') == \
+        dataset_key('X', '1D', None, None, '[{"id": "r", "type": "RSI"}, {"id": "e", "type": "EMA"}]')
+
+
+def test_refetch_with_new_bars_gets_a_new_handle_and_keeps_the_old_one():
+    registry = DatasetRegistry()
+    old = registry.put(key(), columns())
+    new = registry.put(key(), columns(shift=1.0))
+    assert new.handle != old.handle
+    assert registry.get(old.handle) is old and registry.latest() is new
+    assert registry.put(key('XYZ.NS'), columns()).handle != old.handle
+
+
+def test_least_recently_used_is_evicted_over_budget():
+    registry = DatasetRegistry(max_bytes=2 * size())
+    a = registry.put(key('A'), columns())
+    b = registry.put(key('B'), columns())
+    registry.get(a.handle)
+    c = registry.put(key('C'), columns())
+    assert registry.get(b.handle) is None
+    assert registry.get(a.handle) is a and registry.get(c.handle) is c
+    assert registry.stats()['bytes'] == 2 * size()
+
+
+def test_acquired_datasets_are_pinned_until_released():
+    registry = DatasetRegistry(max_bytes=size())
+    a = registry.put(key('A'), columns())
+    assert registry.acquire(a.handle) is a
+    registry.acquire(a.handle)
+    b = registry.put(key('B'), columns())
+    registry.put(key('C'), columns())
+    assert registry.get(a.handle) is a and registry.get(b.handle) is None
+    assert registry.stats()['in_use'] == 1
+
+    registry.release(a)
+    assert registry.get(a.handle) is a
+    registry.release(a)
+    assert registry.get(a.handle) is None
+    assert registry.acquire('missing') is None
+
+
+def test_dataset_over_budget_still_resolves_until_superseded():
+    registry = DatasetRegistry(max_bytes=size(50))
+    big = registry.put(key('BIG'), columns(200))
+    assert registry.get(big.handle) is big and registry.latest() is big
+    registry.acquire(big.handle)
+    registry.release(big)
+    assert registry.get(big.handle) is big
+
+    small = registry.put(key('SMALL'), columns(10))
+    assert registry.get(big.handle) is None and registry.get(small.handle) is small
+
+
+def test_materialized_views_count_towards_the_budget():
+    registry = DatasetRegistry()
+    dataset = registry.put(key(), columns())
+    before = dataset.nbytes
+    assert len(dataset.records) == 100 and dataset.arrays['time'].dtype == np.int64
+    assert dataset.nbytes > before
+    assert registry.stats()['bytes'] == dataset.nbytes
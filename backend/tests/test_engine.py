@@ -0,0 +1,233 @@
+import numpy as np
+import pytest
+
+from engine import BacktestEngine, Portfolio, StrategyRunner, simulate_orders
+
+
+def walk(n: int = 500, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    time = np.arange(n, dtype='int64') * 60 + 1_700_000_000
+    return time, close, rng.integers(-3, 4, n)
+
+
+def test_fill_buffers_grow_past_their_initial_size():
+    portfolio = Portfolio(1e9, 'X')
+    expected = []
+    for i in range(300):
+        portfolio.set_price(100.0 + i, 1000 + i)
+        portfolio.buy(2)
+        portfolio.sell(1)
+        expected += [(1000 + i, 'BUY', 100.0 + i, 2.0), (1000 + i, 'SELL', 100.0 + i, 1.0)]
+    assert portfolio.trade_count == 600
+    assert [(t['time'], t['type'], t['price'], t['qty']) for t in portfolio.trades] == expected
+    arrays = portfolio.trade_arrays(598)
+    assert arrays['time'].tolist() == [1299, 1299] and arrays['side'].tolist() == [1, -1]
+    assert portfolio.positions == 300
+
+
+def test_trades_list_is_extended_not_rebuilt():
+    portfolio = Portfolio(10000.0, 'X')
+    portfolio.set_price(10.0, 1)
+    portfolio.buy(5)
+    first = portfolio.trades
+    assert portfolio.trades is first and len(first) == 1
+    portfolio.set_price(12.0, 2)
+    portfolio.sell(5)
+    assert portfolio.trades is first
+    assert first[-1] == {'time': 2, 'type': 'SELL', 'price': 12.0, 'qty': 5.0}
+
+
+def test_restore_drops_later_fills_from_the_trades_list():
+    portfolio = Portfolio(10000.0, 'X')
+    portfolio.set_price(10.0, 1)
+    portfolio.buy(5)
+    saved = portfolio.checkpoint()
+    portfolio.set_price(11.0, 2)
+    portfolio.sell(5)
+    assert len(portfolio.trades) == 2
+    portfolio.restore(saved)
+    portfolio.set_price(9.0, 2)
+    portfolio.buy(1)
+    assert [t['price'] for t in portfolio.trades] == [10.0, 9.0]
+    assert portfolio.cash == pytest.approx(10000.0 - 50.0 - 9.0)
+
+
+def test_rejected_orders_leave_no_fill():
+    portfolio = Portfolio(100.0, 'X')
+    portfolio.set_price(30.0, 1)
+    portfolio.buy(4)
+    portfolio.sell(1)
+    assert portfolio.trade_count == 0 and portfolio.cash == 100.0
+
+
+def test_equity_curve_matches_bar_by_bar_bookkeeping():
+    time, close, orders = walk()
+    portfolio = Portfolio(2000.0, 'X')
+    equity, cash, position = [], [], []
+    for t, price, qty in zip(time.tolist(), close.tolist(), orders.tolist()):
+        portfolio.set_price(price, t)
+        if qty > 0:
+            portfolio.buy(qty)
+        elif qty < 0:
+            portfolio.sell(-qty)
+        equity.append(portfolio.get_value())
+        cash.append(portfolio.cash)
+        position.append(portfolio.positions)
+    curve = portfolio.curve_arrays(time, close, 2000.0)
+    assert portfolio.trade_count > 64
+    np.testing.assert_array_equal(curve['time'], time)
+    np.testing.assert_allclose(curve['equity'], equity, rtol=1e-12)
+    np.testing.assert_allclose(curve['cash'], cash, rtol=1e-12)
+    np.testing.assert_array_equal(curve['position'], position)
+
+
+def portfolio_run(time, close, capital, orders=None, targets=None):
+    """The same orders placed from on_candle through a Portfolio, bar by bar."""
+    portfolio = Portfolio(capital, 'X')
+    for i, (t, price) in enumerate(zip(time.tolist(), close.tolist())):
+        portfolio.set_price(price, t)
+        qty = orders[i] if targets is None else targets[i] - portfolio.positions
+        if qty > 0:
+            portfolio.buy(qty)
+        elif qty < 0:
+            portfolio.sell(-qty)
+    return portfolio.trade_arrays(), portfolio.curve_arrays(time, close, capital)
+
+
+def assert_same_run(sim, expected):
+    trades, curve = expected
+    for key in ('time', 'side', 'price', 'qty'):
+        np.testing.assert_array_equal(sim['trades'][key], trades[key], err_msg=key)
+    for key in ('equity', 'cash', 'position'):
+        np.testing.assert_allclose(sim['curve'][key], curve[key], rtol=1e-12, err_msg=key)
+
+
+def test_simulate_orders_fast_path_matches_portfolio():
+    time, close, _ = walk()
+    # Buy 3, then sell it off in two partial fills; always affordable, so every order fills
+    orders = np.tile([3.0, 0.0, -1.0, 0.0, -2.0], len(close) // 5)
+    sim = simulate_orders(time, close, 1e6, orders=orders)
+    assert len(sim['trades']['time']) == 3 * len(close) // 5
+    assert_same_run(sim, portfolio_run(time, close, 1e6, orders=orders))
+
+
+@pytest.mark.parametrize('capital', [2000.0, 350.0])
+def test_simulate_orders_rejects_like_portfolio(capital):
+    # Random buys and sells: oversized sells (no shorting) and, with little cash, unaffordable buys are dropped
+    time, close, orders = walk()
+    sim = simulate_orders(time, close, capital, orders=orders.astype('float64'))
+    assert 0 < len(sim['trades']['time']) < np.count_nonzero(orders)
+    assert_same_run(sim, portfolio_run(time, close, capital, orders=orders))
+
+
+def test_simulate_targets_matches_portfolio():
+    time, close, orders = walk()
+    targets = np.clip(np.cumsum(orders), 0, 12).astype('float64')
+    sim = simulate_orders(time, close, 800.0, targets=targets)
+    assert_same_run(sim, portfolio_run(time, close, 800.0, targets=targets))
+
+
+def test_vectorized_and_on_candle_strategies_agree():
+    time, close, orders = walk(300)
+    columns = {'time': time, 'open': close, 'high': close, 'low': close, 'close': close, 'volume': np.ones(len(close))}
+    engine = BacktestEngine(1500.0)
+    vectorized = engine.run_strategy("def signals(data):\n    return params['orders']\n", columns, 'X',
+                                     params={'orders': orders}, as_arrays=True)
+    candle = engine.run_strategy(
+        "def on_candle(candle, portfolio):\n"
+        "    qty = params['orders'][params.setdefault('i', 0)]\n"
+        "    params['i'] += 1\n"
+        "    if qty > 0:\n        portfolio.buy(qty)\n"
+        "    elif qty < 0:\n        portfolio.sell(-qty)\n",
+        columns, 'X', params={'orders': orders.tolist()}, as_arrays=True)
+    assert vectorized['final_value'] == pytest.approx(candle['final_value'], rel=1e-12)
+    assert_same_run({'trades': vectorized['trade_log'], 'curve': vectorized['equity_curve']},
+                    (candle['trade_log'], candle['equity_curve']))
+
+
+STATEFUL = """
+seen = []
+def on_candle(candle, portfolio):
+    seen.append(candle['time'])
+    if len(seen) % 7 == 0:
+        portfolio.buy(1)
+    elif len(seen) % 11 == 0 and portfolio.positions:
+        portfolio.sell(portfolio.positions)
+"""
+
+
+def rows(n: int = 600):
+    time, close, _ = walk(n)
+    return [{'time': int(t), 'open': c, 'high': c, 'low': c, 'close': c, 'volume': 1.0} for t, c in zip(time, close)]
+
+
+def counting(runner: StrategyRunner) -> list:
+    calls = []
+    on_candle = runner.on_candle
+    runner.on_candle = lambda candle, portfolio: calls.append(candle['time']) or on_candle(candle, portfolio)
+    return calls
+
+
+def test_advance_in_steps_matches_one_pass():
+    data = rows()
+    whole = StrategyRunner(STATEFUL, 'X', checkpoint_every=64).advance(data, 0, 600)
+    runner = StrategyRunner(STATEFUL, 'X', checkpoint_every=64)
+    steps = [runner.advance(data, a, b) for a, b in [(0, 1), (1, 250), (250, 251), (251, 600)]]
+    assert sum((step['fills'] for step in steps), []) == whole['fills']
+    assert sum((step['equity'] for step in steps), []) == whole['equity']
+    assert steps[-1]['value'] == whole['value'] and steps[-1]['position'] == whole['position']
+
+
+def test_advance_materializes_fills_once(monkeypatch):
+    calls = []
+    trade_arrays = Portfolio.trade_arrays
+    monkeypatch.setattr(Portfolio, 'trade_arrays', lambda self, start=0: calls.append(start) or trade_arrays(self, start))
+    update = StrategyRunner(STATEFUL, 'X').advance(rows(), 0, 300)
+    assert len(calls) == 1 and len(update['equity']) == 300 and update['fills']
+
+
+def test_checkpoints_are_taken_every_n_bars():
+    runner = StrategyRunner(STATEFUL, 'X', checkpoint_every=100)
+    runner.run_to(rows(), 450)
+    assert sorted(runner._checkpoints) == [0, 100, 200, 300, 400]
+    state, _ = runner._checkpoints[300]
+    assert len(state['seen']) == 300
+
+
+def test_rewind_restores_the_nearest_checkpoint_and_reruns_the_rest():
+    data = rows()
+    runner = StrategyRunner(STATEFUL, 'X', checkpoint_every=100)
+    runner.run_to(data, 500)
+    calls = counting(runner)
+    rewound = runner.catch_up(data, 250)
+    # Restored from the snapshot at bar 200, so only bars 200..249 run again
+    assert calls == [row['time'] for row in data[200:250]]
+    assert len(runner.env['seen']) == 250
+    assert sorted(runner._checkpoints) == [0, 100, 200]
+
+    fresh = StrategyRunner(STATEFUL, 'X', checkpoint_every=100)
+    assert rewound == fresh.catch_up(data, 250)
+    assert runner.advance(data, 250, 600) == fresh.advance(data, 250, 600)
+
+
+def test_restored_state_is_not_shared_with_the_checkpoint():
+    data = rows()
+    runner = StrategyRunner(STATEFUL, 'X', checkpoint_every=100)
+    runner.run_to(data, 300)
+    runner.run_to(data, 150)
+    runner.run_to(data, 300)
+    runner.run_to(data, 120)
+    assert len(runner.env['seen']) == 120
+    assert len(runner._checkpoints[100][0]['seen']) == 100
+
+
+def test_uncopyable_state_rewinds_from_the_start():
+    code = "import threading\nlock = threading.Lock()\n" + STATEFUL
+    data = rows()
+    runner = StrategyRunner(code, 'X', checkpoint_every=100)
+    runner.run_to(data, 300)
+    assert runner.checkpoint_every == 0 and runner._checkpoints == {}
+    rewound = runner.catch_up(data, 150)
+    assert rewound == StrategyRunner(STATEFUL, 'X').catch_up(data, 150)
+    assert len(runner.env['seen']) == 150
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import BarStore, FrameProvider
+from fetcher import BarFetcher
+
+SYMBOLS = ['AAA.NS', 'BBB.NS', 'CCC.NS']
+
+
+def daily_bars(periods: int = 60) -> pd.DataFrame:
+    index = pd.date_range('2024-01-01', periods=periods, freq='D', tz='UTC', name='Date')
+    close = np.linspace(100, 110, periods)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 500.0}, index=index)
+
+
+class GatedProvider(FrameProvider):
+    """FrameProvider whose downloads block until released, so requests overlap deterministically."""
+
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def fetch(self, *args):
+        self.started.set()
+        self.gate.wait(5)
+        return super().fetch(*args)
+
+    def fetch_many(self, *args):
+        self.started.set()
+        self.gate.wait(5)
+        return super().fetch_many(*args)
+
+
+def wait_idle(fetcher: BarFetcher):
+    # Futures drop out of the in-flight table in a done-callback, just after result() returns
+    deadline = time.monotonic() + 5
+    while fetcher.stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def provider():
+    return GatedProvider({(symbol, '1d'): daily_bars() for symbol in SYMBOLS})
+
+
+@pytest.fixture
+def fetcher(provider, tmp_path):
+    fetcher = BarFetcher(BarStore(provider, root=str(tmp_path)), max_workers=4)
+    yield fetcher
+    provider.gate.set()
+    fetcher._pool.shutdown(wait=True)
+
+
+def test_identical_requests_share_one_download(fetcher, provider):
+    first = fetcher.fetch('AAA.NS', '1d', '2024-01-10', '2024-02-10')
+    assert provider.started.wait(5)
+    second = fetcher.fetch('aaa.ns ', '1d', '2024-01-10', '2024-02-10')
+    assert second is first
+    provider.gate.set()
+    assert len(first.result(5)) == 31
+    assert len(provider.calls) == 1
+    stats = fetcher.stats()
+    assert (stats['requests'], stats['coalesced'], stats['batches']) == (2, 1, 1)
+
+
+def test_completed_requests_are_not_coalesced(fetcher, provider):
+    provider.gate.set()
+    first = fetcher.fetch('AAA.NS', '1d', '2024-01-10', '2024-02-10')
+    first.result(5)
+    wait_idle(fetcher)
+    second = fetcher.fetch('AAA.NS', '1d', '2024-01-10', '2024-02-10')
+    assert second is not first
+    assert len(second.result(5)) == 31
+    # Served from the bar store, without a second download
+    assert len(provider.calls) == 1
+
+
+def test_open_ended_requests_within_the_window_coalesce(fetcher, provider):
+    now = pd.Timestamp.now(tz='UTC')
+    first = fetcher.fetch('AAA.NS', '1d', now.floor('min') - pd.Timedelta(days=30))
+    second = fetcher.fetch('AAA.NS', '1d', now.floor('min') - pd.Timedelta(days=30) + pd.Timedelta(seconds=20))
+    assert second is first
+
+
+def test_fetch_many_is_one_bulk_download(fetcher, provider):
+    provider.gate.set()
+    futures = fetcher.fetch_many(SYMBOLS, '1d', '2024-01-10', '2024-02-10')
+    frames = {symbol: future.result(5) for symbol, future in futures.items()}
+    assert set(frames) == set(SYMBOLS)
+    assert all(len(frame) == 31 for frame in frames.values())
+    assert provider.calls == []
+    assert len(provider.batch_calls) == 1
+    assert sorted(provider.batch_calls[0][0]) == SYMBOLS
+
+
+def test_fetch_many_leaves_in_flight_symbols_out_of_the_batch(fetcher, provider):
+    single = fetcher.fetch('AAA.NS', '1d', '2024-01-10', '2024-02-10')
+    assert provider.started.wait(5)
+    futures = fetcher.fetch_many(SYMBOLS, '1d', '2024-01-10', '2024-02-10')
+    assert futures['AAA.NS'] is single
+    provider.gate.set()
+    for future in futures.values():
+        future.result(5)
+    assert [call[0] for call in provider.calls] == ['AAA.NS']
+    assert [sorted(symbols) for symbols, *_ in provider.batch_calls] == [['BBB.NS', 'CCC.NS']]
+    assert fetcher.stats()['coalesced'] == 1
+
+
+def test_prefetch_reports_bars_per_symbol(fetcher, provider):
+    provider.gate.set()
+    counts = fetcher.prefetch(SYMBOLS + ['MISSING.NS'], '1d', '2024-01-10', '2024-02-10', timeout=5)
+    assert counts == {'AAA.NS': 31, 'BBB.NS': 31, 'CCC.NS': 31, 'MISSING.NS': 0}
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_cache import OBJECT_OVERHEAD_BYTES, IndicatorCache, bar_fingerprint
+from indicators import compute_indicators
+
+KB = 1024
+
+
+def outputs(kb: int = 1) -> dict:
+    # kb KiB of float64
+    return {'value': np.zeros(kb * KB // 8)}
+
+
+def test_hits_and_misses_are_counted():
+    cache = IndicatorCache()
+    assert cache.get('a') is None
+    cache.put('a', outputs())
+    assert cache.get('a')['value'].shape == (128,)
+    cache.get('a')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+    assert IndicatorCache().stats()['hit_rate'] == 0.0
+
+
+def test_least_recently_used_is_evicted_by_bytes():
+    cache = IndicatorCache(max_bytes=3 * KB)
+    for key in 'abc':
+        cache.put(key, outputs())
+    cache.get('a')  # b is now the least recently used
+    cache.put('d', outputs())
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.stats()['evictions'] == 1 and cache.bytes == 3 * KB
+
+    # One large entry pushes out as many small ones as it needs
+    cache.put('e', outputs(2))
+    assert cache.stats()['entries'] == 2 and cache.get('d') is not None and cache.get('e') is not None
+    assert cache.bytes <= cache.max_bytes
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = IndicatorCache(max_bytes=4 * KB)
+    cache.put('a', outputs(1))
+    cache.put('a', outputs(3))
+    assert cache.bytes == 3 * KB and cache.stats()['entries'] == 1
+
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    cache = IndicatorCache(max_bytes=2 * KB)
+    cache.put('a', outputs())
+    arrays = cache.put('big', outputs(4))
+    assert len(arrays['value']) == 512
+    assert cache.get('big') is None and cache.get('a') is not None
+
+
+def test_cached_arrays_are_read_only_copies():
+    cache = IndicatorCache()
+    values = pd.Series([1.0, 2.0, 3.0])
+    stored = cache.put('a', {'value': values})
+    values.iloc[0] = 9.0
+    assert stored['value'][0] == 1.0
+    with pytest.raises(ValueError):
+        stored['value'][0] = 5.0
+
+
+def test_object_columns_are_charged_per_value():
+    cache = IndicatorCache()
+    cache.put('vp', {'profile': np.array([None, {'vol': [1.0]}, {'vol': [2.0]}], dtype=object)})
+    assert cache.bytes == 3 * np.dtype(object).itemsize + 2 * OBJECT_OVERHEAD_BYTES
+
+
+def test_clear():
+    cache = IndicatorCache()
+    cache.put('a', outputs())
+    cache.clear()
+    assert cache.get('a') is None and cache.bytes == 0
+
+
+def bars(n: int = 200) -> pd.DataFrame:
+    close = 100 + np.sin(np.arange(n) / 5)
+    return pd.DataFrame({'Date': pd.bdate_range('2024-01-01', periods=n, tz='UTC'), 'Open': close, 'High': close + 1,
+                         'Low': close - 1, 'Close': close, 'Volume': 1000.0})
+
+
+def test_fingerprint_changes_with_any_bar():
+    df = bars()
+    revised = df.copy()
+    revised.loc[57, 'Volume'] += 1
+    assert bar_fingerprint(df, 'Date') == bar_fingerprint(df.copy(), 'Date')
+    assert bar_fingerprint(df, 'Date') != bar_fingerprint(revised, 'Date')
+    assert bar_fingerprint(df, 'Date') != bar_fingerprint(df.iloc[1:], 'Date')
+
+
+def test_indicator_plan_reuses_cached_outputs():
+    df = bars()
+    specs = [{'id': 'ema', 'type': 'EMA', 'params': {'length': 10}}, {'id': 'rsi', 'type': 'RSI'}]
+    cache = IndicatorCache()
+    prefix = ('X', '1d', bar_fingerprint(df, 'Date'))
+    first, _ = compute_indicators(df, 'Date', '1d', specs, cache=cache, cache_prefix=prefix)
+    second, _ = compute_indicators(df, 'Date', '1d', specs, cache=cache, cache_prefix=prefix)
+    assert (cache.stats()['misses'], cache.stats()['hits']) == (2, 2)
+    pd.testing.assert_frame_equal(first, second)
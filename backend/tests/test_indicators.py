@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_cache import IndicatorCache
+from indicators import IndicatorContext, IndicatorPlan, compute_indicators
+
+
+def bars(interval: str, n: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    if interval == '5m':
+        days = pd.bdate_range('2024-03-01', periods=n // 75 + 1, tz='Asia/Kolkata')
+        index = pd.DatetimeIndex([day + pd.Timedelta(hours=9, minutes=15 + 5 * i) for day in days for i in range(75)])[:n]
+        date_col = 'Datetime'
+    else:
+        index = pd.bdate_range('2021-01-01', periods=n, tz='Asia/Kolkata')
+        date_col = 'Date'
+    close = 200 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, n))
+    spread = np.abs(rng.normal(0, 1.0, n))
+    df = pd.DataFrame({
+        'Open': open_, 'High': np.maximum(open_, close) + spread, 'Low': np.minimum(open_, close) - spread,
+        'Close': close, 'Volume': rng.integers(100, 5_000, n).astype('float64'),
+    }, index=index)
+    df.index.name = date_col
+    return df.reset_index(), date_col
+
+
+def baseline(df: pd.DataFrame, date_col: str, interval: str, ind: dict) -> dict:
+    """The per-request formulas the indicator registry replaced."""
+    ind_id, params = ind['id'], ind.get('params', {})
+    close = df['Close']
+    kind = ind['type']
+    if kind == 'EMA':
+        return {ind_id: close.ewm(span=int(params.get('length', 20)), adjust=False).mean()}
+    if kind == 'RSI':
+        length = int(params.get('length', 14))
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(window=length).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=length).mean()
+        return {ind_id: 100 - (100 / (1 + gain / loss))}
+    if kind == 'VWAP':
+        typical_volume = (df['High'] + df['Low'] + df['Close']) / 3 * df['Volume']
+        if interval in ['1m', '5m', '1h']:
+            day = df[date_col].dt.date
+            return {ind_id: typical_volume.groupby(day).cumsum() / df['Volume'].groupby(day).cumsum()}
+        return {ind_id: typical_volume.cumsum() / df['Volume'].cumsum()}
+    if kind == 'MACD':
+        fast, slow, signal = int(params.get('fast', 12)), int(params.get('slow', 26)), int(params.get('signal', 9))
+        macd_line = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+        signal_line = macd_line.ewm(span=signal, adjust=False).mean()
+        return {f"{ind_id}_macd": macd_line, f"{ind_id}_signal": signal_line, f"{ind_id}_hist": macd_line - signal_line}
+    if kind == 'BB':
+        length, mult = int(params.get('length', 20)), float(params.get('multiplier', 2.0))
+        sma, std = close.rolling(window=length).mean(), close.rolling(window=length).std()
+        return {f"{ind_id}_upper": sma + std * mult, f"{ind_id}_middle": sma, f"{ind_id}_lower": sma - std * mult}
+    if kind == 'ATR':
+        prev_close = close.shift()
+        ranges = pd.concat([df['High'] - df['Low'], (df['High'] - prev_close).abs(), (df['Low'] - prev_close).abs()], axis=1)
+        return {ind_id: np.max(ranges, axis=1).rolling(window=int(params.get('length', 14))).mean()}
+    if kind == 'FVG':
+        bull = (df['Low'] > df['High'].shift(2)) & (df['Close'].shift(1) > df['Open'].shift(1))
+        bear = (df['High'] < df['Low'].shift(2)) & (df['Close'].shift(1) < df['Open'].shift(1))
+        return {
+            f"{ind_id}_bull": bull, f"{ind_id}_bear": bear,
+            f"{ind_id}_top": np.where(bear, df['Low'].shift(2), np.where(bull, df['Low'], np.nan)),
+            f"{ind_id}_bottom": np.where(bear, df['High'], np.where(bull, df['High'].shift(2), np.nan)),
+        }
+    if kind == 'DAILY_LEVELS':
+        day = df[date_col].dt.date
+        prev_high = day.map(df['High'].groupby(day).max().shift(1))
+        prev_low = day.map(df['Low'].groupby(day).min().shift(1))
+        return {f"{ind_id}_prev_high": prev_high, f"{ind_id}_prev_low": prev_low}
+    if kind == 'VP':
+        return baseline_vp(df, date_col, ind_id, float(params.get('value_area', 70)) / 100.0)
+    raise ValueError(kind)
+
+
+def baseline_vp(df: pd.DataFrame, date_col: str, ind_id: str, value_area: float, num_bins: int = 50) -> dict:
+    levels = old_volume_profiles(df, date_col, value_area, num_bins)
+    day = df[date_col].dt.date
+    return {f"{ind_id}_{name}": day.map(lambda d, i=i: levels[d][i]) for i, name in enumerate(('poc', 'vah', 'val'))}
+
+
+def old_volume_profiles(df: pd.DataFrame, date_col: str, value_area: float, num_bins: int = 50) -> dict:
+    """The per-session, per-bar loop VP replaced: {date: (poc, vah, val, profile bins)}."""
+    levels = {}
+    for date, group in df.groupby(df[date_col].dt.date):
+        high, low = group['High'].max(), group['Low'].min()
+        if pd.isna(high) or pd.isna(low) or high == low:
+            levels[date] = (high, high, low, [])
+            continue
+        bins = np.linspace(low, high, num_bins + 1)
+        profile = np.zeros(num_bins)
+        for h, l, v in zip(group['High'], group['Low'], group['Volume']):
+            if pd.isna(v) or v == 0:
+                continue
+            if h == l:
+                profile[max(0, min(num_bins - 1, np.searchsorted(bins, h) - 1))] += v
+                continue
+            for i in np.flatnonzero((bins[:-1] < h) & (bins[1:] > l)):
+                profile[i] += v / (h - l) * (min(bins[i + 1], h) - max(bins[i], l))
+        poc = int(np.argmax(profile))
+        target, va_vol, lower, upper = profile.sum() * value_area, profile[poc], poc, poc
+        while va_vol < target and (lower > 0 or upper < num_bins - 1):
+            down = profile[lower - 1] if lower > 0 else 0
+            up = profile[upper + 1] if upper < num_bins - 1 else 0
+            if down > up or (down == up and lower > 0):
+                lower -= 1
+                va_vol += profile[lower]
+            else:
+                upper += 1
+                va_vol += profile[upper]
+        bins_out = [
+            {'price': (bins[i] + bins[i + 1]) / 2, 'vol': profile[i], 'low_bound': bins[i], 'high_bound': bins[i + 1],
+             'in_va': lower <= i <= upper}
+            for i in range(num_bins) if profile[i] > 0
+        ]
+        levels[date] = ((bins[poc] + bins[poc + 1]) / 2, bins[upper + 1], bins[lower], bins_out)
+    return levels
+
+
+def expand_profile(payload: dict) -> list:
+    """expandVolumeProfile() of the frontend."""
+    if payload['low'] is None or not payload['vol']:
+        return []
+    count = payload.get('bins', len(payload['vol']))
+    step = (payload['high'] - payload['low']) / count
+    out = []
+    for i in range(count):
+        vol = payload['vol'][0] if 'bins' in payload else payload['vol'][i]
+        if vol > 0:
+            low = payload['low'] + i * step
+            out.append({'price': low + step / 2, 'vol': vol, 'low_bound': low, 'high_bound': low + step,
+                        'in_va': payload['va'][0] <= i <= payload['va'][1]})
+    return out
+
+
+SPECS = [
+    {'id': 'ema12', 'type': 'EMA', 'params': {'length': 12}},
+    {'id': 'ema', 'type': 'EMA'},
+    {'id': 'rsi', 'type': 'RSI', 'params': {'length': 10}},
+    {'id': 'vwap', 'type': 'VWAP'},
+    {'id': 'macd', 'type': 'MACD'},
+    {'id': 'bb', 'type': 'BB', 'params': {'length': 15, 'multiplier': 2.5}},
+    {'id': 'atr', 'type': 'ATR'},
+    {'id': 'fvg', 'type': 'FVG'},
+    {'id': 'levels', 'type': 'DAILY_LEVELS'},
+    {'id': 'vp', 'type': 'VP'},
+]
+
+
+@pytest.mark.parametrize('interval,n', [('5m', 450), ('1d', 400)])
+def test_registry_matches_baseline_formulas(interval, n):
+    df, date_col = bars(interval, n)
+    out, keys = compute_indicators(df, date_col, interval, SPECS)
+    expected = {}
+    for spec in SPECS:
+        expected.update(baseline(df, date_col, interval, spec))
+    assert set(expected) <= set(keys)
+    for name, values in expected.items():
+        np.testing.assert_allclose(out[name].to_numpy(dtype='float64'), np.asarray(values, dtype='float64'),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+@pytest.mark.parametrize('interval,n', [('5m', 450), ('1d', 120)])
+def test_volume_profile_matches_the_per_bar_loop(interval, n):
+    df, date_col = bars(interval, n)
+    # Zero-range candles, missing and zero volume, and (intraday) a session that never moved
+    df.loc[5, ['High', 'Low']] = df.loc[5, 'Close']
+    df.loc[[7, 8], 'Volume'] = [np.nan, 0.0]
+    if interval == '5m':
+        df.loc[150:224, ['Open', 'High', 'Low', 'Close']] = 101.0
+    out, _ = compute_indicators(df, date_col, interval, [{'id': 'vp', 'type': 'VP', 'params': {'value_area': 68}}])
+    expected = old_volume_profiles(df, date_col, 0.68)
+    day = df[date_col].dt.date
+    first_rows = np.flatnonzero(~day.duplicated().to_numpy())
+    assert np.flatnonzero(out['vp_profile'].notna().to_numpy()).tolist() == first_rows.tolist()
+    for row in first_rows:
+        poc, vah, val, profile = expected[day[row]]
+        np.testing.assert_allclose([out.loc[row, 'vp_poc'], out.loc[row, 'vp_vah'], out.loc[row, 'vp_val']], [poc, vah, val],
+                                   rtol=1e-12, equal_nan=True)
+        got = expand_profile(out.loc[row, 'vp_profile'])
+        assert [b['in_va'] for b in got] == [b['in_va'] for b in profile]
+        for key in ('price', 'vol', 'low_bound', 'high_bound'):
+            np.testing.assert_allclose([b[key] for b in got], [b[key] for b in profile], rtol=1e-9, err_msg=key)
+
+
+def test_one_candle_sessions_send_their_profile_once():
+    df, date_col = bars('1d', 30)
+    out, _ = compute_indicators(df, date_col, '1d', [{'id': 'vp', 'type': 'VP'}])
+    payload = out.loc[3, 'vp_profile']
+    assert payload['bins'] == 50 and payload['vol'] == [pytest.approx(df.loc[3, 'Volume'] / 50)]
+
+
+def test_identical_specs_share_one_computation():
+    plan = IndicatorPlan([
+        {'id': 'a', 'type': 'EMA', 'params': {'length': '20'}},
+        {'id': 'b', 'type': 'EMA'},
+        {'id': 'c', 'type': 'EMA', 'params': {'length': 50}},
+        {'id': 'd', 'type': 'NOPE'},
+    ])
+    assert len(plan.computations) == 2
+    assert [ind_id for ind_id, _ in plan.bindings] == ['a', 'b', 'c']
+
+
+def test_shared_intermediates_are_evaluated_once(monkeypatch):
+    df, date_col = bars('5m', 200)
+    ema_calls = []
+    original = pd.Series.ewm
+    monkeypatch.setattr(pd.Series, 'ewm', lambda self, *a, **k: ema_calls.append(k.get('span')) or original(self, *a, **k))
+    compute_indicators(df, date_col, '5m', [
+        {'id': 'fast', 'type': 'EMA', 'params': {'length': 12}},
+        {'id': 'm1', 'type': 'MACD'},
+        {'id': 'm2', 'type': 'MACD', 'params': {'signal': 5}},
+    ])
+    assert sorted(ema_calls) == [5, 9, 12, 26]
+
+
+def test_context_node_memoizes_by_key():
+    df, date_col = bars('1d', 50)
+    ctx = IndicatorContext(df, date_col, '1d')
+    assert ctx.rolling_mean('Close', 5) is ctx.rolling_mean('Close', 5)
+    assert ctx.true_range() is ctx.true_range()
+
+
+def test_cache_skips_computed_indicators():
+    df, date_col = bars('1d', 100)
+    cache = IndicatorCache()
+    first, _ = compute_indicators(df, date_col, '1d', SPECS[:3], cache=cache, cache_prefix=('X', '1d', 'fp'))
+    second, _ = compute_indicators(df, date_col, '1d', SPECS[:4], cache=cache, cache_prefix=('X', '1d', 'fp'))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (3, 4)
+    pd.testing.assert_series_equal(first['rsi'], second['rsi'])
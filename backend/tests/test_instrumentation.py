@@ -0,0 +1,151 @@
+import contextvars
+import threading
+import time
+
+from instrumentation import (METRIC_PREFIX, Metrics, StackSampler, add_request_timing, collect_timings, metrics, profiled,
+                             server_timing_header, timer)
+
+
+def summary(data: Metrics, name: str) -> dict:
+    return next(s for s in data.snapshot()['summaries'] if s['name'] == name)
+
+
+def test_counters_and_summaries_are_kept_per_label_set():
+    m = Metrics()
+    m.inc('bars', 10, mode='candle')
+    m.inc('bars', 5, mode='candle')
+    m.inc('bars', mode='vectorized')
+    for value in (0.5, 0.25, 2.0):
+        m.observe('loop_seconds', value, mode='candle')
+    snapshot = m.snapshot()
+    assert snapshot['counters'] == [
+        {'name': 'bars', 'labels': {'mode': 'candle'}, 'value': 15},
+        {'name': 'bars', 'labels': {'mode': 'vectorized'}, 'value': 1},
+    ]
+    assert snapshot['summaries'] == [
+        {'name': 'loop_seconds', 'labels': {'mode': 'candle'}, 'count': 3, 'sum': 2.75, 'max': 2.0, 'mean': 2.75 / 3},
+    ]
+
+
+def test_label_order_does_not_matter():
+    m = Metrics()
+    m.inc('hits', a=1, b=2)
+    m.inc('hits', b=2, a=1)
+    assert [c['value'] for c in m.snapshot()['counters']] == [2]
+
+
+def test_worker_metrics_drain_and_merge_into_the_parent():
+    parent, worker = Metrics(), Metrics()
+    parent.inc('jobs')
+    parent.observe('job_seconds', 1.0)
+    worker.inc('jobs', 2)
+    worker.observe('job_seconds', 3.0)
+    worker.observe('job_seconds', 0.5)
+    worker.observe('other_seconds', 0.1)
+
+    parent.merge(worker.drain())
+    assert worker.snapshot() == {'counters': [], 'summaries': []}
+    assert parent.snapshot()['counters'][0]['value'] == 3
+    assert (summary(parent, 'job_seconds')['count'], summary(parent, 'job_seconds')['sum'], summary(parent, 'job_seconds')['max']) == (3, 4.5, 3.0)
+    assert summary(parent, 'other_seconds')['count'] == 1
+
+
+def test_prometheus_text_format():
+    m = Metrics()
+    m.inc('bars', 3, mode='candle')
+    m.inc('bars', 4, mode='vectorized')
+    m.observe('fetch_seconds', 0.5, interval='1d')
+    m.observe('fetch_seconds', 1.5, interval='1d')
+    assert m.prometheus().splitlines() == [
+        f'# TYPE {METRIC_PREFIX}bars_total counter',
+        f'{METRIC_PREFIX}bars_total{{mode="candle"}} 3',
+        f'{METRIC_PREFIX}bars_total{{mode="vectorized"}} 4',
+        f'# TYPE {METRIC_PREFIX}fetch_seconds summary',
+        f'{METRIC_PREFIX}fetch_seconds_count{{interval="1d"}} 2',
+        f'{METRIC_PREFIX}fetch_seconds_sum{{interval="1d"}} 2',
+        f'# TYPE {METRIC_PREFIX}fetch_seconds_max gauge',
+        f'{METRIC_PREFIX}fetch_seconds_max{{interval="1d"}} 1.5',
+    ]
+    assert Metrics().prometheus() == '\n'
+
+
+def test_timer_records_a_summary_and_a_request_stage():
+    before = next((s['count'] for s in metrics.snapshot()['summaries'] if s['name'] == 'test_stage_seconds'), 0)
+    with collect_timings() as timings:
+        with timer('test_stage', kind='ema'):
+            time.sleep(0.01)
+    assert summary(metrics, 'test_stage_seconds')['count'] == before + 1
+    assert [stage for stage, _ in timings] == ['test_stage_ema']
+    assert timings[0][1] >= 0.01
+
+
+def test_timings_are_collected_only_inside_the_block():
+    add_request_timing('outside', 1.0)
+    with collect_timings() as outer:
+        add_request_timing('a', 1.0)
+        with collect_timings() as inner:
+            add_request_timing('b', 1.0)
+        add_request_timing('c', 1.0)
+    assert [stage for stage, _ in outer] == ['a', 'c']
+    assert [stage for stage, _ in inner] == ['b']
+
+
+def test_timings_follow_the_context_into_other_threads():
+    with collect_timings() as timings:
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(add_request_timing, 'fetch', 0.5))
+        worker.start()
+        worker.join()
+        # A thread started without the context records nothing
+        bare = threading.Thread(target=add_request_timing, args=('lost', 0.5))
+        bare.start()
+        bare.join()
+    assert timings == [('fetch', 0.5)]
+
+
+def test_server_timing_header_sums_repeated_stages():
+    header = server_timing_header([('fetch', 0.012), ('ema', 0.001), ('ema', 0.0025)], 0.02)
+    assert header == 'fetch;dur=12.00, ema;dur=3.50;desc="x2", total;dur=20.00'
+    assert server_timing_header([], 0.001) == 'total;dur=1.00'
+
+
+def busy_wait_for_sampler(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler_sees_other_threads_and_writes_folded_stacks(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait_for_sampler, args=(stop,))
+    worker.start()
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    time.sleep(0.1)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    stacks = [stack for stack in sampler.samples if 'busy_wait_for_sampler' in stack]
+    assert stacks
+    # Root first, leaf last, as flamegraph tools expect
+    assert stacks[0].startswith('threading.py:_bootstrap')
+    # The sampler skips its own thread
+    assert not any('instrumentation.py:_run' in stack for stack in sampler.samples)
+
+    path = sampler.write(str(tmp_path))
+    lines = open(path).read().splitlines()
+    assert len(lines) == len(sampler.samples)
+    counts = [int(line.rsplit(' ', 1)[1]) for line in lines]
+    assert counts == sorted(counts, reverse=True) and sum(counts) == sum(sampler.samples.values())
+
+
+def test_only_one_block_is_profiled_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    with profiled() as outer:
+        with profiled() as inner:
+            pass
+        assert inner == [None]
+    assert outer[0] is not None and outer[0].startswith(str(tmp_path))
+    with profiled() as again:
+        pass
+    assert again[0] is not None
+
@@ -0,0 +1,126 @@
+import asyncio
+
+from llm_gateway import LLMGateway, StubBackend
+
+CONTEXT = {'strategyCode': 'def on_candle(candle, portfolio):\n    pass\n', 'symbol': 'ABC.NS'}
+
+
+class CountingBackend(StubBackend):
+    """StubBackend that records how many streams run at once."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.peak = 0
+
+    async def stream(self, system, history, prompt):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            async for chunk in super().stream(system, history, prompt):
+                yield chunk
+        finally:
+            self.active -= 1
+
+
+class FailingBackend(StubBackend):
+    async def stream(self, system, history, prompt):
+        self.calls.append(prompt)
+        raise RuntimeError("quota exceeded")
+        yield
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_repeated_question_is_served_from_cache():
+    backend = StubBackend(reply="Buy low, sell high.")
+    gateway = LLMGateway(backend)
+
+    async def ask():
+        first = await gateway.complete("Why no trades?", [], CONTEXT)
+        second = await gateway.complete("Why no trades?", [], CONTEXT)
+        return first, second
+
+    first, second = run(ask())
+    assert first == {"response": "Buy low, sell high.", "cached": False}
+    assert second == {"response": "Buy low, sell high.", "cached": True}
+    assert len(backend.calls) == 1
+    assert gateway.stats()['hits'] == 1 and gateway.stats()['misses'] == 1
+
+
+def test_cache_key_covers_strategy_and_history():
+    backend = StubBackend()
+    gateway = LLMGateway(backend)
+    history = [{"role": "user", "content": "hi"}]
+
+    async def ask():
+        await gateway.complete("Explain", [], CONTEXT)
+        await gateway.complete("Explain", history, CONTEXT)
+        await gateway.complete("Explain", [], dict(CONTEXT, strategyCode="x = 1\n"))
+        return await gateway.complete("Explain", history, CONTEXT)
+
+    assert run(ask())['cached'] is True
+    assert len(backend.calls) == 3
+
+
+def test_expired_answers_are_asked_again():
+    backend = StubBackend()
+    gateway = LLMGateway(backend, cache_ttl=0.0)
+
+    async def ask():
+        await gateway.complete("Explain", [], CONTEXT)
+        return await gateway.complete("Explain", [], CONTEXT)
+
+    assert run(ask())['cached'] is False
+    assert len(backend.calls) == 2
+
+
+def test_cache_is_bounded():
+    gateway = LLMGateway(StubBackend(), cache_size=2)
+
+    async def ask():
+        for question in ("one", "two", "three"):
+            await gateway.complete(question, [], CONTEXT)
+
+    run(ask())
+    assert gateway.stats()['cached_answers'] == 2
+
+
+def test_concurrency_is_limited():
+    backend = CountingBackend(delay=0.01, words_per_chunk=1)
+    gateway = LLMGateway(backend, max_concurrency=2)
+
+    async def ask_all():
+        return await asyncio.gather(*(gateway.complete(f"Question {i} please", [], CONTEXT) for i in range(6)))
+
+    answers = run(ask_all())
+    assert [answer['response'] for answer in answers] == [f"Stub answer to: Question {i} please" for i in range(6)]
+    assert backend.peak == 2
+    assert gateway.stats()['in_flight'] == 0
+
+
+def test_stream_yields_chunks_then_done():
+    gateway = LLMGateway(StubBackend(reply="a b c d e", words_per_chunk=2))
+
+    async def collect():
+        return [event async for event in gateway.stream("Go", [], CONTEXT)]
+
+    events = run(collect())
+    assert events == [{"delta": "a b"}, {"delta": " c d"}, {"delta": " e"}, {"done": True, "cached": False}]
+
+
+def test_backend_errors_are_reported_and_not_cached():
+    backend = FailingBackend()
+    gateway = LLMGateway(backend)
+
+    async def ask():
+        first = await gateway.complete("Explain", [], CONTEXT)
+        second = await gateway.complete("Explain", [], CONTEXT)
+        return first, second
+
+    first, second = run(ask())
+    assert first == second == {"error": "quota exceeded"}
+    assert len(backend.calls) == 2
+    assert gateway.stats()['errors'] == 2 and gateway.stats()['cached_answers'] == 0
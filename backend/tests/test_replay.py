@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+
+import replay
+from dataset_registry import Dataset
+from replay import MAX_UNACKED_FRAMES, ReplayScheduler, ReplaySession
+
+TIMES = list(range(1_700_000_000, 1_700_000_000 + 60 * 300, 60))
+
+
+def dataset(n: int = 300):
+    close = [100.0 + i for i in range(n)]
+    return Dataset('h', ('X',), {'time': TIMES[:n], 'open': close, 'high': close, 'low': close, 'close': close,
+                                 'volume': [1.0] * n})
+
+
+class FakeStrategy:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def advance(self, start, stop):
+        self.calls.append(('advance', start, stop))
+        return {'error': 'boom'} if self.fail else {'fills': [], 'equity': [0.0] * (stop - start)}
+
+    async def catch_up(self, index):
+        self.calls.append(('catch_up', index))
+        return {'trades': [], 'currentIndex': index}
+
+
+def test_seek_finds_the_first_bar_at_or_after_a_time():
+    session = ReplaySession(dataset())
+    assert session.locate(time=TIMES[10]) == 10
+    assert session.locate(time=TIMES[10] + 1) == 11
+    assert session.locate(time=TIMES[0] - 1000) == 0
+    # Past the last bar the cursor stays where it is
+    assert session.locate(time=TIMES[-1] + 1) == session.index
+    assert session.locate(index=10_000) == 299 and session.locate(index=-5) == 0
+
+
+def test_legacy_seek_sends_the_full_prefix():
+    session = ReplaySession(dataset())
+    [frame] = session.seek(time=TIMES[150])
+    assert frame['type'] == 'sync' and frame['currentIndex'] == 150
+    assert len(frame['data']) == 151 and frame['data'][-1]['time'] == TIMES[150]
+
+
+def test_forward_seek_sends_only_the_missing_bars_in_chunks(monkeypatch):
+    monkeypatch.setattr(replay, 'DELTA_CHUNK_BARS', 40)
+    session = ReplaySession(dataset(), delta=True)
+    frames = session.seek(index=199)
+    assert [(f['type'], f['start'], len(f['columns']['time']), f['final']) for f in frames] == [
+        ('delta', 100, 40, False), ('delta', 140, 40, False), ('delta', 180, 20, True)]
+    assert frames[0]['columns']['close'][0] == 200.0
+    assert all(f['currentIndex'] == 199 for f in frames)
+    assert session.client_len == 200
+
+
+def test_backward_seek_truncates_and_a_later_forward_seek_resends():
+    session = ReplaySession(dataset(), delta=True)
+    session.seek(index=199)
+    assert session.seek(index=49) == [{'type': 'truncate', 'length': 50, 'currentIndex': 49}]
+    [frame] = session.seek(index=59)
+    assert (frame['start'], len(frame['columns']['time'])) == (50, 10)
+
+
+def test_seek_within_the_initial_bars_truncates():
+    session = ReplaySession(dataset(), delta=True)
+    assert session.seek(index=20)[0]['type'] == 'truncate'
+
+
+def test_candles_advance_the_cursor_until_the_data_ends():
+    session = ReplaySession(dataset(), delta=True)
+    session.seek(index=290)
+    frame = session.next_candles(4)
+    assert (frame['start'], frame['currentIndex'], frame['columns']['close']) == (290, 293, [390.0, 391.0, 392.0, 393.0])
+    # Only 6 bars are left
+    frame = session.next_candles(10)
+    assert (frame['start'], frame['currentIndex'], session.index) == (294, 299, 300)
+    assert session.next_candles(10) is None and session.next_candle() is None
+    assert session.client_len == 300
+
+
+def test_strategy_runs_over_the_bars_of_each_frame():
+    session = ReplaySession(dataset(), delta=True)
+    strategy = FakeStrategy()
+
+    async def run():
+        sync = await session.attach_strategy(strategy)
+        frame = await session.with_strategy(session.next_candles(3))
+        single = await session.with_strategy(session.next_candle())
+        return sync, frame, single
+
+    sync, frame, single = asyncio.run(run())
+    assert sync == [{'type': 'strategy', 'trades': [], 'currentIndex': 100}]
+    assert frame['strategy']['equity'] == [0.0] * 3 and 'strategy' in single
+    assert strategy.calls == [('catch_up', 100), ('advance', 100, 103), ('advance', 103, 104)]
+
+
+def test_failing_strategy_is_detached():
+    session = ReplaySession(dataset(), delta=True)
+    session.strategy = FakeStrategy(fail=True)
+    frame = asyncio.run(session.with_strategy(session.next_candles(2)))
+    assert frame['strategy'] == {'error': 'boom'} and session.strategy is None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scheduler_paces_bars_from_the_play_anchor():
+    clock = Clock()
+    scheduler = ReplayScheduler(frame_rate=60, clock=clock)
+    assert scheduler.due() == 0 and scheduler.wait_time() is None
+    scheduler.play(2)
+    assert scheduler.due() == 1
+    scheduler.sent(1)
+    clock.now = 0.3
+    assert scheduler.due() == 0 and scheduler.wait_time() == pytest.approx(0.2)
+    # Polling (as every incoming command does) does not move the schedule
+    clock.now = 0.5
+    assert scheduler.due() == 1 and scheduler.due() == 1
+    scheduler.sent(1)
+    clock.now = 1.7
+    assert scheduler.due() == 2
+    scheduler.sent(2)
+    assert scheduler.wait_time() == pytest.approx(0.3)
+
+
+def test_fast_replay_batches_bars_into_frames():
+    clock = Clock()
+    scheduler = ReplayScheduler(frame_rate=64, clock=clock)
+    scheduler.play(1024)
+    scheduler.sent(scheduler.due())
+    # Too soon for another frame, even though bars are owed
+    clock.now = 0.01
+    assert scheduler.due() == 0 and scheduler.wait_time() == pytest.approx(1 / 64 - 0.01)
+    clock.now = 1 / 64
+    assert scheduler.due() == 16
+
+
+def test_stall_catches_up_at_most_two_frames():
+    clock = Clock()
+    scheduler = ReplayScheduler(frame_rate=64, clock=clock)
+    scheduler.play(1024)
+    scheduler.sent(scheduler.due())
+    clock.now = 5.0
+    assert scheduler.due() == 32
+    scheduler.sent(32)
+    # The bars beyond the cap were dropped from the schedule, not queued
+    clock.now = 5.0 + 1 / 64
+    assert scheduler.due() == 16
+
+
+def test_unacked_frames_hold_playback_back():
+    clock = Clock()
+    scheduler = ReplayScheduler(frame_rate=8, acks=True, clock=clock)
+    scheduler.play(8)
+    for frame in range(MAX_UNACKED_FRAMES):
+        clock.now = frame / 8
+        assert scheduler.due() == 1
+        scheduler.sent(1)
+    clock.now = 2.0
+    assert scheduler.blocked() and scheduler.due() == 0 and scheduler.wait_time() is None
+    scheduler.ack()
+    assert not scheduler.blocked()
+    assert scheduler.due() == 2
+    scheduler.sent(2)
+    assert scheduler.blocked()
+
+
+def test_pause_and_replay_restart_the_anchor():
+    clock = Clock()
+    scheduler = ReplayScheduler(clock=clock)
+    scheduler.play(1)
+    scheduler.sent(scheduler.due())
+    scheduler.pause()
+    clock.now = 10.0
+    assert scheduler.due() == 0
+    scheduler.play(1)
+    assert scheduler.due() == 1
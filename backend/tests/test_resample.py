@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from resample import SESSION_PROFILES, resample_bars
+
+AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def ohlcv(index: pd.DatetimeIndex, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, len(index)))
+    spread = np.abs(rng.normal(0, 0.5, len(index)))
+    return pd.DataFrame({
+        'Open': close - rng.normal(0, 0.3, len(index)), 'High': close + spread, 'Low': close - spread,
+        'Close': close, 'Volume': rng.integers(100, 1_000, len(index)).astype('float64'),
+    }, index=index.tz_convert('UTC'))
+
+
+def nse_minutes(days: int, step: int = 5) -> pd.DatetimeIndex:
+    # 09:15-15:30 IST sessions on weekdays
+    dates = pd.bdate_range('2024-03-04', periods=days, tz='Asia/Kolkata')
+    return pd.DatetimeIndex([day + pd.Timedelta(minutes=9 * 60 + 15 + i) for day in dates for i in range(0, 375, step)])
+
+
+def reference(df: pd.DataFrame, rule: str, profile: str) -> pd.DataFrame:
+    """pandas resample, anchored to each local session's open."""
+    tz, session_open = SESSION_PROFILES[profile]
+    local = df.tz_convert(tz)
+    parts = []
+    for _, day in local.groupby(local.index.date):
+        origin = day.index[0].normalize() + pd.Timedelta(minutes=session_open)
+        parts.append(day.resample(rule, origin=origin).agg(AGG))
+    return pd.concat(parts).dropna(subset=['Open'])
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(actual, expected, check_names=False, check_freq=False, check_index_type=False)
+
+
+@pytest.mark.parametrize('timeframe,rule', [('15m', '15min'), ('1h', '60min'), ('75m', '75min'), ('2h', '120min')])
+def test_nse_intraday_matches_pandas_anchored_at_the_open(timeframe, rule):
+    df = ohlcv(nse_minutes(4))
+    bars = resample_bars(df, timeframe, 'NSE')
+    assert_same(bars, reference(df, rule, 'NSE'))
+    assert str(bars.index.tz) == 'Asia/Kolkata'
+    assert bars.index[0].strftime('%H:%M') == '09:15'
+
+
+def test_nse_hours_end_with_a_partial_bucket_per_session():
+    df = ohlcv(nse_minutes(3))
+    bars = resample_bars(df, '1h', 'NSE')
+    # 09:15 ... 14:15 are full hours, 15:15-15:30 is the partial last one
+    assert list(bars.index[:7].strftime('%H:%M')) == ['09:15', '10:15', '11:15', '12:15', '13:15', '14:15', '15:15']
+    assert len(bars) == 3 * 7
+    last = df.tz_convert('Asia/Kolkata').between_time('15:15', '15:30')
+    assert bars['Volume'].iloc[-1] == last['Volume'].iloc[-3:].sum()
+
+
+def test_nse_daily_buckets_are_local_dates():
+    df = ohlcv(nse_minutes(5, step=15))
+    bars = resample_bars(df, '1D', 'NSE')
+    expected = df.tz_convert('Asia/Kolkata').resample('D').agg(AGG).dropna(subset=['Open'])
+    assert_same(bars, expected)
+
+
+@pytest.mark.parametrize('timeframe,rule', [('4h', '4h'), ('1D', 'D'), ('15m', '15min')])
+def test_crypto_matches_pandas_around_the_clock(timeframe, rule):
+    df = ohlcv(pd.date_range('2024-03-01 00:00', periods=6 * 24 * 12, freq='5min', tz='UTC'))
+    bars = resample_bars(df, timeframe, 'CRYPTO')
+    assert_same(bars, df.resample(rule).agg(AGG))
+    # Weekends trade too
+    assert (bars.index.dayofweek >= 5).any()
+
+
+def test_crypto_weeks_start_on_monday():
+    df = ohlcv(pd.date_range('2024-03-01', periods=40, freq='D', tz='UTC'))
+    bars = resample_bars(df, '1W', 'CRYPTO')
+    expected = df.resample('W-MON', label='left', closed='left').agg(AGG)
+    assert_same(bars, expected)
+    assert (bars.index.dayofweek == 0).all()
+
+
+@pytest.mark.parametrize('cut', [1, 7, 11])
+def test_partial_last_bucket_covers_only_the_bars_so_far(cut):
+    df = ohlcv(pd.date_range('2024-03-01 00:00', periods=24 + cut, freq='5min', tz='UTC'))
+    bars = resample_bars(df, '1h', 'CRYPTO')
+    tail = df.iloc[24:]
+    assert len(bars) == 3
+    assert bars['Open'].iloc[-1] == tail['Open'].iloc[0]
+    assert bars['Close'].iloc[-1] == tail['Close'].iloc[-1]
+    assert bars['High'].iloc[-1] == tail['High'].max() and bars['Low'].iloc[-1] == tail['Low'].min()
+    assert bars['Volume'].iloc[-1] == tail['Volume'].sum()
+    assert_same(bars, df.resample('h').agg(AGG))
+
+
+def test_gaps_and_missing_bars_are_skipped():
+    df = ohlcv(nse_minutes(2))
+    df.iloc[10:30] = np.nan
+    df = df.drop(df.index[100:130])
+    assert_same(resample_bars(df, '30m', 'NSE'), reference(df.dropna(), '30min', 'NSE'))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from engine import BacktestEngine
+from robustness import monte_carlo, run_walk_forward, trade_monte_carlo, walk_forward_splits
+
+STRATEGY = """
+def signals(data):
+    orders = np.zeros(len(data['close']))
+    orders[::params.get('every', 10)] = 1
+    orders[5::params.get('every', 10)] = -1
+    return orders
+"""
+
+
+def columns(n: int = 400, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return {
+        'time': np.arange(n, dtype='int64') * 86400 + 1_600_000_000, 'open': close, 'high': close * 1.01,
+        'low': close * 0.99, 'close': close, 'volume': np.full(n, 1000.0),
+    }
+
+
+@pytest.fixture(scope='module')
+def result():
+    result = BacktestEngine(10000.0).run_strategy(STRATEGY, columns(), 'X', as_arrays=True)
+    assert 'error' not in result
+    return result
+
+
+def test_monte_carlo_is_reproducible_with_a_seed(result):
+    first = monte_carlo(result, n_paths=500, block=5, seed=42)
+    assert first == monte_carlo(result, n_paths=500, block=5, seed=42)
+    assert first != monte_carlo(result, n_paths=500, block=5, seed=43)
+    assert first['shuffle']['paths'] == first['bootstrap']['paths'] == first['returns']['paths'] == 500
+
+
+def test_shuffle_keeps_the_total_and_bootstrap_varies_it():
+    pnl = np.array([100.0, -50.0, 30.0, -80.0, 60.0, 20.0])
+    shuffled = trade_monte_carlo(pnl, 1000.0, n_paths=2000, method='shuffle', rng=np.random.default_rng(1))
+    booted = trade_monte_carlo(pnl, 1000.0, n_paths=2000, method='bootstrap', rng=np.random.default_rng(1))
+    assert 'pnl' not in shuffled
+    # Every order of the same trades draws down at least as deep as the worst single loss
+    assert shuffled['max_drawdown_abs']['percentiles']['95'] <= -80.0
+    assert booted['pnl']['ci'][0] < pnl.sum() < booted['pnl']['ci'][1]
+    assert trade_monte_carlo(pnl[:1], 1000.0)['error']
+
+
+@pytest.mark.parametrize('anchored', [False, True])
+def test_walk_forward_folds_do_not_overlap(anchored):
+    splits = walk_forward_splits(1000, n_splits=4, train_ratio=0.7, anchored=anchored)
+    assert len(splits) == 4
+    for k, split in enumerate(splits):
+        train, test = split['train'], split['test']
+        assert 0 <= train[0] < train[1] == test[0] < test[1] <= 1000
+        if k:
+            assert test[0] == splits[k - 1]['test'][1]
+        assert train[0] == 0 if anchored else train[1] - train[0] == splits[0]['train'][1]
+    assert walk_forward_splits(5, n_splits=10) == []
+
+
+def test_walk_forward_trains_and_tests_on_their_own_windows():
+    out = run_walk_forward(STRATEGY, columns(), {'every': [8, 10, 12]}, symbol='X', n_splits=3, max_workers=2)
+    assert [fold['fold'] for fold in out['folds']] == [0, 1, 2]
+    for fold in out['folds']:
+        assert fold['train'][1] == fold['test'][0]
+        assert fold['train_result']['window'] == fold['train']
+        assert fold['test_result']['window'] == fold['test']
+        assert fold['test_result']['params'] == fold['params'] == fold['train_result']['params']
+        assert len(fold['candidates']) == 3
+        assert fold['train_result']['sharpe'] == max(c['sharpe'] for c in fold['candidates'])
+    assert out['summary']['folds'] == 3 and out['summary']['failed'] == 0
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from dataset_registry import Dataset
+from engine import BacktestEngine, StrategyRunner
+from serialization import columns_to_records
+from strategy_pool import StrategyPool
+
+CROSSOVER = """
+def on_candle(candle, portfolio):
+    if candle['close'] > 100 and portfolio.positions == 0:
+        portfolio.buy(5)
+    elif candle['close'] < 100 and portfolio.positions > 0:
+        portfolio.sell(portfolio.positions)
+"""
+SLEEPER = """
+import time
+
+def on_candle(candle, portfolio):
+    while True:
+        time.sleep(0.01)
+"""
+SPINNER = """
+def on_candle(candle, portfolio):
+    while True:
+        pass
+"""
+HOG = """
+def on_candle(candle, portfolio):
+    portfolio.hoard = bytearray(2 * 1024 ** 3)
+"""
+
+
+def columns(n: int = 300):
+    close = 100 + np.cumsum(np.random.default_rng(5).normal(0, 1, n))
+    return {
+        'time': list(range(1_700_000_000, 1_700_000_000 + 300 * n, 300)), 'open': close.tolist(),
+        'high': (close + 1).tolist(), 'low': (close - 1).tolist(), 'close': close.tolist(), 'volume': [1000.0] * n,
+    }
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return Dataset('h1', ('X',), columns())
+
+
+@pytest.fixture
+def pool():
+    pool = StrategyPool(workers=1, timeout=2.0, cpu_seconds=1, memory_mb=512)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def worker_pid(pool):
+    return pool._idle[0].process.pid
+
+
+def test_backtest_matches_the_engine_and_reuses_compiled_code(pool, dataset):
+    first = pool.submit(dataset, CROSSOVER, 'X').result(10)
+    hits = pool.stats()['code_cache_hits']
+    again = pool.submit(dataset, CROSSOVER, 'X').result(10)
+    expected = BacktestEngine(10000.0).run_strategy(CROSSOVER, columns_to_records(dataset.columns), 'X')
+    assert first['pnl'] == pytest.approx(expected['pnl'])
+    assert first['trades'] == expected['trades'] and 'sharpe' in first['metrics']
+    assert again['pnl'] == first['pnl']
+    stats = pool.stats()
+    assert (stats['completed'], stats['failed'], stats['code_cache_hits']) == (2, 0, hits + 1)
+
+
+def test_infinite_loop_is_killed_at_the_timeout_and_the_worker_replaced(pool, dataset):
+    pool.submit(dataset, CROSSOVER, 'X').result(10)
+    pid = worker_pid(pool)
+    started = time.monotonic()
+    result = pool.submit(dataset, SLEEPER, 'X').result(10)
+    assert result == {"error": "Strategy execution failed: timed out after 2s"}
+    assert 2.0 <= time.monotonic() - started < 5.0
+    assert pool.submit(dataset, CROSSOVER, 'X').result(10)['pnl'] is not None
+    assert worker_pid(pool) != pid
+    stats = pool.stats()
+    assert (stats['timeouts'], stats['completed'], stats['idle']) == (1, 2, 1)
+
+
+def test_cpu_limit_fails_the_job_and_keeps_the_worker(pool, dataset):
+    pool.timeout = 20.0
+    pid = worker_pid(pool)
+    result = pool.submit(dataset, SPINNER, 'X').result(20)
+    assert result == {"error": "Strategy execution failed: CPU time limit exceeded"}
+    assert worker_pid(pool) == pid
+    assert 'error' not in pool.submit(dataset, CROSSOVER, 'X').result(10)
+
+
+def test_memory_limit_fails_the_job(pool, dataset):
+    result = pool.submit(dataset, HOG, 'X').result(10)
+    assert result == {"error": "Strategy execution failed: MemoryError"}
+    assert 'error' not in pool.submit(dataset, CROSSOVER, 'X').result(10)
+
+
+def test_cancel_kills_a_running_job(pool, dataset):
+    future = pool.submit(dataset, SLEEPER, 'X', job_id='slow', timeout=30.0)
+    while not future.running():
+        time.sleep(0.01)
+    assert pool.cancel('slow')
+    assert future.result(5) == {"error": "Backtest cancelled."}
+    assert 'error' not in pool.submit(dataset, CROSSOVER, 'X').result(10)
+    assert pool.stats()['cancelled'] == 1
+
+
+def test_live_strategy_steps_match_a_local_runner(pool, dataset):
+    live = pool.live(dataset, CROSSOVER, 'X')
+    local = StrategyRunner(CROSSOVER, 'X')
+    rows = columns_to_records(dataset.columns)
+
+    async def steps():
+        return [await live.advance(0, 100), await live.advance(100, 180), await live.catch_up(120)]
+
+    first, second, rewound = asyncio.run(steps())
+    assert first == local.advance(rows, 0, 100)
+    assert second == local.advance(rows, 100, 180)
+    assert rewound == local.catch_up(rows, 120)
+    assert len(second['equity']) == 80
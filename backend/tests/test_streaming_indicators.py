@@ -0,0 +1,145 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import INDICATORS, IndicatorPlan, compute_indicators
+import streaming_indicators
+from streaming_indicators import STREAMING_INDICATORS, RollingMean, StreamingIndicator, StreamingStore
+
+SPECS = [
+    {'id': 'ema', 'type': 'EMA', 'params': {'length': 10}},
+    {'id': 'rsi', 'type': 'RSI'},
+    {'id': 'macd', 'type': 'MACD'},
+    {'id': 'bb', 'type': 'BB', 'params': {'length': 12}},
+    {'id': 'atr', 'type': 'ATR'},
+    {'id': 'vwap', 'type': 'VWAP'},
+    {'id': 'fvg', 'type': 'FVG'},
+    {'id': 'levels', 'type': 'DAILY_LEVELS'},
+]
+
+
+def bars(interval: str, n: int, gaps: bool = False, seed: int = 7) -> Tuple[pd.DataFrame, str]:
+    rng = np.random.default_rng(seed)
+    if interval == '5m':
+        days = pd.bdate_range('2024-01-01', periods=n // 75 + 1, tz='Asia/Kolkata')
+        index = pd.DatetimeIndex([day + pd.Timedelta(hours=9, minutes=15 + 5 * i) for day in days for i in range(75)])[:n]
+        date_col = 'Datetime'
+    else:
+        index = pd.bdate_range('2020-01-01', periods=n, tz='Asia/Kolkata')
+        date_col = 'Date'
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.5, n))
+    df = pd.DataFrame({
+        'Open': open_, 'High': np.maximum(open_, close) + spread, 'Low': np.minimum(open_, close) - spread,
+        'Close': close, 'Volume': rng.integers(1_000, 10_000, n).astype('float64'),
+    }, index=index)
+    if gaps:
+        df.iloc[rng.choice(np.arange(30, n), 6, replace=False)] = np.nan
+    df.index.name = date_col
+    return df.reset_index(), date_col
+
+
+def assert_matches(batch: pd.DataFrame, outputs: Dict[str, np.ndarray]):
+    for name, values in outputs.items():
+        expected = batch[name].to_numpy(dtype='float64')
+        np.testing.assert_allclose(np.asarray(values, dtype='float64'), expected, rtol=1e-7, atol=1e-7, equal_nan=True, err_msg=name)
+
+
+def streamed(store: StreamingStore, df: pd.DataFrame, date_col: str, interval: str) -> Dict[str, np.ndarray]:
+    plan = IndicatorPlan(SPECS)
+    results = store.outputs(('X', interval), plan.computations, df, date_col, interval)
+    out = {}
+    for ind_id, key in plan.bindings:
+        definition = plan.computations[key][0]
+        out.update(zip(definition.output_columns(ind_id), (results[key][suffix] for suffix in definition.outputs)))
+    return out
+
+
+@pytest.mark.parametrize('interval,n', [('5m', 400), ('1d', 300)])
+@pytest.mark.parametrize('gaps', [False, True])
+def test_streaming_matches_batch(interval, n, gaps):
+    df, date_col = bars(interval, n, gaps)
+    batch, keys = compute_indicators(df, date_col, interval, SPECS)
+    out = streamed(StreamingStore(), df, date_col, interval)
+    assert set(out) == set(keys)
+    assert_matches(batch, out)
+
+
+def test_appended_bars_update_incrementally():
+    df, date_col = bars('5m', 400, gaps=True)
+    store = StreamingStore()
+    streamed(store, df.iloc[:250], date_col, '5m')
+    # The last bar served was still forming: by the next refresh it has moved and new bars follow
+    df.loc[249, 'Close'] += 0.5
+    streamed(store, df.iloc[:320], date_col, '5m')
+    out = streamed(store, df, date_col, '5m')
+    assert store.stats()['appends'] == 2 * len(SPECS)
+
+    batch, _ = compute_indicators(df, date_col, '5m', SPECS)
+    assert_matches(batch, out)
+
+
+@pytest.mark.parametrize('interval', ['5m', '1d'])
+def test_state_seeded_from_batch_continues_like_a_streamed_one(interval):
+    df, date_col = bars(interval, 300, gaps=True)
+    batch, _ = compute_indicators(df, date_col, interval, SPECS)
+    gaps = np.flatnonzero(df['Close'].isna())
+    # Cut right after a session starts, inside and right after gaps, ...
+    for cut in sorted({1, 2, 3, 75, 76, 77, 200, *(gaps + 1), *(gaps + 2)}):
+        store = StreamingStore()
+        streamed(store, df.iloc[:cut], date_col, interval)
+        assert_matches(batch, streamed(store, df, date_col, interval))
+
+
+def test_only_appended_bars_are_streamed(monkeypatch):
+    df, date_col = bars('5m', 400)
+    fed = []
+    original = streaming_indicators._bars
+    monkeypatch.setattr(streaming_indicators, '_bars', lambda frame, col: fed.append(len(frame)) or original(frame, col))
+    store = StreamingStore()
+    streamed(store, df.iloc[:390], date_col, '5m')
+    streamed(store, df, date_col, '5m')
+    # The last bar served is fed again, in case it was still forming
+    assert fed == [11]
+
+
+def test_changed_history_starts_over():
+    df, date_col = bars('1d', 200)
+    store = StreamingStore()
+    streamed(store, df.iloc[:150], date_col, '1d')
+    revised = df.copy()
+    revised.loc[10, 'Close'] *= 1.1
+    out = streamed(store, revised, date_col, '1d')
+    assert store.stats()['appends'] == 0
+
+    batch, _ = compute_indicators(revised, date_col, '1d', SPECS)
+    assert_matches(batch, out)
+
+
+def test_plan_uses_store_and_skips_types_without_streaming_form():
+    df, date_col = bars('5m', 200)
+    specs = SPECS + [{'id': 'vp', 'type': 'VP'}]
+    store = StreamingStore()
+    out, keys = compute_indicators(df, date_col, '5m', specs, streams=store, series_key=('X', '5m'))
+    batch, _ = compute_indicators(df, date_col, '5m', specs)
+    assert store.stats()['rebuilds'] == len(SPECS)
+    for name in keys:
+        if name != 'vp_profile':
+            np.testing.assert_allclose(out[name].to_numpy(dtype='float64'), batch[name].to_numpy(dtype='float64'),
+                                       rtol=1e-7, atol=1e-7, equal_nan=True, err_msg=name)
+
+
+def test_rolling_mean_recovers_after_nan():
+    mean = RollingMean(3)
+    values = [mean.update(x) for x in [1.0, 2.0, float('nan'), 4.0, 5.0, 6.0, 7.0]]
+    expected = pd.Series([1.0, 2.0, np.nan, 4.0, 5.0, 6.0, 7.0]).rolling(3).mean().to_numpy()
+    np.testing.assert_allclose(values, expected, equal_nan=True)
+
+
+def test_every_streaming_indicator_is_registered():
+    assert set(STREAMING_INDICATORS) <= set(INDICATORS)
+    with pytest.raises(TypeError):
+        StreamingIndicator()
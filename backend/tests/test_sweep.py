@@ -0,0 +1,61 @@
+import threading
+import time
+
+import numpy as np
+
+from sweep import expand_grid, run_sweep
+
+STRATEGY = """
+import time
+
+def signals(data):
+    if params['kind'] == 'sleep':
+        time.sleep(60)
+    elif params['kind'] == 'spin':
+        while True:
+            pass
+    orders = np.zeros(len(data['close']))
+    orders[::10] = params.get('size', 1)
+    orders[5::10] = -params.get('size', 1)
+    return orders
+"""
+
+
+def columns(n: int = 200):
+    close = 100 + np.sin(np.arange(n) / 5.0) * 5
+    return {
+        'time': np.arange(n, dtype='int64') * 86400 + 1_700_000_000, 'open': close, 'high': close + 1,
+        'low': close - 1, 'close': close, 'volume': np.full(n, 1000.0),
+    }
+
+
+def test_expand_grid():
+    assert expand_grid({}) == [{}]
+    assert expand_grid({'a': [1, 2], 'b': ['x']}) == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'x'}]
+
+
+def test_runaway_tasks_fail_alone():
+    grid = {'kind': ['ok', 'sleep', 'spin'], 'size': [1, 2]}
+    started = time.monotonic()
+    lines = list(run_sweep(STRATEGY, grid, {'X:1D': columns()}, symbols={'X:1D': 'X'}, max_workers=2,
+                           timeout=3.0, cpu_seconds=1))
+    assert time.monotonic() - started < 30
+    results, done = lines[:-1], lines[-1]
+    assert [r['completed'] for r in results] == list(range(1, 7))
+    errors = sorted((r['params']['kind'], r['error']) for r in results if 'error' in r)
+    assert errors == [('sleep', "Strategy execution failed: timed out after 3s")] * 2 + \
+        [('spin', "Strategy execution failed: CPU time limit exceeded")] * 2
+    assert sorted(r['params']['size'] for r in done['ranking']) == [1, 2]
+    assert all(r['dataset'] == 'X:1D' and 'error' not in r for r in done['ranking'])
+
+
+def test_cancel_stops_the_sweep():
+    cancelled = threading.Event()
+    sweep = run_sweep(STRATEGY, {'kind': ['ok', 'sleep', 'sleep']}, {'X:1D': columns()}, max_workers=2,
+                      timeout=60.0, cancelled=cancelled)
+    first = next(sweep)
+    assert first['params'] == {'kind': 'ok'} and 'error' not in first
+    cancelled.set()
+    started = time.monotonic()
+    assert list(sweep) == []
+    assert time.monotonic() - started < 5
@@ -0,0 +1,71 @@
+import pytest
+
+from symbol_index import DEFAULT_MASTER_PATH, SymbolIndex, build_index, load_master, normalize
+
+
+@pytest.fixture(scope='module')
+def index():
+    return build_index(DEFAULT_MASTER_PATH)
+
+
+def symbols(results):
+    return [row['symbol'] for row in results]
+
+
+def test_bare_tickers_resolve_to_yahoo_symbols(index):
+    assert index.resolve('BTC') == 'BTC-USD'
+    assert index.resolve('reliance') == 'RELIANCE.NS'
+    assert index.resolve('RELIANCE.BO') == 'RELIANCE.BO'
+    assert index.resolve('UNKNOWNCO') == 'UNKNOWNCO.NS'
+    assert index.resolve('ETH-EUR') == 'ETH-EUR'
+
+
+def test_exact_ticker_comes_first(index):
+    assert symbols(index.search('BTC'))[0] == 'BTC-USD'
+    # NSE is listed before BSE in the master
+    assert symbols(index.search('RELIANCE'))[:2] == ['RELIANCE.NS', 'RELIANCE.BO']
+
+
+def test_prefix_matches_symbols_and_names(index):
+    assert 'RELIANCE.NS' in symbols(index.search('rel'))
+    assert 'TCS.NS' in symbols(index.search('tata cons'))
+    assert 'TCS.NS' in symbols(index.search('consultancy'))
+
+
+def test_typos_are_matched_within_one_edit(index):
+    assert symbols(index.search('relaince'))[0] == 'RELIANCE.NS'
+    assert 'RELIANCE.NS' in symbols(index.search('reliancw'))
+    assert 'INFY.NS' in symbols(index.search('infosis'))
+    # Short queries are not retried with typos
+    assert index.search('xyz') == []
+
+
+def test_limit_and_empty_query(index):
+    assert len(index.search('a', limit=3)) == 3
+    assert index.search('  ') == []
+
+
+def test_symbol_ranks_before_name_and_rank_orders_ties():
+    index = SymbolIndex([
+        {'symbol': 'ABCX.NS', 'name': 'Zeta Holdings', 'rank': '2'},
+        {'symbol': 'ZED.NS', 'name': 'Abc Industries', 'rank': '1'},
+        {'symbol': 'ABCD.NS', 'name': 'Omega', 'rank': '1'},
+    ])
+    assert symbols(index.search('abc')) == ['ABCD.NS', 'ABCX.NS', 'ZED.NS']
+
+
+def test_exchange_exports_are_loaded_with_suffixes(tmp_path):
+    path = tmp_path / 'EQUITY_L.csv'
+    path.write_text("SYMBOL,NAME OF COMPANY, SERIES\nRELIANCE,Reliance Industries Limited,EQ\nM&M,Mahindra & Mahindra Limited,EQ\n")
+    rows = load_master(str(path))
+    assert [(row['symbol'], row['exchange']) for row in rows] == [('RELIANCE.NS', 'NSE'), ('M&M.NS', 'NSE')]
+    assert symbols(build_index(str(path)).search('mahindra')) == ['M&M.NS']
+
+
+def test_missing_master_falls_back_to_extra_rows(tmp_path):
+    index = build_index(str(tmp_path / 'missing.csv'), fallback=[{'symbol': 'BTC-USD', 'name': 'Bitcoin'}])
+    assert len(index) == 1 and index.resolve('BTC') == 'BTC-USD'
+
+
+def test_normalize():
+    assert normalize('Bajaj-Auto.NS') == 'BAJAJAUTONS'
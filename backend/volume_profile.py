@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Dict, Any
+
+# Rows of the (candles x bins) overlap matrix processed at once, bounds peak memory
+CHUNK_ROWS = 65536
+# Relative spread under which a session's bin volumes count as equal (float noise of the overlap arithmetic)
+UNIFORM_TOLERANCE = 1e-9
+
+
+def compute_volume_profile(session_codes: np.ndarray, high: np.ndarray, low: np.ndarray, volume: np.ndarray,
+                           num_bins: int = 50, value_area: float = 0.7) -> Dict[str, np.ndarray]:
+    """Batched volume profile for every session at once.
+
+    session_codes assigns each candle to a session (0..S-1, e.g. from pd.factorize on the
+    trading date). Each candle's volume is spread uniformly over the part of its [low, high]
+    range that overlaps each of the session's num_bins price bins; candles with high == low
+    drop their whole volume into a single bin.
+
+    Returns per-session arrays: low/high (range), profile (S x num_bins volumes), poc/vah/val
+    prices and va_low/va_high (inclusive bin index range of the value area).
+    """
+    codes = np.asarray(session_codes, dtype=np.int64)
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    volume = np.asarray(volume, dtype='float64')
+    n_sessions = int(codes.max()) + 1 if len(codes) else 0
+    bin_range = np.arange(num_bins)
+
+    # Session ranges, ignoring NaN like groupby().max()/min()
+    s_high = np.full(n_sessions, -np.inf)
+    s_low = np.full(n_sessions, np.inf)
+    np.fmax.at(s_high, codes, high)
+    np.fmin.at(s_low, codes, low)
+    valid = np.isfinite(s_high) & np.isfinite(s_low) & (s_high != s_low)
+    s_high[~np.isfinite(s_high)] = np.nan
+    s_low[~np.isfinite(s_low)] = np.nan
+    width = np.where(valid, (s_high - s_low) / num_bins, np.nan)
+
+    profile = np.zeros((n_sessions, num_bins))
+    flat_profile = profile.reshape(-1)
+
+    usable = valid[codes] & np.isfinite(high) & np.isfinite(low) & np.isfinite(volume) & (volume != 0)
+
+    # Zero-range candles: equivalent of searchsorted(bins, h) - 1, clipped to a valid bin
+    point = usable & (high == low)
+    if point.any():
+        pc = codes[point]
+        idx = np.ceil((high[point] - s_low[pc]) / width[pc]).astype(np.int64) - 1
+        idx = np.clip(idx, 0, num_bins - 1)
+        flat_profile += np.bincount(pc * num_bins + idx, weights=volume[point], minlength=n_sessions * num_bins)
+
+    ranged = np.flatnonzero(usable & (high != low))
+    for begin in range(0, len(ranged), CHUNK_ROWS):
+        rows = ranged[begin:begin + CHUNK_ROWS]
+        rc = codes[rows]
+        h = high[rows][:, None]
+        l = low[rows][:, None]
+        # Same edge arithmetic as np.linspace(low, high, num_bins + 1), so ties resolve identically
+        edge_lo = s_low[rc][:, None] + width[rc][:, None] * bin_range
+        edge_hi = s_low[rc][:, None] + width[rc][:, None] * (bin_range + 1)
+        edge_hi[:, -1] = s_high[rc]
+        overlap = np.clip(np.minimum(edge_hi, h) - np.maximum(edge_lo, l), 0.0, None)
+        contrib = overlap * (volume[rows] / (high[rows] - low[rows]))[:, None]
+        flat_idx = (rc * num_bins)[:, None] + bin_range
+        flat_profile += np.bincount(flat_idx.ravel(), weights=contrib.ravel(), minlength=n_sessions * num_bins)
+
+    # Value area: grow outwards from the POC towards the heavier neighbour until value_area of
+    # the session volume is covered. Each step advances every session at once.
+    poc_idx = np.argmax(profile, axis=1) if n_sessions else np.zeros(0, dtype=np.int64)
+    sessions = np.arange(n_sessions)
+    target = profile.sum(axis=1) * value_area
+    va_vol = profile[sessions, poc_idx].copy()
+    lower = poc_idx.copy()
+    upper = poc_idx.copy()
+    for _ in range(num_bins - 1):
+        active = valid & (va_vol < target) & ((lower > 0) | (upper < num_bins - 1))
+        if not active.any():
+            break
+        vol_down = np.where(lower > 0, profile[sessions, np.maximum(lower - 1, 0)], 0.0)
+        vol_up = np.where(upper < num_bins - 1, profile[sessions, np.minimum(upper + 1, num_bins - 1)], 0.0)
+        # Ties go down first, unless already at the bottom bin
+        go_down = active & ((vol_down > vol_up) | ((vol_down == vol_up) & (lower > 0)))
+        go_up = active & ~go_down
+        lower = np.where(go_down, lower - 1, lower)
+        upper = np.where(go_up, upper + 1, upper)
+        va_vol += np.where(go_down, vol_down, 0.0) + np.where(go_up, vol_up, 0.0)
+
+    poc = np.where(valid, s_low + width * (poc_idx + 0.5), s_high)
+    vah = np.where(valid, s_low + width * (upper + 1), s_high)
+    val = np.where(valid, s_low + width * lower, s_low)
+    # The top edge is the session high exactly, as with np.linspace
+    vah = np.where(valid & (upper == num_bins - 1), s_high, vah)
+
+    return {
+        'low': s_low,
+        'high': s_high,
+        'profile': profile,
+        'poc': poc,
+        'vah': vah,
+        'val': val,
+        'va_low': lower,
+        'va_high': upper,
+        'valid': valid,
+    }
+
+
+def session_payload(vp: Dict[str, np.ndarray], session: int) -> Dict[str, Any]:
+    """Compact per-session profile: price range, bin volumes and the value-area bin range.
+
+    Bin i spans low + i * (high - low) / bins up to the next edge, bins being len(vol).
+    A profile with the same volume in every bin, as a session of a single candle (every
+    session on daily bars) has, sends that volume once and "bins" with the bin count.
+    """
+    if not vp['valid'][session]:
+        return {'low': None, 'high': None, 'vol': [], 'va': [0, -1]}
+    profile = vp['profile'][session]
+    payload = {
+        'low': float(vp['low'][session]),
+        'high': float(vp['high'][session]),
+        'vol': profile.tolist(),
+        'va': [int(vp['va_low'][session]), int(vp['va_high'][session])],
+    }
+    mean = profile.mean()
+    if np.all(np.abs(profile - mean) <= UNIFORM_TOLERANCE * mean):
+        payload['vol'] = [float(mean)]
+        payload['bins'] = len(profile)
+    return payload
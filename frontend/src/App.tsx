@@ -18,14 +18,39 @@ const DEFAULT_STRATEGY = `def on_candle(candle, portfolio):
         portfolio.sell(1)
 `;
 
+// Replay frames and windowed /api/historical pages carry bars as parallel arrays per field; the chart works on row objects
+const columnsToRows = (columns: Record<string, any[]>) => {
+  const keys = Object.keys(columns);
+  return (columns[keys[0]] || []).map((_: any, i: number) => {
+    const row: any = {};
+    for (const key of keys) row[key] = columns[key][i];
+    return row;
+  });
+};
+
+// Lightweight Charts marker for one fill
+const tradeToMarker = (t: any) => ({
+  time: t.time,
+  position: t.type === 'BUY' ? 'belowBar' : 'aboveBar',
+  color: t.type === 'BUY' ? '#26a69a' : '#ef5350',
+  shape: t.type === 'BUY' ? 'arrowUp' : 'arrowDown',
+  text: t.type + ' @ ₹' + t.price.toFixed(2)
+});
+
 function App() {
   const [data, setData] = useState<any[]>([]);
   const [totalRecords, setTotalRecords] = useState<number>(0);
   const [currentIndex, setCurrentIndex] = useState<number>(0);
   const [lastCandle, setLastCandle] = useState<any | null>(null);
+  // Batched replay candles waiting for the chart, which drains the queue on every tick
+  const candleQueueRef = useRef<any[]>([]);
+  const [candleTick, setCandleTick] = useState(0);
   const [isPlaying, setIsPlaying] = useState(false);
   const [speed, setSpeed] = useState(1);
   const wsRef = useRef<WebSocket | null>(null);
+  const datasetHandleRef = useRef<string | null>(null);
+  // Every bar the chart holds, including streamed candles; replay deltas are applied to it
+  const barsRef = useRef<any[]>([]);
 
   // New States
   const [symbol, setSymbol] = useState<{ value: string, label: string }>({ value: 'RELIANCE.NS', label: 'RELIANCE.NS - Reliance Industries' });
@@ -36,6 +61,8 @@ function App() {
   const [pnl, setPnl] = useState<number | null>(null);
   const [tradeMarkers, setTradeMarkers] = useState<any[]>([]);
   const [isRunning, setIsRunning] = useState(false);
+  // Live mode runs the strategy on the server alongside replay, streaming its fills
+  const [isLive, setIsLive] = useState(false);
   const [activeIndicators, setActiveIndicators] = useState<IndicatorConfig[]>([]);
   const [isIndicatorModalOpen, setIsIndicatorModalOpen] = useState(false);
   const [isChatOpen, setIsChatOpen] = useState(false);
@@ -123,50 +150,121 @@ function App() {
 
   useEffect(() => {
     // Fetch initial data based on selection or indicator changes
+    let url = '';
     if (symbol?.value) {
-      let url = `http://127.0.0.1:8000/api/historical?symbol=${symbol.value}&timeframe=${timeframe}`;
+      // Only the bars shown before replay starts; replay and seeks stream the rest from the server dataset
+      url = `http://127.0.0.1:8000/api/historical?symbol=${symbol.value}&timeframe=${timeframe}&layout=columns&limit=100`;
       if (startDate) url += `&start=${startDate}`;
       if (endDate) url += `&end=${endDate}`;
       if (activeIndicators.length > 0) {
         // To avoid sending massive urls if they add/remove very fast, we just send id/type/params
         url += `&indicators=${encodeURIComponent(JSON.stringify(activeIndicators.map(i => ({ id: i.id, type: i.type, params: i.params }))))}`;
       }
+    }
+
+    // Fills and PnL streamed with replay frames while live mode is on
+    const applyStrategyUpdate = (update: any) => {
+      if (update.error) {
+        setIsLive(false);
+        alert(update.error);
+        return;
+      }
+      if (update.fills && update.fills.length) {
+        setTradeMarkers(prev => prev.concat(update.fills.map(tradeToMarker)));
+      }
+      setPnl(update.pnl);
+    };
 
+    // The replay socket is opened once the dataset handle for this selection is known
+    let ws = null as WebSocket | null;
+    let cancelled = false;
+    const openReplay = (handle: string | null) => {
+      const query = handle ? `&handle=${encodeURIComponent(handle)}` : '';
+      ws = new WebSocket(`ws://127.0.0.1:8000/ws/replay?protocol=delta${query}`);
+      ws.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.strategy) applyStrategyUpdate(msg.strategy);
+        if (msg.type === 'candle') {
+          barsRef.current[msg.currentIndex] = msg.data;
+          setLastCandle(msg.data);
+          if (msg.currentIndex !== undefined) setCurrentIndex(msg.currentIndex);
+        } else if (msg.type === 'candles') {
+          // Every bar due in this frame at high replay speeds
+          const rows = columnsToRows(msg.columns);
+          rows.forEach((row: any, i: number) => { barsRef.current[msg.start + i] = row; });
+          candleQueueRef.current.push(...rows);
+          setCandleTick(t => t + 1);
+          setLastCandle(rows[rows.length - 1]);
+          setCurrentIndex(msg.currentIndex);
+          ws?.send(JSON.stringify({ action: 'ack' }));
+        } else if (msg.type === 'strategy') {
+          // Full strategy state after attaching or seeking
+          if (msg.error) {
+            applyStrategyUpdate(msg);
+          } else {
+            setTradeMarkers(msg.trades.map(tradeToMarker));
+            setPnl(msg.pnl);
+          }
+        } else if (msg.type === 'sync') {
+          candleQueueRef.current.length = 0;
+          barsRef.current = msg.data;
+          setData(msg.data);
+          setLastCandle(msg.data[msg.data.length - 1]);
+          if (msg.currentIndex !== undefined) setCurrentIndex(msg.currentIndex);
+        } else if (msg.type === 'delta') {
+          // Columnar chunk of the bars we are missing, starting at msg.start
+          const rows = columnsToRows(msg.columns);
+          candleQueueRef.current.length = 0;
+          barsRef.current = barsRef.current.slice(0, msg.start).concat(rows);
+          if (msg.final) {
+            setData(barsRef.current.slice());
+            setLastCandle(rows[rows.length - 1]);
+            setCurrentIndex(msg.currentIndex);
+          }
+        } else if (msg.type === 'truncate') {
+          candleQueueRef.current.length = 0;
+          barsRef.current = barsRef.current.slice(0, msg.length);
+          setData(barsRef.current.slice());
+          setLastCandle(barsRef.current[barsRef.current.length - 1]);
+          setCurrentIndex(msg.currentIndex);
+        }
+      };
+      wsRef.current = ws;
+    };
+
+    if (symbol?.value) {
       fetch(url)
         .then(res => res.json())
         .then(d => {
-          if (d.data) {
-            setData(d.data.slice(0, d.initialCount || 100));
+          if (cancelled) return;
+          if (d.columns) {
+            barsRef.current = columnsToRows(d.columns);
+            setData(barsRef.current);
+            setTotalRecords(d.count);
+            setCurrentIndex(Math.max(0, barsRef.current.length - 1));
+          } else if (d.data) {
+            barsRef.current = d.data.slice(0, d.initialCount || 100);
+            setData(barsRef.current);
             setTotalRecords(d.data.length);
             setCurrentIndex((d.initialCount || 100) - 1);
           } else {
-            setData(d.slice(0, 100));
+            barsRef.current = d.slice(0, 100);
+            setData(barsRef.current);
             setTotalRecords(d.length);
             setCurrentIndex(99);
           }
+          datasetHandleRef.current = d.handle || null;
+          setIsLive(false);
           setTradeMarkers([]); // Clear markers on data change
           setPnl(null);
+          openReplay(datasetHandleRef.current);
         })
         .catch(err => console.error("Error fetching historical data:", err));
     }
 
-    // Initialize WebSocket
-    const ws = new WebSocket('ws://127.0.0.1:8000/ws/replay');
-    ws.onmessage = (event) => {
-      const msg = JSON.parse(event.data);
-      if (msg.type === 'candle') {
-        setLastCandle(msg.data);
-        if (msg.currentIndex !== undefined) setCurrentIndex(msg.currentIndex);
-      } else if (msg.type === 'sync') {
-        setData(msg.data);
-        setLastCandle(msg.data[msg.data.length - 1]);
-        if (msg.currentIndex !== undefined) setCurrentIndex(msg.currentIndex);
-      }
-    };
-    wsRef.current = ws;
-
     return () => {
-      ws.close();
+      cancelled = true;
+      ws?.close();
     };
   }, [symbol, timeframe, startDate, endDate, activeIndicators]);
 
@@ -202,7 +300,7 @@ function App() {
       const res = await fetch('http://127.0.0.1:8000/api/backtest', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ code: strategyCode, symbol: symbol.value })
+        body: JSON.stringify({ code: strategyCode, symbol: symbol.value, handle: datasetHandleRef.current })
       });
       const result = await res.json();
 
@@ -211,13 +309,7 @@ function App() {
 
         // Format markers for Lightweight Charts
         if (result.trades) {
-          const markers = result.trades.map((t: any) => ({
-            time: t.time,
-            position: t.type === 'BUY' ? 'belowBar' : 'aboveBar',
-            color: t.type === 'BUY' ? '#26a69a' : '#ef5350',
-            shape: t.type === 'BUY' ? 'arrowUp' : 'arrowDown',
-            text: t.type + ' @ ₹' + t.price.toFixed(2)
-          }));
+          const markers = result.trades.map(tradeToMarker);
           // Lightweight charts requires markers to be sorted by time
           markers.sort((a: any, b: any) => a.time - b.time);
           setTradeMarkers(markers);
@@ -233,6 +325,16 @@ function App() {
     }
   };
 
+  const toggleLive = () => {
+    if (!wsRef.current) return;
+    const newIsLive = !isLive;
+    setIsLive(newIsLive);
+    setTradeMarkers([]);
+    wsRef.current.send(JSON.stringify(newIsLive
+      ? { action: 'strategy', code: strategyCode, symbol: symbol.value }
+      : { action: 'strategy', code: null }));
+  };
+
   const clearResults = () => {
     setPnl(null);
     setTradeMarkers([]);
@@ -251,8 +353,12 @@ function App() {
           <select value={timeframe} onChange={e => setTimeframe(e.target.value)} className="dropdown-select">
             <option value="1m">1m</option>
             <option value="5m">5m</option>
+            <option value="15m">15m</option>
+            <option value="30m">30m</option>
             <option value="1h">1h</option>
+            <option value="4h">4h</option>
             <option value="1D">1D</option>
+            <option value="1W">1W</option>
           </select>
           <div style={{ display: 'flex', alignItems: 'center', gap: '0.25rem' }}>
             <span className="micro-label">From:</span>
@@ -346,6 +452,8 @@ function App() {
               <TradingChart
                 initialData={data}
                 lastCandle={lastCandle}
+                candleQueue={candleQueueRef}
+                candleTick={candleTick}
                 markers={tradeMarkers}
                 onSeek={handleSeek}
                 activeIndicators={activeIndicators}
@@ -372,9 +480,14 @@ function App() {
           <div className="widget flex-1" style={{ display: 'flex', flexDirection: 'column', overflow: 'hidden', minHeight: '100px' }}>
             <div className="widget-header" style={{ flexShrink: 0 }}>
               <div>STRATEGY EDITOR</div>
-              <button className="run-btn" onClick={runStrategy} disabled={isRunning} style={{ opacity: isRunning ? 0.7 : 1, padding: '0.2rem 0.5rem', fontSize: '0.7rem' }}>
-                <PlayCircle size={14} /> {isRunning ? 'Running...' : 'Run Backtest'}
-              </button>
+              <div style={{ display: 'flex', gap: '0.25rem' }}>
+                <button className="run-btn" onClick={runStrategy} disabled={isRunning} style={{ opacity: isRunning ? 0.7 : 1, padding: '0.2rem 0.5rem', fontSize: '0.7rem' }}>
+                  <PlayCircle size={14} /> {isRunning ? 'Running...' : 'Run Backtest'}
+                </button>
+                <button className="run-btn" onClick={toggleLive} style={{ opacity: isLive ? 1 : 0.7, padding: '0.2rem 0.5rem', fontSize: '0.7rem' }}>
+                  <Play size={14} /> {isLive ? 'Stop Live' : 'Run Live'}
+                </button>
+              </div>
             </div>
             <div style={{ flex: 1, overflow: 'hidden' }}>
               <StrategyEditor
@@ -404,6 +517,7 @@ function App() {
         symbol={symbol.value}
         pnl={pnl}
         lastCandle={lastCandle}
+        datasetHandle={datasetHandleRef.current}
         isOpen={isChatOpen}
         onClose={() => setIsChatOpen(false)}
       />
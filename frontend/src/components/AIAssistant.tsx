@@ -12,11 +12,12 @@ interface AIAssistantProps {
     symbol: string;
     pnl: number | null;
     lastCandle: any | null;
+    datasetHandle: string | null;
     isOpen: boolean;
     onClose: () => void;
 }
 
-export const AIAssistant: React.FC<AIAssistantProps> = ({ strategyCode, symbol, pnl, lastCandle, isOpen, onClose }) => {
+export const AIAssistant: React.FC<AIAssistantProps> = ({ strategyCode, symbol, pnl, lastCandle, datasetHandle, isOpen, onClose }) => {
     const [messages, setMessages] = useState<ChatMessage[]>([]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
@@ -46,21 +47,44 @@ export const AIAssistant: React.FC<AIAssistantProps> = ({ strategyCode, symbol,
                 body: JSON.stringify({
                     user_message: input,
                     chat_history: messages,
+                    stream: true,
                     context: {
                         strategyCode,
                         symbol,
                         pnl,
-                        lastCandle
+                        lastCandle,
+                        handle: datasetHandle
                     }
                 })
             });
 
-            const data = await response.json();
+            if (!response.body || !(response.headers.get('content-type') || '').includes('ndjson')) {
+                const data = await response.json();
+                setMessages(prev => [...prev, { role: 'assistant', content: data.error ? `**Error:** ${data.error}` : data.response }]);
+                return;
+            }
 
-            if (data.error) {
-                setMessages(prev => [...prev, { role: 'assistant', content: `**Error:** ${data.error}` }]);
-            } else {
-                setMessages(prev => [...prev, { role: 'assistant', content: data.response }]);
+            // Streamed answer: {"delta"} lines grow the reply as they arrive, then {"done"} or {"error"}
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+            setIsLoading(false);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let reply = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop() || '';
+                for (const line of lines) {
+                    if (!line) continue;
+                    const event = JSON.parse(line);
+                    if (event.delta) reply += event.delta;
+                    if (event.error) reply += `${reply ? '\n\n' : ''}**Error:** ${event.error}`;
+                }
+                const content = reply;
+                setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', content }]);
             }
         } catch (err) {
             setMessages(prev => [...prev, { role: 'assistant', content: '**Error:** Failed to connect to AI server.' }]);
@@ -2,11 +2,13 @@ import { useEffect, useRef, useState } from 'react';
 import { createChart, IChartApi, ISeriesApi, ColorType, LineStyle, Time } from 'lightweight-charts';
 import { IndicatorConfig } from './IndicatorModal';
 import { X } from 'lucide-react';
-import { VolumeProfilePlugin, VolumeProfileSession } from './plugins/VolumeProfilePlugin';
+import { VolumeProfilePlugin, VolumeProfileSession, expandVolumeProfile } from './plugins/VolumeProfilePlugin';
 
 export const TradingChart = ({
     initialData,
     lastCandle,
+    candleQueue,
+    candleTick = 0,
     markers = [],
     onSeek,
     activeIndicators = [],
@@ -14,6 +16,8 @@ export const TradingChart = ({
 }: {
     initialData: any[],
     lastCandle: any | null,
+    candleQueue?: { current: any[] },
+    candleTick?: number,
     markers?: any[],
     onSeek?: (timeIndex: number, time?: number) => void,
     activeIndicators?: IndicatorConfig[],
@@ -356,7 +360,7 @@ export const TradingChart = ({
                         const profileStr = d[`${ind.id}_profile`];
                         if (profileStr) {
                             try {
-                                const profileData = typeof profileStr === 'string' ? JSON.parse(profileStr) : profileStr;
+                                const profileData = expandVolumeProfile(typeof profileStr === 'string' ? JSON.parse(profileStr) : profileStr);
                                 vpSessions.push({
                                     time: (typeof d.time === 'string' ? new Date(d.time).getTime() / 1000 : d.time) as Time,
                                     profile: profileData,
@@ -506,37 +510,36 @@ export const TradingChart = ({
         }
     }, [activeIndicators, initialData, markers]);
 
-    // Handle realtime lastCandle updates
-    useEffect(() => {
-        if (!lastCandle) return;
-        const timeVal = (typeof lastCandle.time === 'string' ? new Date(lastCandle.time).getTime() / 1000 : lastCandle.time) as any;
+    // Applies one streamed candle to the price, volume and indicator series
+    const applyCandle = (candle: any) => {
+        const timeVal = (typeof candle.time === 'string' ? new Date(candle.time).getTime() / 1000 : candle.time) as any;
 
         if (seriesRef.current) {
             try {
-                const formattedCandle: any = { ...lastCandle, time: timeVal };
+                const formattedCandle: any = { ...candle, time: timeVal };
                 seriesRef.current.update(formattedCandle);
 
-                if (volumeSeriesRef.current && lastCandle.volume !== undefined) {
+                if (volumeSeriesRef.current && candle.volume !== undefined) {
                     volumeSeriesRef.current.update({
                         time: timeVal,
-                        value: lastCandle.volume,
-                        color: lastCandle.close >= lastCandle.open ? '#00E676' : '#FF1744'
+                        value: candle.volume,
+                        color: candle.close >= candle.open ? '#00E676' : '#FF1744'
                     } as any);
                 }
 
                 // Update standard indicators
                 try {
                     indicatorSeriesRef.current.forEach((series, id) => {
-                        if (lastCandle[id] !== undefined && lastCandle[id] !== null) {
-                            series.update({ time: timeVal, value: lastCandle[id] } as any);
+                        if (candle[id] !== undefined && candle[id] !== null) {
+                            series.update({ time: timeVal, value: candle[id] } as any);
                         } else if (id.includes('_high') || id.includes('_low') || id.includes('_poc') || id.includes('_vah') || id.includes('_val')) {
                             // Extracted custom modifiers
                             const baseId = id.replace('_high', '').replace('_low', '').replace('_poc', '').replace('_vah', '').replace('_val', '');
-                            if (lastCandle[`${baseId}_prev_high`] !== undefined && id.includes('_high')) series.update({ time: timeVal, value: lastCandle[`${baseId}_prev_high`] } as any)
-                            if (lastCandle[`${baseId}_prev_low`] !== undefined && id.includes('_low')) series.update({ time: timeVal, value: lastCandle[`${baseId}_prev_low`] } as any)
-                            if (lastCandle[`${baseId}_poc`] !== undefined && id.includes('_poc')) series.update({ time: timeVal, value: lastCandle[`${baseId}_poc`] } as any)
-                            if (lastCandle[`${baseId}_vah`] !== undefined && id.includes('_vah')) series.update({ time: timeVal, value: lastCandle[`${baseId}_vah`] } as any)
-                            if (lastCandle[`${baseId}_val`] !== undefined && id.includes('_val')) series.update({ time: timeVal, value: lastCandle[`${baseId}_val`] } as any)
+                            if (candle[`${baseId}_prev_high`] !== undefined && id.includes('_high')) series.update({ time: timeVal, value: candle[`${baseId}_prev_high`] } as any)
+                            if (candle[`${baseId}_prev_low`] !== undefined && id.includes('_low')) series.update({ time: timeVal, value: candle[`${baseId}_prev_low`] } as any)
+                            if (candle[`${baseId}_poc`] !== undefined && id.includes('_poc')) series.update({ time: timeVal, value: candle[`${baseId}_poc`] } as any)
+                            if (candle[`${baseId}_vah`] !== undefined && id.includes('_vah')) series.update({ time: timeVal, value: candle[`${baseId}_vah`] } as any)
+                            if (candle[`${baseId}_val`] !== undefined && id.includes('_val')) series.update({ time: timeVal, value: candle[`${baseId}_val`] } as any)
                         }
                     });
                 } catch (e) { console.warn("Indicator update map failed", e); }
@@ -544,17 +547,17 @@ export const TradingChart = ({
                 // Update BB
                 try {
                     bbSeriesRef.current.forEach((grp, id) => {
-                        if (lastCandle[`${id}_upper`] !== undefined) grp.upper.update({ time: timeVal, value: lastCandle[`${id}_upper`] } as any);
-                        if (lastCandle[`${id}_middle`] !== undefined) grp.middle.update({ time: timeVal, value: lastCandle[`${id}_middle`] } as any);
-                        if (lastCandle[`${id}_lower`] !== undefined) grp.lower.update({ time: timeVal, value: lastCandle[`${id}_lower`] } as any);
+                        if (candle[`${id}_upper`] !== undefined) grp.upper.update({ time: timeVal, value: candle[`${id}_upper`] } as any);
+                        if (candle[`${id}_middle`] !== undefined) grp.middle.update({ time: timeVal, value: candle[`${id}_middle`] } as any);
+                        if (candle[`${id}_lower`] !== undefined) grp.lower.update({ time: timeVal, value: candle[`${id}_lower`] } as any);
                     });
                 } catch (e) { }
 
                 // Update standard oscillators
                 try {
                     oscSeriesRef.current.forEach((series, id) => {
-                        if (lastCandle[id] !== undefined && lastCandle[id] !== null) {
-                            series.update({ time: timeVal, value: lastCandle[id] } as any);
+                        if (candle[id] !== undefined && candle[id] !== null) {
+                            series.update({ time: timeVal, value: candle[id] } as any);
                         }
                     });
                 } catch (e) { }
@@ -562,12 +565,12 @@ export const TradingChart = ({
                 // Update MACD
                 try {
                     macdSeriesRef.current.forEach((grp, id) => {
-                        if (lastCandle[`${id}_macd`] !== undefined) grp.macd.update({ time: timeVal, value: lastCandle[`${id}_macd`] } as any);
-                        if (lastCandle[`${id}_signal`] !== undefined) grp.signal.update({ time: timeVal, value: lastCandle[`${id}_signal`] } as any);
-                        if (lastCandle[`${id}_hist`] !== undefined) grp.hist.update({
+                        if (candle[`${id}_macd`] !== undefined) grp.macd.update({ time: timeVal, value: candle[`${id}_macd`] } as any);
+                        if (candle[`${id}_signal`] !== undefined) grp.signal.update({ time: timeVal, value: candle[`${id}_signal`] } as any);
+                        if (candle[`${id}_hist`] !== undefined) grp.hist.update({
                             time: timeVal,
-                            value: lastCandle[`${id}_hist`],
-                            color: lastCandle[`${id}_hist`] >= 0 ? '#26A69A' : '#EF5350'
+                            value: candle[`${id}_hist`],
+                            color: candle[`${id}_hist`] >= 0 ? '#26A69A' : '#EF5350'
                         } as any);
                     });
                 } catch (e) { }
@@ -576,6 +579,19 @@ export const TradingChart = ({
                 console.warn("Error updating real-time candle:", err);
             }
         }
+    };
+
+    // Batched replay frames carry several candles at once; apply everything queued since the last tick
+    // (declared before the lastCandle effect so bars are applied oldest first)
+    useEffect(() => {
+        if (!candleQueue || candleQueue.current.length === 0) return;
+        candleQueue.current.splice(0).forEach(applyCandle);
+    }, [candleTick]);
+
+    // Handle realtime lastCandle updates
+    useEffect(() => {
+        if (!lastCandle) return;
+        applyCandle(lastCandle);
     }, [lastCandle]);
 
     // Legend Rendering Helpers
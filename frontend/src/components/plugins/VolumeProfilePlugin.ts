@@ -23,6 +23,39 @@ export interface VolumeProfileSession {
     val: number;
 }
 
+// Compact per-session form sent by the backend: price range, bin volumes and value-area bin range.
+// A profile with the same volume in every bin (a one-candle session) sends that volume once, plus the bin count.
+export interface CompactVolumeProfile {
+    low: number | null;
+    high: number | null;
+    vol: number[];
+    va: [number, number];
+    bins?: number;
+}
+
+export function expandVolumeProfile(profile: VolumeProfileBin[] | CompactVolumeProfile): VolumeProfileBin[] {
+    if (Array.isArray(profile)) return profile;
+    const { low, high, vol, va } = profile;
+    if (low === null || high === null || vol.length === 0) return [];
+
+    const count = profile.bins ?? vol.length;
+    const step = (high - low) / count;
+    const bins: VolumeProfileBin[] = [];
+    for (let i = 0; i < count; i++) {
+        const v = profile.bins ? vol[0] : vol[i];
+        if (v <= 0) continue;
+        const lowBound = low + i * step;
+        bins.push({
+            price: lowBound + step / 2,
+            vol: v,
+            low_bound: lowBound,
+            high_bound: lowBound + step,
+            in_va: i >= va[0] && i <= va[1]
+        });
+    }
+    return bins;
+}
+
 export interface VolumeProfilePluginOptions {
     maxWidthPixels: number;
     colorVA: string;